@@ -2,13 +2,24 @@ from passlib.hash import argon2
 from jose import jwt, JWTError
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Dict, Any
+from typing import Dict, Any, Callable
 
 import os
-from dotenv import load_dotenv
+
+from uarchive_common.passwords import PasswordPool, PasswordPoolOverloaded
+
 SECRET_KEY = os.getenv("JWT_SECRET")
 ALGORITHM = "HS256"
 
+# Argon2 runs in the same bounded pool as the backend's (same settings, same
+# password_pool_* metrics), so logins do not block the event loop; past
+# PASSWORD_POOL_MAX_PENDING queued jobs we reject with 503 instead of queueing forever.
+password_pool = PasswordPool(
+    kind=os.getenv("PASSWORD_POOL_KIND", "thread"),
+    workers=int(os.getenv("PASSWORD_POOL_WORKERS", "2")),
+    max_pending=int(os.getenv("PASSWORD_POOL_MAX_PENDING", "32")),
+)
+
 security: HTTPBearer = HTTPBearer() # for JWT Bearer token
 
 def hash_password(password: str):
@@ -18,6 +29,18 @@ def hash_password(password: str):
 def verify_password(password: str, hashed_password: str):
     return argon2.verify(password, hashed_password)
 
+async def _run_password_job(op: str, fn: Callable, *args):
+    try:
+        return await password_pool.run(op, fn, *args)
+    except PasswordPoolOverloaded:
+        raise HTTPException(status_code=503, detail="Too many login attempts, try again shortly", headers={"Retry-After": "1"})
+
+async def hash_password_async(password: str):
+    return await _run_password_job("hash", hash_password, password)
+
+async def verify_password_async(password: str, hashed_password: str):
+    return await _run_password_job("verify", verify_password, password, hashed_password)
+
 def create_access_token(data: dict):
     return jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
 
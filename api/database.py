@@ -1,10 +1,13 @@
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+
 from dotenv import load_dotenv
+
+from uarchive_common.mongo import MongoSettings, create_client
+
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 
-client = AsyncIOMotorClient(MONGO_URI)
+client = create_client(MONGO_URI, MongoSettings())
 db = client["UArchive-API"]
 user_collection = db["user"]
@@ -1,34 +1,42 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from database import db, user_collection # database for indexing
+from auth import password_pool  # after database, which loads .env
 from routers.auth import router as auth_router
 from routers.user import router as user_router
 from routers.courses import router as courses_router
 from routers.problems import router as problems_router
 from routers.comments import router as comments_router
+from uarchive_common import metrics  # shared with the backend; holds the Mongo pool and command metrics
+from uarchive_common.http_metrics import HTTPMetricsMiddleware
 
 
 
 # Handle startup for app with indices: 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    # Users: unique username
+    # Users: unique username; email is checked on register
     await user_collection.create_index("username", unique=True)
+    await user_collection.create_index("email")
 
     # Courses: unique code+number
     await db["courses"].create_index([("code", 1), ("number", 1)], unique=True)
 
-    # Problems: course_code+course_number+votes for sorting/filtering
+    # Problems: every filter combination is sorted by votes, so each needs
+    # its own index ending in votes (or the sort happens in memory)
     await db["problems"].create_index([("course_code", 1), ("course_number", 1), ("votes", -1)])
-    await db["problems"].create_index("professor")  # filter by professor
+    await db["problems"].create_index([("course_code", 1), ("votes", -1)])
+    await db["problems"].create_index([("professor", 1), ("votes", -1)])  # filter by professor
+    await db["problems"].create_index([("votes", -1)])  # unfiltered list
 
     # Comments: problem_id+votes for sorting
     await db["comments"].create_index([("problem_id", 1), ("votes", -1)])
 
     yield  # everything before yield runs at app startup, everything after is run at shutdown
+    password_pool.shutdown()
 
 
 app: FastAPI = FastAPI(lifespan=lifespan)
@@ -41,9 +49,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(HTTPMetricsMiddleware)
 
 app.include_router(auth_router)
 app.include_router(user_router)
 app.include_router(courses_router)
 app.include_router(problems_router)
-app.include_router(comments_router)
\ No newline at end of file
+app.include_router(comments_router)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -3,7 +3,7 @@ from typing import Dict, Any, Union
 
 from models import UserRegister, UserLogin
 from database import user_collection
-from auth import hash_password, verify_password, create_access_token, verify_access_token
+from auth import hash_password_async, verify_password_async, create_access_token, verify_access_token
 
 router: APIRouter = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -26,7 +26,7 @@ async def register(user: UserRegister) -> Dict[str, str]:
             raise HTTPException(status_code=400, detail="Email already registered")
 
     # Hash the password
-    hashed_pw: bytes = hash_password(user.password)
+    hashed_pw: bytes = await hash_password_async(user.password)
 
     # Create new user document
     new_user: Dict[str, Any] = {
@@ -52,7 +52,7 @@ async def login(user: UserLogin) -> Dict[str, str]:
         raise HTTPException(status_code=401, detail="Username not found")
 
     # Verify password
-    if not verify_password(user.password, db_user["password"]):
+    if not await verify_password_async(user.password, db_user["password"]):
         raise HTTPException(status_code=401, detail="Incorrect Password")
 
     # Create JWT token
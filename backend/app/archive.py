@@ -0,0 +1,374 @@
+"""Archive export and restore as compressed NDJSON segments.
+
+An archive is a directory with one or more segments per collection and a
+`manifest.json`:
+
+    manifest.json
+    courses-0000.ndjson.zst
+    problems-0000.ndjson.zst
+    problems-0001.ndjson.zst
+    ...
+
+Each line of a segment is one document in canonical MongoDB Extended JSON,
+so every BSON type round-trips exactly (ObjectIds, dates, and ints stay
+ints rather than becoming doubles). Segments are zstd-compressed when the
+`zstandard` package is installed and gzip otherwise (`--codec` picks one
+explicitly). The manifest lists every segment with its document count and
+sha256. Its `watermark` is the time the export started.
+
+Exports read batched cursors and compress one batch at a time, so memory
+use does not grow with the collection. An incremental export
+(`--since`, or `--since-manifest` with the previous manifest) takes only
+documents whose `updatedAt`, or `createdAt` when there is no `updatedAt`,
+is at or after the watermark. That covers the `INCREMENTAL` collections,
+whose every write path stamps `updatedAt` (vote flushes and
+`contributionCount` bumps included) and which carry an `updatedAt` index.
+Every other collection (the migrations ledger, anything added by hand) has
+no such timestamp and is exported in full even by an incremental export;
+the manifest marks those with `"full": true`.
+
+Restore replays segments with unordered `insert_many` batches. Documents
+that already exist, which is the case for an incremental archive, are
+replaced by `_id`. A document that still cannot be written, typically
+because it clashes with a different document on a unique index
+(`username`, `courseCodeKey`), is logged and reported with its `_id`; the
+rest of the archive is restored regardless. `--drop` drops the archived
+collections and recreates their registered indexes (`app/indexes.py`)
+before loading, so unique clashes are caught per document there too.
+
+Run from the backend directory:
+
+    python -m app.archive export --out /backups/2026-01-31
+    python -m app.archive export --out /backups/2026-02-01 --since-manifest /backups/2026-01-31/manifest.json
+    python -m app.archive restore /backups/2026-01-31
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import logging
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from .indexes import REQUIRED_INDEXES, IndexManager
+from .services.conditional import VERSIONS, bump
+from .services.streaming import iter_batches
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger("uvicorn.error")
+
+FORMAT = "uarchive-ndjson"
+VERSION = 1
+BATCH_SIZE = 1000
+SEGMENT_DOCS = 100_000
+EXTENSIONS = {"zstd": ".ndjson.zst", "gzip": ".ndjson.gz"}
+MEDIA_TYPES = {"zstd": "application/zstd", "gzip": "application/gzip"}
+# collections whose writes all stamp `updatedAt` (`createdAt` on older
+# documents), so `since` can select what changed; the rest export in full
+INCREMENTAL = frozenset({"users", "courses", "problems", "responses", "comments", "summaries"})
+_JSON = json_util.CANONICAL_JSON_OPTIONS.with_options(tz_aware=True, tzinfo=timezone.utc)
+# failures kept per collection in the restore report; all of them are logged
+MAX_REPORTED_FAILURES = 100
+
+
+def available_codecs() -> List[str]:
+    return ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+
+def pick_codec(name: str = "auto") -> str:
+    if name == "auto":
+        return available_codecs()[0]
+    if name not in EXTENSIONS:
+        raise ValueError(f"unknown codec {name!r}")
+    if name == "zstd" and zstandard is None:
+        raise ValueError("zstd needs the zstandard package")
+    return name
+
+
+class Compressor:
+    def __init__(self, codec: str):
+        if codec == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+def since_filter(collection: str, since: Optional[datetime]) -> Dict[str, Any]:
+    if since is None or collection not in INCREMENTAL:
+        return {}
+    return {"$or": [
+        {"updatedAt": {"$gte": since}},
+        {"updatedAt": {"$exists": False}, "createdAt": {"$gte": since}},
+    ]}
+
+
+def encode(docs: List[dict]) -> bytes:
+    return b"".join(json_util.dumps(doc, json_options=_JSON).encode() + b"\n" for doc in docs)
+
+
+async def collections_to_export(db, only: Optional[List[str]] = None) -> List[str]:
+    # version counters are per deployment; restore bumps them instead
+    names = sorted(n for n in await db.list_collection_names() if not n.startswith("system.") and n != VERSIONS)
+    return [n for n in names if n in only] if only else names
+
+
+async def export_stream(db, collection: str, since: Optional[datetime] = None, codec: str = "gzip") -> AsyncIterator[bytes]:
+    """One collection as a single compressed NDJSON stream, for HTTP."""
+    compressor = Compressor(codec)
+    cursor = db[collection].find(since_filter(collection, since)).batch_size(BATCH_SIZE)
+    async for batch in iter_batches(cursor, BATCH_SIZE):
+        chunk = compressor.compress(encode(batch))
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+class _Segment:
+    def __init__(self, path: Path, codec: str):
+        self.path = path
+        self.file = open(path, "wb")
+        self.compressor = Compressor(codec)
+        self.digest = hashlib.sha256()
+        self.documents = 0
+        self.bytes = 0
+
+    def _write(self, data: bytes) -> None:
+        if data:
+            self.file.write(data)
+            self.digest.update(data)
+            self.bytes += len(data)
+
+    def write(self, docs: List[dict]) -> None:
+        self._write(self.compressor.compress(encode(docs)))
+        self.documents += len(docs)
+
+    def close(self) -> Dict[str, Any]:
+        self._write(self.compressor.flush())
+        self.file.close()
+        return {"file": self.path.name, "documents": self.documents, "bytes": self.bytes, "sha256": self.digest.hexdigest()}
+
+
+async def export(
+    db,
+    out: Path,
+    since: Optional[datetime] = None,
+    codec: str = "auto",
+    only: Optional[List[str]] = None,
+    segment_docs: int = SEGMENT_DOCS,
+) -> Dict[str, Any]:
+    """Write every collection to `out` and return the manifest."""
+    codec = pick_codec(codec)
+    out.mkdir(parents=True, exist_ok=True)
+    # taken before reading anything, so writes made during the export are
+    # picked up again by the next incremental one
+    watermark = datetime.now(timezone.utc)
+    manifest: Dict[str, Any] = {
+        "format": FORMAT,
+        "version": VERSION,
+        "database": db.name,
+        "codec": codec,
+        "since": since.isoformat() if since else None,
+        "watermark": watermark.isoformat(),
+        "collections": {},
+    }
+    for name in await collections_to_export(db, only):
+        start = time.perf_counter()
+        segments: List[Dict[str, Any]] = []
+        segment: Optional[_Segment] = None
+        cursor = db[name].find(since_filter(name, since)).batch_size(BATCH_SIZE)
+        async for batch in iter_batches(cursor, BATCH_SIZE):
+            while batch:
+                if segment is None:
+                    segment = _Segment(out / f"{name}-{len(segments):04d}{EXTENSIONS[codec]}", codec)
+                room = segment_docs - segment.documents
+                segment.write(batch[:room])
+                batch = batch[room:]
+                if segment.documents >= segment_docs:
+                    segments.append(segment.close())
+                    segment = None
+        if segment is not None:
+            segments.append(segment.close())
+        total = sum(s["documents"] for s in segments)
+        manifest["collections"][name] = {"documents": total, "full": not since_filter(name, since), "segments": segments}
+        logger.info("Exported %s: %d documents in %d segments, %.1fs", name, total, len(segments), time.perf_counter() - start)
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_segment(path: Path, codec: str) -> Iterator[bytes]:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError(f"{path.name} is zstd-compressed; install zstandard to restore it")
+        with open(path, "rb") as raw:
+            yield from io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+    else:
+        with gzip.open(path, "rb") as f:
+            yield from f
+
+
+def _failure(doc: dict, error: Dict[str, Any]) -> Dict[str, Any]:
+    return {"_id": doc.get("_id"), "code": error.get("code"), "error": error.get("errmsg")}
+
+
+async def _insert(collection, docs: List[dict]) -> Tuple[int, List[Dict[str, Any]]]:
+    """Insert a batch; documents whose `_id` exists already are replaced.
+
+    Returns how many documents were written and one failure entry for each
+    that was not.
+    """
+    try:
+        await collection.insert_many(docs, ordered=False)
+        return len(docs), []
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+    failures = [_failure(docs[e["index"]], e) for e in errors if e.get("code") != 11000]
+    # an existing `_id`, or a clash on another unique index that replacing
+    # by `_id` cannot fix; the second attempt tells them apart
+    duplicates = [docs[e["index"]] for e in errors if e.get("code") == 11000]
+    if duplicates:
+        try:
+            await collection.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in duplicates], ordered=False)
+        except BulkWriteError as exc:
+            failures += [_failure(duplicates[e["index"]], e) for e in exc.details.get("writeErrors", [])]
+    for f in failures:
+        logger.error("Restore into %s failed for _id %s: %s", collection.name, f["_id"], f["error"])
+    return len(docs) - len(failures), failures
+
+
+async def restore(db, src: Path, drop: bool = False, batch_size: int = BATCH_SIZE) -> Dict[str, Dict[str, Any]]:
+    """Replay an archive into `db`.
+
+    Returns, per collection, the number of documents restored, the number
+    that failed and the first `MAX_REPORTED_FAILURES` failures.
+    """
+    manifest = json.loads((src / "manifest.json").read_text())
+    if manifest.get("format") != FORMAT or manifest.get("version") != VERSION:
+        raise ValueError(f"{src} is not a version {VERSION} {FORMAT} archive")
+    codec = manifest["codec"]
+    names = list(manifest["collections"])
+    if drop:
+        for name in names:
+            await db[name].drop()
+        # on the empty collections these build instantly, and unique ones
+        # turn clashes inside the archive into per-document failures
+        await IndexManager(db, [s for s in REQUIRED_INDEXES if s.collection in names]).ensure()
+    report: Dict[str, Dict[str, Any]] = {}
+    for name in names:
+        entry = manifest["collections"][name]
+        start = time.perf_counter()
+        count = 0
+        failed = 0
+        failures: List[Dict[str, Any]] = []
+
+        async def flush(batch: List[dict]) -> None:
+            nonlocal count, failed
+            written, errors = await _insert(db[name], batch)
+            count += written
+            failed += len(errors)
+            failures.extend(errors[: MAX_REPORTED_FAILURES - len(failures)])
+
+        for seg in entry["segments"]:
+            path = src / seg["file"]
+            if _sha256(path) != seg["sha256"]:
+                raise ValueError(f"{seg['file']} does not match its checksum in the manifest")
+            batch: List[dict] = []
+            for line in read_segment(path, codec):
+                if line.strip():
+                    batch.append(json_util.loads(line, json_options=_JSON))
+                if len(batch) >= batch_size:
+                    await flush(batch)
+                    batch = []
+            if batch:
+                await flush(batch)
+        report[name] = {"documents": count, "failed": failed, "failures": failures}
+        logger.info("Restored %s: %d documents, %d failed, %.1fs", name, count, failed, time.perf_counter() - start)
+    # running workers revalidate ETags against the new data
+    await bump(db, *report)
+    return report
+
+
+def _parse_since(args) -> Optional[datetime]:
+    if args.since_manifest:
+        return datetime.fromisoformat(json.loads(Path(args.since_manifest).read_text())["watermark"])
+    if args.since:
+        since = datetime.fromisoformat(args.since.replace("Z", "+00:00"))
+        return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .database import settings
+    from uarchive_common.mongo import create_client
+
+    parser = argparse.ArgumentParser(prog="python -m app.archive", description="Export or restore UArchive data.")
+    parser.add_argument("--mongo-uri", default=settings.MONGO_URI)
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="write every collection to a directory")
+    exp.add_argument("--out", required=True, type=Path)
+    exp.add_argument("--codec", default="auto", choices=["auto", *EXTENSIONS])
+    exp.add_argument("--since", help="ISO timestamp; only documents updated since")
+    exp.add_argument("--since-manifest", help="previous manifest.json; export what changed after it")
+    exp.add_argument("--collections", help="comma-separated subset")
+    exp.add_argument("--segment-docs", type=int, default=SEGMENT_DOCS)
+    res = sub.add_parser("restore", help="replay an export into the database")
+    res.add_argument("src", type=Path)
+    res.add_argument("--drop", action="store_true", help="drop each collection before restoring it")
+    res.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        client = create_client(args.mongo_uri, settings)
+        db = client.get_default_database()
+        try:
+            if args.command == "export":
+                only = [c.strip() for c in args.collections.split(",")] if args.collections else None
+                manifest = await export(db, args.out, _parse_since(args), args.codec, only, args.segment_docs)
+                total = sum(c["documents"] for c in manifest["collections"].values())
+                print(f"exported {total} documents to {args.out} (watermark {manifest['watermark']})")
+            else:
+                report = await restore(db, args.src, args.drop, args.batch_size)
+                restored = sum(r["documents"] for r in report.values())
+                failed = sum(r["failed"] for r in report.values())
+                print(f"restored {restored} documents into {db.name}, {failed} failed")
+                for name, r in report.items():
+                    for f in r["failures"]:
+                        print(f"  {name} _id {f['_id']}: {f['error']}")
+                if failed:
+                    return 1
+        finally:
+            client.close()
+
+    return asyncio.run(run()) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
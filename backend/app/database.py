@@ -1,16 +1,42 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Optional
-from pydantic_settings import BaseSettings
 import os
 import logging
 
+from uarchive_common.mongo import MongoSettings, create_client, route_databases
+
 logger = logging.getLogger("uvicorn.error")
 
 
-class Settings(BaseSettings):
+class Settings(MongoSettings):
+    # pool, compression and read preference options live in MongoSettings
     # Provide a sensible default for local development so the app can run
     # without requiring a .env file. Production should set the env var.
     MONGO_URI: str = "mongodb://localhost:27017/ch2026"
+    # How long the in-memory course catalog is trusted before reloading
+    COURSE_CACHE_TTL_SECONDS: float = 60.0
+    # Page size for list endpoints when the client omits `limit`, and the cap
+    DEFAULT_PAGE_SIZE: int = 50
+    MAX_PAGE_SIZE: int = 200
+    # Documents encoded and flushed per chunk in NDJSON streaming mode
+    STREAM_BATCH_SIZE: int = 500
+    # NDJSON lines validated and inserted per batch by the bulk ingest routes
+    INGEST_BATCH_SIZE: int = 500
+    # Buffered votes are written every this many ms, or sooner once this many
+    # are waiting
+    VOTE_FLUSH_INTERVAL_MS: int = 250
+    VOTE_FLUSH_MAX_EVENTS: int = 500
+    # Vote flushes bump a collection's ETag version at most this often, so
+    # cached lists show new counts within this many seconds
+    VOTE_VERSION_INTERVAL_SECONDS: float = 30.0
+    # How often the search index picks up documents created by other workers
+    SEARCH_SYNC_INTERVAL_SECONDS: float = 10.0
+    # Response cache for hot GET routes: "memory" (per worker, LRU bounded by
+    # bytes), "redis" (shared through REDIS_URL) or "off"
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 30.0
+    REDIS_URL: str = "redis://localhost:6379/0"
     model_config = {"extra": "ignore"}
 
 
@@ -22,71 +48,23 @@ client: Optional[AsyncIOMotorClient] = None
 
 async def connect(app):
     global client
-    client = AsyncIOMotorClient(settings.MONGO_URI)
+    client = create_client(settings.MONGO_URI, settings)
     app.state.mongo_client = client
     app.state.db = client.get_default_database()
+    app.state.route_dbs = route_databases(app.state.db, settings)
 
 
 async def init_db(app):
-    """Create collections and indexes needed by the application.
+    """Run pending migrations and seeding (see `app/migrations.py`).
 
-    This is idempotent: creating an index that already exists is a no-op.
-    Call this after `connect(app)` during application startup.
+    Called from the background warm-up task, never on the request path.
+    Indexes are declared in `app/indexes.py` and built by `IndexManager`
+    once this has run, because some of them depend on migrated data.
+    Returns the per-step results of `run_pending`.
     """
-    db = app.state.db
-    # Users: unique username and email
-    try:
-        idx = await db.users.create_index("username", unique=True)
-        logger.info("Created/ensured index on users.username: %s", idx)
-        idx = await db.users.create_index("email", unique=True)
-        logger.info("Created/ensured index on users.email: %s", idx)
-    except Exception:
-        logger.exception("Failed to create users indexes")
-
-    # Courses: text search across code, name, description, tags
-    try:
-        idx = await db.courses.create_index([
-            ("courseCode", "text"),
-            ("courseName", "text"),
-            ("description", "text"),
-            ("tags", "text"),
-        ])
-        logger.info("Created/ensured text index on courses: %s", idx)
-    except Exception:
-        logger.exception("Failed to create courses text index")
-
-    # Problems: text search and lookup by courseId
-    try:
-        idx = await db.problems.create_index([
-            ("title", "text"),
-            ("description", "text"),
-            ("tags", "text"),
-        ])
-        logger.info("Created/ensured text index on problems: %s", idx)
-        idx = await db.problems.create_index("courseId")
-        logger.info("Created/ensured index on problems.courseId: %s", idx)
-        idx = await db.problems.create_index("createdAt")
-        logger.info("Created/ensured index on problems.createdAt: %s", idx)
-    except Exception:
-        logger.exception("Failed to create problems indexes")
-
-    # Responses: lookup by problemId and sort by upvotes
-    try:
-        idx = await db.responses.create_index("problemId")
-        logger.info("Created/ensured index on responses.problemId: %s", idx)
-        idx = await db.responses.create_index([("upvotes", -1)])
-        logger.info("Created/ensured index on responses.upvotes: %s", idx)
-    except Exception:
-        logger.exception("Failed to create responses indexes")
-
-    # Seed database with mock data when empty
-    try:
-        from .seeds import seed_db
-
-        await seed_db(app)
-        logger.info("Database seeding (if needed) complete")
-    except Exception:
-        logger.exception("Failed to seed database")
+    from .migrations import run_pending
+
+    return await run_pending(app.state.db)
 
 
 async def close(app):
@@ -97,3 +75,19 @@ async def close(app):
 
 def get_db(app):
     return app.state.db
+
+
+def read_db(request):
+    """The database for a read-only route, with its configured read preference.
+
+    Routes listed in `MONGO_ROUTE_READ_PREFERENCES` get their own handle;
+    everything else uses the client default. Only use this where reading a
+    slightly stale secondary is acceptable: never before a write.
+    """
+    endpoint = request.scope.get("endpoint")
+    if endpoint is not None:
+        key = f"{endpoint.__module__.rsplit('.', 1)[-1]}.{endpoint.__name__}"
+        db = request.app.state.route_dbs.get(key)
+        if db is not None:
+            return db
+    return request.app.state.db
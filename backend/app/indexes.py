@@ -0,0 +1,183 @@
+"""Declarative registry of the indexes the application's queries rely on.
+
+`REQUIRED_INDEXES` is the single list of indexes to keep in sync with the
+routers: add an entry next to any new query shape. At startup
+`IndexManager.ensure()` runs as a background task. It compares the registry
+with what each collection actually has, then builds anything missing, one
+`createIndexes` per collection and all collections concurrently. Startup
+does not wait for it; until a build finishes, the affected queries are just
+slower.
+
+Drift is reported, never repaired destructively: an index whose keys match
+but whose options differ (e.g. not unique) is flagged as a mismatch, and
+indexes that exist but are not in the registry are listed as extra. Both
+need a deliberate manual drop. `GET /api/admin/indexes` shows the report.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import IndexModel
+
+logger = logging.getLogger("uvicorn.error")
+
+Keys = Tuple[Tuple[str, Any], ...]
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Keys
+    unique: bool = False
+    partial: Optional[Dict[str, Any]] = field(default=None, hash=False, compare=False)
+    # the query this index serves, shown in the drift report
+    reason: str = ""
+
+    @property
+    def name(self) -> str:
+        # Mongo's default naming, so indexes created by hand still match
+        return "_".join(f"{k}_{v}" for k, v in self.keys)
+
+    def model(self) -> IndexModel:
+        options: Dict[str, Any] = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.partial:
+            options["partialFilterExpression"] = self.partial
+        return IndexModel(list(self.keys), **options)
+
+
+NEWEST = (("createdAt", -1), ("_id", -1))
+
+REQUIRED_INDEXES: List[IndexSpec] = [
+    IndexSpec("users", (("username", 1),), unique=True, reason="login and signup by username"),
+    IndexSpec("users", (("email", 1),), unique=True, reason="login and signup by email"),
+    IndexSpec("courses", (("courseCode", 1), ("_id", 1)), reason="course list, alphabetical"),
+    IndexSpec(
+        "courses",
+        (("courseCodeKey", 1),),
+        unique=True,
+        partial={"courseCodeKey": {"$type": "string"}},
+        reason="course lookup by normalized code; one course per code",
+    ),
+    IndexSpec("problems", NEWEST, reason="problem list, newest first"),
+    IndexSpec("problems", (("courseId", 1),) + NEWEST, reason="problem list within a course"),
+    IndexSpec("problems", (("authorId", 1),) + NEWEST, reason="problems by author"),
+    IndexSpec("problems", (("courseId", 1), ("votes", -1), ("_id", -1)), reason="course page, top problems"),
+    IndexSpec("responses", (("problemId", 1), ("upvotes", -1), ("_id", -1)), reason="responses to a problem, top voted first"),
+    IndexSpec("comments", (("problemId", 1),) + NEWEST, reason="comments on a problem, newest first"),
+    IndexSpec("summaries", NEWEST, reason="summary list, newest first"),
+    IndexSpec("summaries", (("courseId", 1),) + NEWEST, reason="summary list within a course"),
+    # one per collection in app.archive.INCREMENTAL
+    IndexSpec("users", (("updatedAt", 1),), reason="incremental archive export"),
+    IndexSpec("courses", (("updatedAt", 1),), reason="incremental archive export"),
+    IndexSpec("problems", (("updatedAt", 1),), reason="incremental archive export"),
+    IndexSpec("responses", (("updatedAt", 1),), reason="incremental archive export"),
+    IndexSpec("comments", (("updatedAt", 1),), reason="incremental archive export"),
+    IndexSpec("summaries", (("updatedAt", 1),), reason="incremental archive export"),
+]
+
+
+def _key_of(info: Dict[str, Any]) -> Keys:
+    return tuple((k, int(v) if isinstance(v, float) else v) for k, v in info["key"])
+
+
+class IndexManager:
+    def __init__(self, db, specs: List[IndexSpec] = REQUIRED_INDEXES):
+        self._db = db
+        self.specs = list(specs)
+        # (collection, index name) -> "building" | "built" | "failed: <error>"
+        self._builds: Dict[Tuple[str, str], str] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def _by_collection(self) -> Dict[str, List[IndexSpec]]:
+        grouped: Dict[str, List[IndexSpec]] = {}
+        for spec in self.specs:
+            grouped.setdefault(spec.collection, []).append(spec)
+        return grouped
+
+    async def report(self) -> Dict[str, Any]:
+        """Compare the registry with the indexes that exist right now."""
+        grouped = self._by_collection()
+        names = sorted(set(grouped) | set(await self._db.list_collection_names()))
+        infos = await asyncio.gather(*(self._db[c].index_information() for c in names), return_exceptions=True)
+        collections: Dict[str, Any] = {}
+        for coll, info in zip(names, infos):
+            if isinstance(info, Exception):
+                info = {}
+            existing = {_key_of(v): (name, v) for name, v in info.items()}
+            entries = []
+            for spec in grouped.get(coll, []):
+                found = existing.pop(spec.keys, None)
+                if found is None:
+                    status = self._builds.get((coll, spec.name), "missing")
+                else:
+                    name, options = found
+                    problems = []
+                    if bool(options.get("unique")) != spec.unique:
+                        problems.append("unique" if spec.unique else "not unique")
+                    if (options.get("partialFilterExpression") or None) != spec.partial:
+                        problems.append("partial filter differs")
+                    status = "mismatch: expected " + ", ".join(problems) if problems else "ok"
+                entries.append({"name": spec.name, "keys": [list(k) for k in spec.keys], "status": status, "reason": spec.reason})
+            extra = [name for name, _ in existing.values() if name != "_id_"]
+            if entries or extra:
+                collections[coll] = {"required": entries, "extra": sorted(extra)}
+        drift = any(c["extra"] or any(e["status"] != "ok" for e in c["required"]) for c in collections.values())
+        return {
+            "drift": drift,
+            "building": self.started_at is not None and self.finished_at is None,
+            "collections": collections,
+        }
+
+    async def _build(self, coll: str, specs: List[IndexSpec]) -> None:
+        for spec in specs:
+            self._builds[(coll, spec.name)] = "building"
+        start = time.perf_counter()
+        # one command builds all of a collection's indexes in a single scan;
+        # if it fails, retry them one by one so only the culprit is left out
+        batches = [specs]
+        while batches:
+            batch = batches.pop()
+            try:
+                await self._db[coll].create_indexes([s.model() for s in batch])
+            except Exception as exc:
+                if len(batch) > 1:
+                    batches.extend([s] for s in batch)
+                    continue
+                logger.exception("Failed to build index %s.%s", coll, batch[0].name)
+                self._builds[(coll, batch[0].name)] = f"failed: {exc}"
+                continue
+            for spec in batch:
+                self._builds[(coll, spec.name)] = "built"
+        logger.info("Index builds on %s finished in %.2fs", coll, time.perf_counter() - start)
+
+    async def ensure(self) -> Dict[str, Any]:
+        """Build every missing index, then log and return the drift report."""
+        self.started_at = time.time()
+        self.finished_at = None
+        try:
+            before = await self.report()
+            missing: Dict[str, List[IndexSpec]] = {}
+            for spec in self.specs:
+                entries = before["collections"].get(spec.collection, {}).get("required", [])
+                if any(e["name"] == spec.name and e["status"] == "missing" for e in entries):
+                    missing.setdefault(spec.collection, []).append(spec)
+            await asyncio.gather(*(self._build(c, specs) for c, specs in missing.items()))
+        finally:
+            self.finished_at = time.time()
+        after = await self.report()
+        for coll, entry in after["collections"].items():
+            for e in entry["required"]:
+                if e["status"] not in ("ok", "built"):
+                    logger.warning("Index drift on %s.%s: %s", coll, e["name"], e["status"])
+            if entry["extra"]:
+                logger.warning("Indexes on %s not in the registry: %s", coll, ", ".join(entry["extra"]))
+        return after
+
+
+def get_index_manager(app) -> IndexManager:
+    return app.state.index_manager
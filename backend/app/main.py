@@ -17,10 +17,21 @@ if os.name == "nt":
 from fastapi import FastAPI, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
-
-from .database import connect, close, init_db
-from .routers import auth, users, courses, problems, responses, search, summaries, comments
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES
+from fastapi.responses import JSONResponse, Response
+from uarchive_common import metrics
+from uarchive_common.http_metrics import HTTPMetricsMiddleware
+
+from .database import connect, close, settings
+from .indexes import IndexManager
+from .routers import admin, auth, bulk, users, courses, problems, responses, search, summaries, comments
+from .services import auth as auth_service
+from .services.course_catalog import CourseCatalog
+from .services.loaders import lookups_saved
+from .services.response_cache import build_response_cache, doc_tag
+from .services.search_index import SearchIndex, run_sync_loop
+from .services.votes import VoteBuffer
+from .warmup import Warmup, readiness, run_warmup
 
 logger = logging.getLogger("uvicorn.error")
 logger.setLevel(logging.INFO)
@@ -85,16 +96,43 @@ def configure_event_loop_policy() -> None:
 async def lifespan(app: FastAPI):
     logger.info("LIFESPAN startup: connecting to database")
     await connect(app)
-    # Initialize collections / indexes
-    try:
-        await init_db(app)
-        logger.info("Database indexes ensured")
-    except Exception:
-        logger.exception("Failed to ensure database indexes")
+    # nothing below waits on Mongo: migrations, the catalog load and index
+    # builds run in the background and /readyz reports when they are done
+    app.state.warmup = Warmup()
+    app.state.index_manager = IndexManager(app.state.db)
+    app.state.course_catalog = CourseCatalog(ttl_seconds=settings.COURSE_CACHE_TTL_SECONDS)
+    warmup = asyncio.create_task(run_warmup(app))
+    app.state.response_cache = cache = build_response_cache(settings)
+
+    async def votes_flushed(collection, ids):
+        if cache is not None:
+            await cache.invalidate(*(doc_tag(collection, i) for i in ids))
+
+    app.state.vote_buffer = VoteBuffer(
+        app.state.db,
+        interval_ms=settings.VOTE_FLUSH_INTERVAL_MS,
+        max_events=settings.VOTE_FLUSH_MAX_EVENTS,
+        on_flush=votes_flushed,
+        version_interval=settings.VOTE_VERSION_INTERVAL_SECONDS,
+    )
+    app.state.vote_buffer.start()
+    # built in the background; /api/search answers 503 until it is ready
+    app.state.search_index = SearchIndex()
+    search_sync = asyncio.create_task(
+        run_sync_loop(app.state.search_index, app.state.db, app.state.course_catalog, settings.SEARCH_SYNC_INTERVAL_SECONDS)
+    )
     try:
         yield
     finally:
+        search_sync.cancel()
+        warmup.cancel()
+        logger.info("LIFESPAN shutdown: flushing buffered votes")
+        try:
+            await app.state.vote_buffer.stop()
+        except Exception:
+            logger.exception("Failed to flush buffered votes")
         logger.info("LIFESPAN shutdown: closing database")
+        auth_service.password_pool.shutdown()
         await close(app)
 
 
@@ -104,13 +142,16 @@ def build_app() -> FastAPI:
     app = FastAPI(title="UArchive API", lifespan=lifespan)
 
     # Middleware
-    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    # archive exports arrive compressed already
+    app.add_middleware(GZipMiddleware, minimum_size=1000, exclude_content_types=DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/zstd",))
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # let browser clients read the keyset pagination token
+        expose_headers=["X-Next-Cursor"],
     )
 
     @app.middleware("http")
@@ -118,11 +159,16 @@ def build_app() -> FastAPI:
         start = time.perf_counter()
         response = await call_next(request)
         elapsed_ms = (time.perf_counter() - start) * 1000
+        saved = lookups_saved(request)
         logger.info(
             f"{request.method} {request.url.path} completed_in={elapsed_ms:.2f}ms status_code={response.status_code}"
+            + (f" lookups_saved={saved}" if saved else "")
         )
         return response
 
+    # outermost, so its timings include every other middleware
+    app.add_middleware(HTTPMetricsMiddleware)
+
     # Routers
     app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
     app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -132,17 +178,22 @@ def build_app() -> FastAPI:
     app.include_router(summaries.router, prefix="/api/summaries", tags=["summaries"])
     app.include_router(comments.router, prefix="/api/comments", tags=["comments"])
     app.include_router(search.router, prefix="/api/search", tags=["search"])
+    app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+    app.include_router(bulk.router, prefix="/api")
 
     @app.get("/healthz", tags=["health"])
     def health_check():
-        # lightweight DB check
-        try:
-            db = app.state.db
-            # motor returns a Database object; perform a simple command
-            # Note: avoid blocking calls here; keep it lightweight
-            return {"status": "ok", "db": "available" if db else "unavailable"}
-        except Exception:
-            return {"status": "ok", "db": "unavailable"}
+        # liveness only: the process is up and serving; see /readyz
+        return {"status": "ok"}
+
+    @app.get("/readyz", tags=["health"])
+    async def readiness_check():
+        report = await readiness(app)
+        return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+    @app.get("/metrics", tags=["health"], include_in_schema=False)
+    def metrics_endpoint():
+        return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
     return app
 
@@ -0,0 +1,126 @@
+"""One-off data migrations and seeding, tracked in a ledger collection.
+
+`MIGRATIONS` lists every step with a version. `run_pending` reads the whole
+`migrations` ledger in one query and runs only the steps whose recorded
+version is older, so a boot with nothing to do costs a single small read.
+Bump a step's version to make it run again.
+
+Workers booting together race for each step by upserting its ledger entry:
+the loser gets a duplicate key error and skips the step. A step left
+"running" by a worker that died is taken over after `STALE_AFTER`. Steps are
+still written to be idempotent, because a takeover can repeat work.
+"""
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from .seeds import seed_db
+from .services.course_catalog import normalize_code
+
+logger = logging.getLogger("uvicorn.error")
+
+LEDGER = "migrations"
+STALE_AFTER = timedelta(minutes=10)
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def backfill_course_code_keys(db) -> int:
+    """Set `courseCodeKey` on courses created before the field existed.
+
+    Returns the number of courses updated. Courses whose codes collide once
+    normalized are logged; the unique index on the key cannot be built
+    until they are merged or renamed.
+    """
+    ops = []
+    async for doc in db.courses.find({"courseCodeKey": {"$exists": False}}, {"courseCode": 1}):
+        key = normalize_code(doc.get("courseCode"))
+        if key:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"courseCodeKey": key}, "$currentDate": {"updatedAt": True}}))
+    if ops:
+        await db.courses.bulk_write(ops, ordered=False)
+        logger.info("Backfilled courseCodeKey on %d courses", len(ops))
+
+    duplicates = db.courses.aggregate([
+        {"$match": {"courseCodeKey": {"$type": "string"}}},
+        {"$group": {"_id": "$courseCodeKey", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ])
+    async for dup in duplicates:
+        logger.warning("Duplicate course code %r on courses %s", dup["_id"], ", ".join(map(str, dup["ids"])))
+    return len(ops)
+
+
+class Migration(NamedTuple):
+    name: str
+    version: int
+    run: Callable[..., Awaitable]
+
+
+# in order; some indexes (the unique courseCodeKey) depend on these
+MIGRATIONS: List[Migration] = [
+    Migration("backfill-course-code-key", 1, backfill_course_code_keys),
+    Migration("seed-mock-data", 1, seed_db),
+]
+
+
+async def _claim(ledger, step: Migration) -> bool:
+    now = datetime.utcnow()
+    try:
+        await ledger.update_one(
+            {
+                "_id": step.name,
+                "$or": [
+                    {"version": {"$lt": step.version}},
+                    {"state": "failed"},
+                    {"state": "running", "startedAt": {"$lt": now - STALE_AFTER}},
+                ],
+            },
+            {"$set": {"version": step.version, "state": "running", "startedAt": now, "worker": WORKER}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # the entry exists and is done or owned by another worker
+        return False
+    return True
+
+
+async def run_pending(db, migrations: List[Migration] = MIGRATIONS) -> Dict[str, str]:
+    """Run every step the ledger has not recorded at its current version.
+
+    Returns what happened to each step that was reached: "applied",
+    "skipped" (already done), "busy" (another worker is running it) or
+    "failed". Stops at the first busy or failed step.
+    """
+    ledger = db[LEDGER]
+    recorded = {doc["_id"]: doc async for doc in ledger.find({}, {"version": 1, "state": 1})}
+    results: Dict[str, str] = {}
+    for step in migrations:
+        entry = recorded.get(step.name)
+        if entry and entry.get("version", 0) >= step.version and entry.get("state") == "done":
+            results[step.name] = "skipped"
+            continue
+        if not await _claim(ledger, step):
+            current = await ledger.find_one({"_id": step.name}, {"state": 1})
+            done = current and current.get("state") == "done"
+            results[step.name] = "skipped" if done else "busy"
+            if not done:
+                # another worker is running it; later steps may depend on it
+                break
+            continue
+        try:
+            await step.run(db)
+        except Exception as exc:
+            logger.exception("Migration %s v%d failed", step.name, step.version)
+            await ledger.update_one({"_id": step.name}, {"$set": {"state": "failed", "error": str(exc)[:500]}})
+            results[step.name] = "failed"
+            # later steps may depend on this one
+            break
+        await ledger.update_one({"_id": step.name}, {"$set": {"state": "done", "appliedAt": datetime.utcnow()}, "$unset": {"error": ""}})
+        logger.info("Migration %s v%d applied", step.name, step.version)
+        results[step.name] = "applied"
+    return results
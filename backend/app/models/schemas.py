@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 try:
-    from pydantic import core_schema  # type: ignore
+    from pydantic_core import core_schema  # type: ignore
     PYDANTIC_V2 = True
 except Exception:
     core_schema = None  # type: ignore
@@ -21,7 +21,16 @@ class PyObjectId(ObjectId):
     if PYDANTIC_V2:
         @classmethod
         def __get_pydantic_core_schema__(cls, source, handler):
-            return core_schema.no_info_plain_validator_function(cls._validate)
+            # serialize natively as a hex string in JSON mode so models never
+            # need a json_encoders fallback
+            return core_schema.no_info_plain_validator_function(
+                cls._validate,
+                serialization=core_schema.plain_serializer_function_ser_schema(str, when_used="json"),
+            )
+
+        @classmethod
+        def __get_pydantic_json_schema__(cls, schema, handler):
+            return {"type": "string", "pattern": "^[0-9a-f]{24}$"}
     else:
         @classmethod
         def __get_validators__(cls):
@@ -52,9 +61,7 @@ class UserData(BaseModel):
     joinedAt: Optional[datetime] = None
     lastLoginAt: Optional[datetime] = None
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class Token(BaseModel):
@@ -115,9 +122,7 @@ class CourseOut(BaseModel):
     tags: Optional[List[str]] = []
     description: Optional[str] = None
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class ProblemOut(BaseModel):
@@ -135,9 +140,7 @@ class ProblemOut(BaseModel):
     createdAt: Optional[datetime] = None
     updatedAt: Optional[datetime] = None
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class SummaryOut(BaseModel):
@@ -158,9 +161,7 @@ class SummaryOut(BaseModel):
     createdAt: Optional[datetime] = None
     updatedAt: Optional[datetime] = None
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class ResponseOut(BaseModel):
@@ -175,9 +176,7 @@ class ResponseOut(BaseModel):
     createdAt: Optional[datetime] = None
     updatedAt: Optional[datetime] = None
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class CommentOut(BaseModel):
@@ -191,6 +190,68 @@ class CommentOut(BaseModel):
     createdAt: Optional[datetime] = None
     updatedAt: Optional[datetime] = None
 
-    class Config:
-        json_encoders = {ObjectId: str}
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SearchHit(BaseModel):
+    kind: str
+    id: PyObjectId
+    score: float
+    title: Optional[str] = None
+    courseId: Optional[PyObjectId] = None
+    courseCode: Optional[str] = None
+
+
+class CourseSuggestion(BaseModel):
+    courseId: PyObjectId
+    courseCode: Optional[str] = None
+    courseName: Optional[str] = None
+    # which field matched and its text, e.g. a tag
+    field: str
+    match: str
+
+
+class SearchResults(BaseModel):
+    query: str
+    total: int
+    # broad queries report an estimated total rather than counting every match
+    totalExact: bool = True
+    offset: int = 0
+    nextOffset: Optional[int] = None
+    results: List[SearchHit] = []
+
+
+class CoursePageCounts(BaseModel):
+    problems: int = 0
+    summaries: int = 0
+
+
+class CoursePage(BaseModel):
+    # the full course document, as returned by GET /api/courses/{id}
+    course: dict
+    problems: List[ProblemOut] = []
+    summaries: List[SummaryOut] = []
+    counts: CoursePageCounts = CoursePageCounts()
+
+
+class ProblemBundle(BaseModel):
+    problem: ProblemOut
+    # one page of each; pass the cursor back as responsesCursor/commentsCursor
+    responses: List[ResponseOut] = []
+    responsesNextCursor: Optional[str] = None
+    comments: List[CommentOut] = []
+    commentsNextCursor: Optional[str] = None
+
+
+class BulkIngestError(BaseModel):
+    line: int
+    error: str
+
+
+class BulkIngestResult(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    # the first MAX_REPORTED_ERRORS failures, by line number
+    errors: List[BulkIngestError] = []
+    errorsTruncated: bool = False
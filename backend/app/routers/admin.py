@@ -0,0 +1,68 @@
+import asyncio
+import hmac
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from .. import archive
+from ..indexes import get_index_manager
+from ..services import auth as auth_service
+from typing import Optional
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    expected = auth_service.settings.ADMIN_TOKEN
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.get("/indexes", dependencies=[Depends(require_admin)])
+async def index_status(request: Request):
+    """Registry indexes per collection with their build/drift status, plus
+    indexes that exist but are not in the registry."""
+    return await get_index_manager(request.app).report()
+
+
+@router.post("/indexes/ensure", status_code=202, dependencies=[Depends(require_admin)])
+async def ensure_indexes(request: Request):
+    """Start another background pass building whatever is missing."""
+    manager = get_index_manager(request.app)
+    if manager.started_at is not None and manager.finished_at is None:
+        raise HTTPException(status_code=409, detail="Index build already running")
+    request.app.state.index_build = asyncio.create_task(manager.ensure())
+    return {"started": True}
+
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def export_index(request: Request):
+    """Collections available for export. Pass `watermark` as `since` next
+    time to export only what changed."""
+    return {
+        "collections": await archive.collections_to_export(request.app.state.db),
+        "codecs": archive.available_codecs(),
+        "watermark": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+@router.get("/export/{collection}", dependencies=[Depends(require_admin)])
+async def export_collection(request: Request, collection: str, since: Optional[datetime] = None, codec: str = "auto"):
+    """Stream one collection as compressed NDJSON (see `app/archive.py`)."""
+    db = request.app.state.db
+    if collection not in await archive.collections_to_export(db):
+        raise HTTPException(status_code=404, detail="Unknown collection")
+    try:
+        codec = archive.pick_codec(codec)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    filename = f"{collection}{archive.EXTENSIONS[codec]}"
+    return StreamingResponse(
+        archive.export_stream(db, collection, since, codec),
+        media_type=archive.MEDIA_TYPES[codec],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -11,6 +11,11 @@ logger = logging.getLogger("uvicorn.error")
 router = APIRouter()
 
 
+def _overloaded() -> HTTPException:
+    # the password pool is saturated; ask the client to back off briefly
+    return HTTPException(status_code=503, detail="Too many login attempts, try again shortly", headers={"Retry-After": "1"})
+
+
 @router.post("/register", response_model=schemas.UserData)
 async def register(request: Request):
     # Read raw body to aid debugging validation errors
@@ -35,7 +40,10 @@ async def register(request: Request):
     if await db.users.find_one({"email": user_in.email}):
         raise HTTPException(status_code=400, detail="email already exists")
 
-    hashed = auth_service.get_password_hash(user_in.password)
+    try:
+        hashed = await auth_service.get_password_hash_async(user_in.password)
+    except auth_service.PasswordPoolOverloaded:
+        raise _overloaded()
     now = __import__("datetime").datetime.utcnow()
     doc = {
         "username": user_in.username,
@@ -45,6 +53,7 @@ async def register(request: Request):
         "reputation": 0,
         "joinedAt": now,
         "lastLoginAt": now,
+        "updatedAt": now,
     }
     res = await db.users.insert_one(doc)
     created = await db.users.find_one({"_id": res.inserted_id})
@@ -66,10 +75,15 @@ async def login(request: Request):
         user = await db.users.find_one({"email": username})
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    if not auth_service.verify_password(password, user.get("passwordHash")):
+    try:
+        valid = await auth_service.verify_password_async(password, user.get("passwordHash"))
+    except auth_service.PasswordPoolOverloaded:
+        raise _overloaded()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = auth_service.create_access_token({"sub": str(user.get("_id")), "username": user.get("username")})
     # update lastLoginAt
-    await db.users.update_one({"_id": user.get("_id")}, {"$set": {"lastLoginAt": __import__("datetime").datetime.utcnow()}})
+    await db.users.update_one({"_id": user.get("_id")}, {"$set": {"lastLoginAt": __import__("datetime").datetime.utcnow()}, "$currentDate": {"updatedAt": True}})
+    auth_service.invalidate_user(user.get("_id"))
     return {"access_token": token, "token_type": "bearer"}
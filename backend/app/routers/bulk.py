@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Request
+
+from ..models import schemas
+from ..services.ingest import PROBLEMS, SUMMARIES, Ingest
+from .users import get_current_user
+
+# mounted at /api: the ":bulk" suffix sits on the collection path itself
+router = APIRouter()
+
+
+@router.post("/problems:bulk", response_model=schemas.BulkIngestResult, tags=["problems"])
+async def bulk_problems(request: Request, current_user: dict = Depends(get_current_user)):
+    """Create many problems from an NDJSON body, one ProblemCreate per line."""
+    return await Ingest(request, PROBLEMS, current_user).run()
+
+
+@router.post("/summaries:bulk", response_model=schemas.BulkIngestResult, tags=["summaries"])
+async def bulk_summaries(request: Request, current_user: dict = Depends(get_current_user)):
+    """Create many summaries from an NDJSON body, one SummaryCreate per line."""
+    return await Ingest(request, SUMMARIES, current_user).run()
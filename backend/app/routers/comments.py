@@ -1,34 +1,50 @@
-from fastapi import APIRouter, Request, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, Depends
+from ..database import read_db
 from ..models import schemas
+from ..services import auth as auth_service
+from ..services.loaders import batch_authors, get_loaders
+from ..services.pagination import fetch_page, set_next_cursor
+from ..services.projection import FieldSelection
+from ..services.serialization import construct, json_response
+from ..services.votes import record_vote
+from ..services.streaming import ndjson_response, open_cursor, wants_stream
 from .users import get_current_user
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
+# newest first; matches the (problemId, createdAt, _id) index
+LIST_SORT = [("createdAt", -1), ("_id", -1)]
+
 
 def _objid(id_str: str):
     return __import__("bson").ObjectId(id_str)
 
 
 @router.get("/problem/{problem_id}", response_model=List[schemas.CommentOut])
-async def get_comments(problem_id: str, request: Request):
-    db = request.app.state.db
-    cur = db.comments.find({"problemId": _objid(problem_id)}).sort([("createdAt", -1)])
-    items = []
-    async for doc in cur:
-        try:
-            author_id = doc.get("authorId")
-            if author_id:
-                user = await db.users.find_one({"_id": author_id})
-                if user:
-                    doc["authorUsername"] = user.get("username")
-        except Exception:
-            pass
-        try:
-            items.append(schemas.CommentOut.parse_obj(doc))
-        except Exception:
-            items.append(doc)
-    return items
+async def get_comments(
+    problem_id: str,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    stream: bool = False,
+    fields: Optional[str] = None,
+):
+    db = read_db(request)
+    q = {"problemId": _objid(problem_id)}
+    sel = FieldSelection(schemas.CommentOut, fields, required=[f for f, _ in LIST_SORT])
+    if wants_stream(request, stream):
+        cur = open_cursor(db.comments, q, LIST_SORT, cursor, limit, sel.projection)
+        return ndjson_response(cur, schemas.CommentOut, batch_authors(db), sel.include)
+    docs, next_cursor = await fetch_page(db.comments, q, LIST_SORT, cursor, limit, sel.projection)
+    set_next_cursor(response, next_cursor)
+    # resolve every author on the page with a single query
+    try:
+        await get_loaders(request).attach_authors(docs)
+    except Exception:
+        pass
+    return json_response(schemas.CommentOut, docs, sel.include, response)
 
 
 @router.post("", status_code=201, response_model=schemas.CommentOut)
@@ -52,22 +68,19 @@ async def create_comment(payload: schemas.CommentCreate, request: Request, curre
         pass
     # increment user's contribution count
     try:
-        await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}})
+        await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}, "$currentDate": {"updatedAt": True}})
+        auth_service.invalidate_user(current_user.get("_id"))
     except Exception:
         pass
-    try:
-        return schemas.CommentOut.parse_obj(created)
-    except Exception:
-        return created
+    return construct(schemas.CommentOut, created)
 
 
 @router.post("/{comment_id}/vote", response_model=schemas.CommentOut)
 async def vote_comment(comment_id: str, request: Request):
-    db = request.app.state.db
     body = await request.json()
     delta = int(body.get("delta", 1))
-    res = await db.comments.find_one_and_update({"_id": _objid(comment_id)}, {"$inc": {"upvotes": delta}}, return_document=True)
-    try:
-        return schemas.CommentOut.parse_obj(res)
-    except Exception:
-        return res
+    # buffered and flushed in bulk; the count returned is optimistic
+    res = await record_vote(request, "comments", _objid(comment_id), "upvotes", delta)
+    if not res:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return construct(schemas.CommentOut, res)
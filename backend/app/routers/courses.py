@@ -1,36 +1,145 @@
-from fastapi import APIRouter, Request, HTTPException
+import json
+
+from bson import ObjectId
+from fastapi import APIRouter, Query, Request, Response, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
+from ..database import read_db
 from ..models import schemas
-from typing import List
+from ..services.conditional import CATALOG, NO_CACHE, bump, not_modified
+from ..services.course_catalog import get_catalog, normalize_code
+from ..services.pagination import fetch_page, set_next_cursor
+from ..services.response_cache import doc_tag, get_response_cache
+from ..services.search_index import get_search_index
+from ..services.serialization import dump_many, json_response
+from ..services.streaming import ndjson_response, open_cursor, wants_stream
+from typing import List, Optional
 
 router = APIRouter()
 
+# alphabetical by code; matches the (courseCode, _id) index
+LIST_SORT = [("courseCode", 1), ("_id", 1)]
+PAGE_MAX_ITEMS = 50
+
+
+def _page_pipeline(match: dict, problems: int, summaries: int) -> list:
+    """The course, its top problems, latest summaries and counts in one
+    aggregation. Each `$lookup` sub-pipeline is an equality match on
+    `courseId` followed by a sort and limit that an index serves:
+    (courseId, votes, _id) and (courseId, createdAt, _id)."""
+
+    def related(collection: str, pipeline: list, name: str) -> dict:
+        return {"$lookup": {"from": collection, "localField": "_id", "foreignField": "courseId", "pipeline": pipeline, "as": name}}
+
+    return [
+        {"$match": match},
+        {"$limit": 1},
+        related("problems", [{"$sort": {"votes": -1, "_id": -1}}, {"$limit": problems}], "topProblems"),
+        related("summaries", [{"$sort": {"createdAt": -1, "_id": -1}}, {"$limit": summaries}], "latestSummaries"),
+        related("problems", [{"$count": "n"}], "problemCount"),
+        related("summaries", [{"$count": "n"}], "summaryCount"),
+    ]
+
 
 @router.get("", response_model=List[schemas.CourseOut])
-async def list_courses(request: Request):
-    db = request.app.state.db
-    cur = db.courses.find().sort([("courseCode", 1)])
-    items = []
-    async for doc in cur:
-        # convert to Pydantic model so FastAPI handles ObjectId encoding
-        try:
-            items.append(schemas.CourseOut.parse_obj(doc))
-        except Exception:
-            items.append(doc)
-    return items
+async def list_courses(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    stream: bool = False,
+):
+    db = read_db(request)
+    cached = await not_modified(request, response, db, ("courses",), CATALOG)
+    if cached:
+        return cached
+    if wants_stream(request, stream):
+        return ndjson_response(open_cursor(db.courses, {}, LIST_SORT, cursor, limit), schemas.CourseOut, response=response)
+    docs, next_cursor = await fetch_page(db.courses, {}, LIST_SORT, cursor, limit)
+    set_next_cursor(response, next_cursor)
+    return json_response(schemas.CourseOut, docs, response=response)
 
 
 @router.get("/{course_id}")
-async def get_course(course_id: str, request: Request):
-    db = request.app.state.db
-    doc = await db.courses.find_one({"_id": __import__("bson").ObjectId(course_id)})
+async def get_course(course_id: str, request: Request, response: Response):
+    db = read_db(request)
+    cached = await not_modified(request, response, db, ("courses",), CATALOG)
+    if cached:
+        return cached
+    cache = get_response_cache(request.app)
+    hit = await cache.get(request, response)
+    if hit:
+        return hit
+    doc = await get_catalog(request.app).get(db, course_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Course not found")
+    # the catalog owns its documents; hand the caller a copy to stringify
+    doc = dict(doc)
+    tag = doc_tag("courses", doc.get("_id"))
     try:
         if doc.get("_id") is not None:
             doc["_id"] = str(doc.get("_id"))
     except Exception:
         pass
-    return doc
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    result = JSONResponse(jsonable_encoder(doc), headers=headers)
+    await cache.put(request, result, [tag])
+    return result
+
+
+@router.get("/{course_id}/page", response_model=schemas.CoursePage)
+async def get_course_page(
+    course_id: str,
+    request: Request,
+    response: Response,
+    problems: int = Query(10, ge=1, le=PAGE_MAX_ITEMS),
+    summaries: int = Query(10, ge=1, le=PAGE_MAX_ITEMS),
+):
+    """Everything a course page renders, in one request and one DB call.
+
+    `course_id` may also be a course code.
+    """
+    db = read_db(request)
+    cached = await not_modified(request, response, db, ("courses", "problems", "summaries"), NO_CACHE)
+    if cached:
+        return cached
+    cache = get_response_cache(request.app)
+    hit = await cache.get(request, response)
+    if hit:
+        return hit
+    if ObjectId.is_valid(course_id):
+        match = {"_id": ObjectId(course_id)}
+    else:
+        match = {"courseCodeKey": normalize_code(course_id)}
+    docs = await db.courses.aggregate(_page_pipeline(match, problems, summaries)).to_list(1)
+    if not docs:
+        raise HTTPException(status_code=404, detail="Course not found")
+    course = docs[0]
+    top = course.pop("topProblems")
+    latest = course.pop("latestSummaries")
+    # $count emits nothing at all for an empty match
+    problem_count = course.pop("problemCount")
+    summary_count = course.pop("summaryCount")
+    counts = {
+        "problems": problem_count[0]["n"] if problem_count else 0,
+        "summaries": summary_count[0]["n"] if summary_count else 0,
+    }
+    for doc in top:
+        doc["courseCode"] = course.get("courseCode")
+    tags = [doc_tag("courses", course["_id"])]
+    tags += [doc_tag("problems", d["_id"]) for d in top]
+    tags += [doc_tag("summaries", d["_id"]) for d in latest]
+    body = b"".join([
+        b'{"course":', json.dumps(jsonable_encoder(course, custom_encoder={ObjectId: str})).encode(),
+        b',"problems":', dump_many(schemas.ProblemOut, top),
+        b',"summaries":', dump_many(schemas.SummaryOut, latest),
+        b',"counts":', json.dumps(counts).encode(), b"}",
+    ])
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    result = Response(content=body, media_type="application/json", headers=headers)
+    await cache.put(request, result, tags)
+    return result
 
 
 @router.post("", status_code=201)
@@ -38,8 +147,22 @@ async def create_course(payload: schemas.CourseCreate, request: Request):
     db = request.app.state.db
     data = payload.dict()
     data.update({"createdAt": __import__("datetime").datetime.utcnow(), "updatedAt": __import__("datetime").datetime.utcnow(), "enrollmentCount": 0, "problemCount": 0})
-    res = await db.courses.insert_one(data)
+    data["courseCodeKey"] = normalize_code(payload.courseCode)
+    if not data["courseCodeKey"]:
+        raise HTTPException(status_code=400, detail="courseCode is required")
+    try:
+        res = await db.courses.insert_one(data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail=f"Course {data['courseCodeKey']} already exists")
+    await bump(db, "courses")
+    await get_response_cache(request.app).invalidate("courses")
     doc = await db.courses.find_one({"_id": res.inserted_id})
+    # make the new course visible to joins and code lookups immediately
+    get_catalog(request.app).add(dict(doc))
+    try:
+        get_search_index(request.app).add("courses", doc)
+    except Exception:
+        pass
     try:
         if doc.get("_id") is not None:
             doc["_id"] = str(doc.get("_id"))
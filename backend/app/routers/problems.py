@@ -1,77 +1,98 @@
-from fastapi import APIRouter, Request, HTTPException, Depends
+import asyncio
+
+from fastapi import APIRouter, Query, Request, Response, HTTPException, Depends
+from ..database import read_db
 from ..models import schemas
 from ..services import auth as auth_service
+from ..services.conditional import NO_CACHE, bump, document_not_modified
+from ..services.course_catalog import get_catalog
+from ..services.ingest import new_problem
+from ..services.loaders import get_loaders
+from ..services.pagination import fetch_page, set_next_cursor
+from ..services.projection import FieldSelection
+from ..services.response_cache import doc_tag, get_response_cache
+from ..services.search_index import get_search_index
+from ..services.serialization import construct, json_response
+from ..services.votes import record_vote
+from ..services.streaming import ndjson_response, open_cursor, wants_stream
+from .comments import LIST_SORT as COMMENT_SORT
+from .responses import LIST_SORT as RESPONSE_SORT
 from .users import get_current_user
-from typing import List
+from functools import partial
+from typing import List, Optional
 
 router = APIRouter()
 
+# newest first; matches the (courseId, createdAt, _id) and (createdAt, _id) indexes
+LIST_SORT = [("createdAt", -1), ("_id", -1)]
+# responses and comments embedded per page in the problem bundle
+BUNDLE_PAGE_SIZE = 20
+
 
 def _objid(id_str: str):
     return __import__("bson").ObjectId(id_str)
 
 
 @router.get("", response_model=List[schemas.ProblemOut])
-async def list_problems(request: Request, courseId: str = None, courseCode: str = None):
-    db = request.app.state.db
+async def list_problems(
+    request: Request,
+    response: Response,
+    courseId: str = None,
+    courseCode: str = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    stream: bool = False,
+    fields: Optional[str] = None,
+):
+    db = read_db(request)
+    catalog = get_catalog(request.app)
+    sel = FieldSelection(schemas.ProblemOut, fields, required=[f for f, _ in LIST_SORT])
     q = {}
     if courseCode:
-        course = await db.courses.find_one({"courseCode": {"$regex": f"^{courseCode.strip()}$", "$options": "i"}})
+        course = await catalog.get_by_code(db, courseCode)
         if not course:
             return []
         q["courseId"] = course.get("_id")
     elif courseId:
         q["courseId"] = _objid(courseId)
-    cur = db.problems.find(q).sort([("createdAt", -1)])
-    items = []
-    async for doc in cur:
-        # attach courseCode for frontend convenience
-        try:
-            course = await db.courses.find_one({"_id": doc.get("courseId")})
-            if course:
-                doc["courseCode"] = course.get("courseCode")
-        except Exception:
-            pass
-        # convert to Pydantic model so FastAPI handles ObjectId encoding
-        try:
-            items.append(schemas.ProblemOut.parse_obj(doc))
-        except Exception:
-            items.append(doc)
-    return items
+    if wants_stream(request, stream):
+        prepare = partial(catalog.attach_course_codes, db)
+        cur = open_cursor(db.problems, q, LIST_SORT, cursor, limit, sel.projection)
+        return ndjson_response(cur, schemas.ProblemOut, prepare, sel.include)
+    cache = get_response_cache(request.app)
+    hit = await cache.get(request)
+    if hit:
+        return hit
+    docs, next_cursor = await fetch_page(db.problems, q, LIST_SORT, cursor, limit, sel.projection)
+    set_next_cursor(response, next_cursor)
+    # attach courseCode for frontend convenience
+    try:
+        await catalog.attach_course_codes(db, docs)
+    except Exception:
+        pass
+    # new problems land in the unfiltered list or their course's list; votes
+    # invalidate every page showing the problem
+    tags = [doc_tag("courses", q["courseId"])] if "courseId" in q else ["problems"]
+    tags += [doc_tag("problems", d["_id"]) for d in docs]
+    result = json_response(schemas.ProblemOut, docs, sel.include, response)
+    await cache.put(request, result, tags)
+    return result
 
 
 @router.post("", status_code=201, response_model=schemas.ProblemOut)
 async def create_problem(payload: schemas.ProblemCreate, request: Request, current_user: dict = Depends(get_current_user)):
     db = request.app.state.db
     now = __import__("datetime").datetime.utcnow()
-    doc = payload.dict()
 
     # Allow payload.courseId to be either an ObjectId string or a courseCode
-    course_obj = None
-    try:
-        # first try by ObjectId
-        course_obj = await db.courses.find_one({"_id": _objid(payload.courseId)})
-    except Exception:
-        course_obj = None
-
-    if not course_obj:
-        # try by courseCode (case-insensitive, trimmed)
-        course_obj = await db.courses.find_one({"courseCode": {"$regex": f"^{payload.courseId.strip()}$", "$options": "i"}})
-
+    course_obj = await get_catalog(request.app).resolve(db, payload.courseId)
     if not course_obj:
         raise HTTPException(status_code=400, detail="Invalid course identifier")
 
-    doc.update({
-        "courseId": course_obj.get("_id"),
-        "courseCode": course_obj.get("courseCode"),
-        "authorId": current_user.get("_id"),
-        "votes": 0,
-        "createdAt": now,
-        "updatedAt": now,
-        "isVerified": False,
-        "isFlagged": False,
-    })
+    doc = new_problem(payload.dict(), course_obj, current_user, now)
     res = await db.problems.insert_one(doc)
+    await bump(db, "problems")
+    await get_response_cache(request.app).invalidate("problems", doc_tag("courses", doc["courseId"]))
     created = await db.problems.find_one({"_id": res.inserted_id})
     # attach courseCode and author username
     created["courseCode"] = course_obj.get("courseCode")
@@ -79,43 +100,89 @@ async def create_problem(payload: schemas.ProblemCreate, request: Request, curre
         created["authorUsername"] = current_user.get("username")
     except Exception:
         pass
+    # increment user's contribution count (best-effort)
+    try:
+        await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}, "$currentDate": {"updatedAt": True}})
+        auth_service.invalidate_user(current_user.get("_id"))
+    except Exception:
+        pass
     try:
-        return schemas.ProblemOut.parse_obj(created)
+        get_search_index(request.app).add("problems", created)
     except Exception:
-        return created
-    finally:
-        # increment user's contribution count (best-effort)
-        try:
-            await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}})
-        except Exception:
-            pass
+        pass
+    return construct(schemas.ProblemOut, created)
 
 
 @router.get("/{problem_id}", response_model=schemas.ProblemOut)
-async def get_problem(problem_id: str, request: Request):
-    db = request.app.state.db
+async def get_problem(problem_id: str, request: Request, response: Response):
+    db = read_db(request)
     doc = await db.problems.find_one({"_id": _objid(problem_id)})
     if not doc:
         raise HTTPException(status_code=404, detail="Problem not found")
     try:
-        course = await db.courses.find_one({"_id": doc.get("courseId")})
+        course = await get_catalog(request.app).get(db, doc.get("courseId"))
         if course:
             doc["courseCode"] = course.get("courseCode")
     except Exception:
         pass
+    # tagged from the document, so votes on other problems leave it alone;
+    # votes change often, so always revalidate
+    cached = document_not_modified(
+        request, response, NO_CACHE, doc["_id"], doc.get("updatedAt"), doc.get("votes"), doc.get("courseCode")
+    )
+    if cached:
+        return cached
+    return construct(schemas.ProblemOut, doc)
+
+
+@router.get("/{problem_id}/bundle", response_model=schemas.ProblemBundle)
+async def get_problem_bundle(
+    problem_id: str,
+    request: Request,
+    responsesCursor: Optional[str] = None,
+    responsesLimit: int = Query(BUNDLE_PAGE_SIZE, ge=1),
+    commentsCursor: Optional[str] = None,
+    commentsLimit: int = Query(BUNDLE_PAGE_SIZE, ge=1),
+):
+    """The problem with a page of its responses and comments.
+
+    The three queries run concurrently, then every author on the page is
+    resolved with one batched users query.
+    """
+    db = read_db(request)
+    pid = _objid(problem_id)
+    doc, (responses, responses_next), (comments, comments_next) = await asyncio.gather(
+        db.problems.find_one({"_id": pid}),
+        fetch_page(db.responses, {"problemId": pid}, RESPONSE_SORT, responsesCursor, responsesLimit),
+        fetch_page(db.comments, {"problemId": pid}, COMMENT_SORT, commentsCursor, commentsLimit),
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    try:
+        await get_loaders(request).attach_authors([doc, *responses, *comments])
+    except Exception:
+        pass
     try:
-        return schemas.ProblemOut.parse_obj(doc)
+        course = await get_catalog(request.app).get(db, doc.get("courseId"))
+        if course:
+            doc["courseCode"] = course.get("courseCode")
     except Exception:
-        return doc
+        pass
+    return construct(schemas.ProblemBundle, {
+        "problem": construct(schemas.ProblemOut, doc),
+        "responses": [construct(schemas.ResponseOut, d) for d in responses],
+        "responsesNextCursor": responses_next,
+        "comments": [construct(schemas.CommentOut, d) for d in comments],
+        "commentsNextCursor": comments_next,
+    })
 
 
 @router.post("/{problem_id}/vote", response_model=schemas.ProblemOut)
 async def vote_problem(problem_id: str, request: Request):
-    db = request.app.state.db
     body = await request.json()
     delta = int(body.get("delta", 1))
-    res = await db.problems.find_one_and_update({"_id": _objid(problem_id)}, {"$inc": {"votes": delta}}, return_document=True)
-    try:
-        return schemas.ProblemOut.parse_obj(res)
-    except Exception:
-        return res
+    # buffered and flushed in bulk; the count returned is optimistic
+    res = await record_vote(request, "problems", _objid(problem_id), "votes", delta)
+    if not res:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    return construct(schemas.ProblemOut, res)
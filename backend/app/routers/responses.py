@@ -1,35 +1,50 @@
-from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, Depends
+from ..database import read_db
 from ..models import schemas
+from ..services import auth as auth_service
+from ..services.loaders import batch_authors, get_loaders
+from ..services.pagination import fetch_page, set_next_cursor
+from ..services.projection import FieldSelection
+from ..services.serialization import construct, json_response
+from ..services.votes import record_vote
+from ..services.streaming import ndjson_response, open_cursor, wants_stream
 from .users import get_current_user
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
+# highest voted first; matches the (problemId, upvotes, _id) index
+LIST_SORT = [("upvotes", -1), ("_id", -1)]
+
 
 def _objid(id_str: str):
     return __import__("bson").ObjectId(id_str)
 
 
 @router.get("/problem/{problem_id}", response_model=List[schemas.ResponseOut])
-async def get_responses(problem_id: str, request: Request):
-    db = request.app.state.db
-    cur = db.responses.find({"problemId": _objid(problem_id)}).sort([("upvotes", -1)])
-    items = []
-    async for doc in cur:
-        # attach author username if possible
-        try:
-            author_id = doc.get("authorId")
-            if author_id:
-                user = await db.users.find_one({"_id": author_id})
-                if user:
-                    doc["authorUsername"] = user.get("username")
-        except Exception:
-            pass
-        try:
-            items.append(schemas.ResponseOut.parse_obj(doc))
-        except Exception:
-            items.append(doc)
-    return items
+async def get_responses(
+    problem_id: str,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    stream: bool = False,
+    fields: Optional[str] = None,
+):
+    db = read_db(request)
+    q = {"problemId": _objid(problem_id)}
+    sel = FieldSelection(schemas.ResponseOut, fields, required=[f for f, _ in LIST_SORT])
+    if wants_stream(request, stream):
+        cur = open_cursor(db.responses, q, LIST_SORT, cursor, limit, sel.projection)
+        return ndjson_response(cur, schemas.ResponseOut, batch_authors(db), sel.include)
+    docs, next_cursor = await fetch_page(db.responses, q, LIST_SORT, cursor, limit, sel.projection)
+    set_next_cursor(response, next_cursor)
+    # attach author usernames with one batched lookup
+    try:
+        await get_loaders(request).attach_authors(docs)
+    except Exception:
+        pass
+    return json_response(schemas.ResponseOut, docs, sel.include, response)
 
 
 @router.post("", status_code=201, response_model=schemas.ResponseOut)
@@ -54,21 +69,18 @@ async def create_response(payload: schemas.ResponseCreate, request: Request, cur
         pass
     # increment user's contribution count
     try:
-        await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}})
+        await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}, "$currentDate": {"updatedAt": True}})
+        auth_service.invalidate_user(current_user.get("_id"))
     except Exception:
         pass
-    try:
-        return schemas.ResponseOut.parse_obj(created)
-    except Exception:
-        return created
+    return construct(schemas.ResponseOut, created)
 
 @router.post("/{response_id}/vote", response_model=schemas.ResponseOut)
 async def vote_response(response_id: str, request: Request):
-    db = request.app.state.db
     body = await request.json()
     delta = int(body.get("delta", 1))
-    res = await db.responses.find_one_and_update({"_id": _objid(response_id)}, {"$inc": {"upvotes": delta}}, return_document=True)
-    try:
-        return schemas.ResponseOut.parse_obj(res)
-    except Exception:
-        return res
+    # buffered and flushed in bulk; the count returned is optimistic
+    res = await record_vote(request, "responses", _objid(response_id), "upvotes", delta)
+    if not res:
+        raise HTTPException(status_code=404, detail="Response not found")
+    return construct(schemas.ResponseOut, res)
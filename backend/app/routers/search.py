@@ -1,16 +1,70 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, HTTPException, Query
+from ..models import schemas
+from ..services.pagination import page_limit
+from ..services.course_catalog import get_catalog
+from ..services.search_index import KINDS, get_search_index
+from ..services.suggest import TOP_K
+from typing import List, Optional
 
 router = APIRouter()
 
 
-@router.get("")
-async def search(q: str, request: Request):
-    db = request.app.state.db
-    # naive text search across courses and problems
-    courses = []
-    async for c in db.courses.find({"$text": {"$search": q}}).limit(10):
-        courses.append(c)
-    problems = []
-    async for p in db.problems.find({"$text": {"$search": q}}).limit(20):
-        problems.append(p)
-    return {"courses": courses, "problems": problems}
+@router.get("", response_model=schemas.SearchResults)
+async def search(
+    request: Request,
+    q: str,
+    type: Optional[str] = None,
+    offset: int = Query(0, ge=0, le=1000),
+    limit: Optional[int] = None,
+):
+    """Ranked search across courses, problems and summaries.
+
+    `type` optionally restricts results to a comma-separated subset of
+    `courses`, `problems` and `summaries`.
+    """
+    index = get_search_index(request.app)
+    if not index.ready:
+        raise HTTPException(status_code=503, detail="Search index is warming up", headers={"Retry-After": "2"})
+    kinds = None
+    if type:
+        kinds = [k.strip() for k in type.split(",") if k.strip()]
+        unknown = [k for k in kinds if k not in KINDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown type: {', '.join(unknown)}")
+    total, exact, hits = index.search(q, kinds, offset, page_limit(limit))
+    end = offset + len(hits)
+    return schemas.SearchResults(
+        query=q,
+        total=total,
+        totalExact=exact,
+        offset=offset,
+        nextOffset=end if end < total else None,
+        results=[
+            schemas.SearchHit(
+                kind=meta.kind,
+                id=meta.id,
+                score=round(score, 4),
+                title=meta.title,
+                courseId=meta.courseId,
+                courseCode=meta.courseCode,
+            )
+            for score, meta in hits
+        ],
+    )
+
+
+@router.get("/suggest", response_model=List[schemas.CourseSuggestion])
+async def suggest(request: Request, q: str, limit: int = Query(8, ge=1, le=TOP_K)):
+    """Course autocomplete: the most enrolled courses whose code, name word
+    or tag starts with `q`."""
+    matches = await get_catalog(request.app).suggest(request.app.state.db, q, limit)
+    return [
+        schemas.CourseSuggestion(
+            courseId=course["_id"],
+            courseCode=course.get("courseCode"),
+            courseName=course.get("courseName"),
+            field=field,
+            match=text,
+        )
+        for course, text, field in matches
+    ]
@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi import APIRouter, Request, Response, HTTPException, Depends
+from ..database import read_db
 from ..models import schemas
+from ..services import auth as auth_service
+from ..services.conditional import SHORT, bump, not_modified
+from ..services.course_catalog import get_catalog
+from ..services.ingest import new_summary
+from ..services.pagination import fetch_page, set_next_cursor
+from ..services.projection import FieldSelection
+from ..services.response_cache import doc_tag, get_response_cache
+from ..services.search_index import get_search_index
+from ..services.serialization import construct, json_response
+from ..services.votes import record_vote
+from ..services.streaming import ndjson_response, open_cursor, wants_stream
 from .users import get_current_user
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
+# newest first; matches the (courseId, createdAt, _id) and (createdAt, _id) indexes
+LIST_SORT = [("createdAt", -1), ("_id", -1)]
+
 
 def _objid(id_str: str):
     return __import__("bson").ObjectId(id_str)
@@ -14,61 +29,60 @@ def _objid(id_str: str):
 async def create_summary(payload: schemas.SummaryCreate, request: Request, current_user: dict = Depends(get_current_user)):
     db = request.app.state.db
     now = __import__("datetime").datetime.utcnow()
-    doc = payload.dict()
 
     # Allow payload.courseId to be either an ObjectId string or a courseCode
-    course_obj = None
-    try:
-        course_obj = await db.courses.find_one({"_id": _objid(payload.courseId)})
-    except Exception:
-        course_obj = None
-
-    if not course_obj:
-        course_obj = await db.courses.find_one({"courseCode": {"$regex": f"^{payload.courseId.strip()}$", "$options": "i"}})
-
+    course_obj = await get_catalog(request.app).resolve(db, payload.courseId)
     if not course_obj:
         raise HTTPException(status_code=400, detail="Invalid course identifier")
 
-    doc.update({
-        "courseId": course_obj.get("_id"),
-        "courseCode": course_obj.get("courseCode"),
-        "authorId": current_user.get("_id"),
-        "authorUsername": current_user.get("username"),
-        "votes": 0,
-        "createdAt": now,
-        "updatedAt": now,
-    })
+    doc = new_summary(payload.dict(), course_obj, current_user, now)
     res = await db.summaries.insert_one(doc)
+    await bump(db, "summaries")
+    await get_response_cache(request.app).invalidate("summaries", doc_tag("courses", doc["courseId"]))
     created = await db.summaries.find_one({"_id": res.inserted_id})
     # increment user's contribution count
     try:
-        await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}})
+        await db.users.update_one({"_id": current_user.get("_id")}, {"$inc": {"contributionCount": 1}, "$currentDate": {"updatedAt": True}})
+        auth_service.invalidate_user(current_user.get("_id"))
     except Exception:
         pass
     try:
-        return schemas.SummaryOut.parse_obj(created)
+        get_search_index(request.app).add("summaries", created)
     except Exception:
-        return created
+        pass
+    return construct(schemas.SummaryOut, created)
 
 
 @router.post("/{summary_id}/vote", response_model=schemas.SummaryOut)
 async def vote_summary(summary_id: str, request: Request):
-    db = request.app.state.db
     body = await request.json()
     delta = int(body.get("delta", 1))
-    res = await db.summaries.find_one_and_update({"_id": _objid(summary_id)}, {"$inc": {"votes": delta}}, return_document=True)
-    try:
-        return schemas.SummaryOut.parse_obj(res)
-    except Exception:
-        return res
+    # buffered and flushed in bulk; the count returned is optimistic
+    res = await record_vote(request, "summaries", _objid(summary_id), "votes", delta)
+    if not res:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    return construct(schemas.SummaryOut, res)
 
 
 @router.get("", response_model=List[schemas.SummaryOut])
-async def list_summaries(request: Request, courseId: str = None, courseCode: str = None):
-    db = request.app.state.db
+async def list_summaries(
+    request: Request,
+    response: Response,
+    courseId: str = None,
+    courseCode: str = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    stream: bool = False,
+    fields: Optional[str] = None,
+):
+    db = read_db(request)
+    cached = await not_modified(request, response, db, ("summaries", "courses"), SHORT)
+    if cached:
+        return cached
+    sel = FieldSelection(schemas.SummaryOut, fields, required=[f for f, _ in LIST_SORT])
     q = {}
     if courseCode:
-        course = await db.courses.find_one({"courseCode": {"$regex": f"^{courseCode.strip()}$", "$options": "i"}})
+        course = await get_catalog(request.app).get_by_code(db, courseCode)
         if not course:
             return []
         q["courseId"] = course.get("_id")
@@ -78,11 +92,9 @@ async def list_summaries(request: Request, courseId: str = None, courseCode: str
         except Exception:
             q["courseId"] = courseId
 
-    cur = db.summaries.find(q).sort([("createdAt", -1)])
-    items = []
-    async for doc in cur:
-        try:
-            items.append(schemas.SummaryOut.parse_obj(doc))
-        except Exception:
-            items.append(doc)
-    return items
+    if wants_stream(request, stream):
+        cur = open_cursor(db.summaries, q, LIST_SORT, cursor, limit, sel.projection)
+        return ndjson_response(cur, schemas.SummaryOut, include=sel.include, response=response)
+    docs, next_cursor = await fetch_page(db.summaries, q, LIST_SORT, cursor, limit, sel.projection)
+    set_next_cursor(response, next_cursor)
+    return json_response(schemas.SummaryOut, docs, sel.include, response)
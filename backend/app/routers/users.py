@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
+from ..database import read_db
 from ..models import schemas
 from ..services import auth as auth_service
 from typing import Optional
@@ -14,14 +15,18 @@ async def get_current_user(request: Request):
     if scheme.lower() != "bearer":
         raise HTTPException(status_code=401, detail="Invalid auth scheme")
     try:
-        payload = auth_service.decode_access_token(token)
+        payload = auth_service.decode_access_token_cached(token)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
     user_id = payload.get("sub")
-    user = await request.app.state.db.users.find_one({"_id": __import__("bson").ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    user = auth_service.get_cached_user(user_id)
+    if user is None:
+        user = await request.app.state.db.users.find_one({"_id": __import__("bson").ObjectId(user_id)})
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        auth_service.cache_user(user)
+    # the cached document is shared; hand each request its own copy
+    return dict(user)
 
 
 @router.get("/me", response_model=schemas.UserData)
@@ -31,7 +36,7 @@ async def me(current_user: dict = Depends(get_current_user)):
 
 @router.get("/{user_id}", response_model=schemas.UserData)
 async def get_user(user_id: str, request: Request):
-    db = request.app.state.db
+    db = read_db(request)
     user = await db.users.find_one({"_id": __import__("bson").ObjectId(user_id)})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
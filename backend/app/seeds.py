@@ -1,6 +1,8 @@
 from datetime import datetime
 from typing import List
 
+from .services.course_catalog import normalize_code
+
 
 MOCK_COURSES = [
     {
@@ -184,8 +186,12 @@ def _parse_dt(s: str):
         return datetime.utcnow()
 
 
-async def seed_db(app):
-    db = app.state.db
+async def seed_db(db):
+    """Insert the mock users, courses and problems into empty collections.
+
+    Runs once per database through the migration ledger (see
+    `migrations.py`); collections that already hold data are left alone.
+    """
     # Seed users minimal (only usernames used in problems)
     users = [
         {"username": "alex_student", "email": "alex@ucalgary.ca", "degree": "Computer Science", "joinedAt": _parse_dt("2024-09-01T00:00:00Z")},
@@ -193,32 +199,28 @@ async def seed_db(app):
     ]
 
     # Insert users if none
-    try:
-        if await db.users.count_documents({}) == 0:
-            await db.users.insert_many(users)
+    if await db.users.estimated_document_count() == 0:
+        await db.users.insert_many(users)
 
-        # Seed courses if none
-        if await db.courses.count_documents({}) == 0:
-            docs = []
-            for c in MOCK_COURSES:
-                doc = c.copy()
-                doc["createdAt"] = _parse_dt(doc.get("createdAt"))
-                doc["updatedAt"] = _parse_dt(doc.get("updatedAt"))
-                docs.append(doc)
-            res = await db.courses.insert_many(docs)
-
-            # Create some problems linked to the first two inserted courses
-            inserted_ids = list(res.inserted_ids)
-            problems = []
-            for i, p in enumerate(MOCK_PROBLEMS):
-                problem = p.copy()
-                problem["courseId"] = inserted_ids[min(i, len(inserted_ids) - 1)]
-                problem["createdAt"] = _parse_dt(problem.get("createdAt"))
-                problem["updatedAt"] = _parse_dt(problem.get("updatedAt"))
-                problems.append(problem)
-            if problems:
-                await db.problems.insert_many(problems)
-    except Exception:
-        import logging
+    # Seed courses if none
+    if await db.courses.estimated_document_count() == 0:
+        docs = []
+        for c in MOCK_COURSES:
+            doc = c.copy()
+            doc["createdAt"] = _parse_dt(doc.get("createdAt"))
+            doc["updatedAt"] = _parse_dt(doc.get("updatedAt"))
+            doc["courseCodeKey"] = normalize_code(doc.get("courseCode"))
+            docs.append(doc)
+        res = await db.courses.insert_many(docs)
 
-        logging.getLogger("uvicorn.error").exception("Seeding DB failed")
+        # Create some problems linked to the first two inserted courses
+        inserted_ids = list(res.inserted_ids)
+        problems = []
+        for i, p in enumerate(MOCK_PROBLEMS):
+            problem = p.copy()
+            problem["courseId"] = inserted_ids[min(i, len(inserted_ids) - 1)]
+            problem["createdAt"] = _parse_dt(problem.get("createdAt"))
+            problem["updatedAt"] = _parse_dt(problem.get("updatedAt"))
+            problems.append(problem)
+        if problems:
+            await db.problems.insert_many(problems)
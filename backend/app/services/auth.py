@@ -3,6 +3,14 @@ from jose import jwt, JWTError
 from datetime import datetime, timedelta
 from pydantic_settings import BaseSettings
 from typing import Optional
+import hashlib
+import time
+
+from uarchive_common.metrics import registry
+# routers catch PasswordPoolOverloaded from here
+from uarchive_common.passwords import PasswordPool, PasswordPoolOverloaded
+
+from .cache import TTLCache
 
 
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
@@ -11,6 +19,22 @@ pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 class Settings(BaseSettings):
     JWT_SECRET: str = "changeme"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
+    # Argon2 work runs off the event loop in this pool ("thread" or "process").
+    # argon2-cffi releases the GIL, so threads already hash in parallel.
+    PASSWORD_POOL_KIND: str = "thread"
+    PASSWORD_POOL_WORKERS: int = 2
+    # Jobs allowed queued or running before new ones are rejected
+    PASSWORD_POOL_MAX_PENDING: int = 32
+    # Decoded tokens are cached until their `exp` (at most this long) ...
+    TOKEN_CACHE_TTL_SECONDS: float = 15 * 60
+    TOKEN_CACHE_SIZE: int = 10_000
+    # ... and user documents for this long, unless invalidated by a write.
+    # Other workers only see a write once their entry expires.
+    USER_CACHE_TTL_SECONDS: float = 30
+    USER_CACHE_SIZE: int = 10_000
+    # Shared secret for /api/admin routes (X-Admin-Token header); they are
+    # disabled while this is empty
+    ADMIN_TOKEN: str = ""
     model_config = {"extra": "ignore"}
 
 
@@ -25,6 +49,21 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+password_pool = PasswordPool(
+    kind=settings.PASSWORD_POOL_KIND,
+    workers=settings.PASSWORD_POOL_WORKERS,
+    max_pending=settings.PASSWORD_POOL_MAX_PENDING,
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run("verify", verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run("hash", get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -42,3 +81,38 @@ def decode_access_token(token: str) -> dict:
         return payload
     except JWTError:
         raise
+
+
+_cache_requests = registry.counter("auth_cache_requests_total", "Authentication cache lookups", ["cache", "result"])
+
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+def decode_access_token_cached(token: str) -> dict:
+    """`decode_access_token` memoized by a hash of the token until it expires."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        _cache_requests.inc(cache="token", result="hit")
+        return payload
+    _cache_requests.inc(cache="token", result="miss")
+    payload = decode_access_token(token)
+    exp = payload.get("exp")
+    token_cache.set(key, payload, ttl=float(exp) - time.time() if exp else None)
+    return payload
+
+
+def get_cached_user(user_id: str) -> Optional[dict]:
+    user = user_cache.get(str(user_id))
+    _cache_requests.inc(cache="user", result="hit" if user is not None else "miss")
+    return user
+
+
+def cache_user(user: dict) -> None:
+    user_cache.set(str(user.get("_id")), user)
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a cached user document after writing to it."""
+    user_cache.pop(str(user_id))
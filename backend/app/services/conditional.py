@@ -0,0 +1,118 @@
+"""ETags and conditional GETs.
+
+List routes are tagged from per-collection version counters. Every write to
+a collection bumps its counter in the `versions` collection (`bump`).
+Buffered vote flushes bump too, but at most once per
+`VOTE_VERSION_INTERVAL_SECONDS` per collection, so a stream of votes does not
+invalidate every tag on every flush. A list route reads the counters it
+depends on with one small query, and hashes them with the path, the query
+string and the `Accept` header into its ETag. A matching `If-None-Match`
+gets a bodyless 304 before the route queries or serializes anything.
+
+Single-document routes are tagged from the document itself (`_id`,
+`updatedAt` and its vote count) once it has been read: that costs no
+`versions` round trip and is not disturbed by writes to other documents.
+
+Tags are weak (`W/"..."`): GZip middleware changes the bytes of a body
+without changing the tag, so they only promise the same content.
+
+The counters are read before the route reads its data. A write that lands
+between the two gives a newer body under an older tag, so the next request
+simply gets a 200. The reverse order could answer 304 to a stale copy.
+Writes made outside the app (restores, manual edits) must call `bump` too,
+or clients may keep a stale copy until the next in-app write.
+"""
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import Request, Response
+
+logger = logging.getLogger("uvicorn.error")
+
+VERSIONS = "versions"
+
+# Cache-Control policies; routes pick one next to their handler
+NO_CACHE = "public, no-cache"  # always revalidate; 304s keep that cheap
+SHORT = "public, max-age=15, stale-while-revalidate=60"
+CATALOG = "public, max-age=60, stale-while-revalidate=300"
+
+
+async def bump(db, *collections: str) -> None:
+    """Record that `collections` changed; best effort, never raises."""
+    for name in collections:
+        try:
+            await db[VERSIONS].update_one({"_id": name}, {"$inc": {"v": 1}}, upsert=True)
+        except Exception:
+            logger.exception("Failed to bump version of %s", name)
+
+
+async def versions(db, collections: Sequence[str]) -> Dict[str, int]:
+    found = {doc["_id"]: doc.get("v", 0) async for doc in db[VERSIONS].find({"_id": {"$in": list(collections)}})}
+    return {name: found.get(name, 0) for name in collections}
+
+
+def _weak_tag(parts) -> str:
+    return 'W/"' + hashlib.sha1("|".join(parts).encode()).hexdigest()[:27] + '"'
+
+
+def _request_parts(request: Request) -> List[str]:
+    return [request.url.path, str(request.query_params), request.headers.get("accept", "")]
+
+
+def etag_for(request: Request, current: Dict[str, int]) -> str:
+    return _weak_tag([f"{name}={v}" for name, v in sorted(current.items())] + _request_parts(request))
+
+
+def document_etag(request: Request, *values) -> str:
+    """Tag for one document's representation; `values` are the fields the
+    body depends on that can change (e.g. `updatedAt` and the vote count)."""
+    return _weak_tag([repr(v) for v in values] + _request_parts(request))
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison: only the opaque tags count
+    etag = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _conditional(request: Request, response: Response, etag: str, cache_control: str) -> Optional[Response]:
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept"}
+    if matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def document_not_modified(request: Request, response: Response, cache_control: str, *values) -> Optional[Response]:
+    """`not_modified` for a route that has already read its document; tags
+    it with `document_etag(request, *values)`."""
+    return _conditional(request, response, document_etag(request, *values), cache_control)
+
+
+async def not_modified(
+    request: Request,
+    response: Response,
+    db,
+    collections: Sequence[str],
+    cache_control: str,
+) -> Optional[Response]:
+    """Tag `response` with an ETag and Cache-Control and return a 304 if the
+    client already has this version, else None.
+
+    Pass the same `db` handle the route reads from, so a route reading from
+    a secondary compares against that secondary's counters. If the counters
+    cannot be read, the route answers uncached rather than failing.
+    """
+    try:
+        etag = etag_for(request, await versions(db, collections))
+    except Exception:
+        logger.exception("Failed to read collection versions")
+        return None
+    return _conditional(request, response, etag, cache_control)
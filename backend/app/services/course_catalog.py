@@ -0,0 +1,166 @@
+"""Memory-resident index of the `courses` collection.
+
+The catalog is small and rarely written, but almost every problem and summary
+route needs it to attach `courseCode` or to resolve a course code typed by a
+user. Instead of hitting Mongo for each of those joins, the whole collection
+is held in memory, indexed by `_id`, by normalized course code and by a
+prefix trie for autocomplete (see `suggest.py`).
+
+The catalog is loaded during startup and refreshed when a course is created
+locally. It also expires after `COURSE_CACHE_TTL_SECONDS`, so a course created
+through another worker becomes visible here within one TTL. Lookups that miss
+the catalog fall back to Mongo once; a miss there is remembered for the same
+TTL, so unknown codes and ids do not reach Mongo on every request.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+from .suggest import PrefixTrie, build_trie
+
+logger = logging.getLogger("uvicorn.error")
+
+_WS = re.compile(r"\s+")
+
+# bound on remembered misses; the whole set is dropped when it fills up
+MAX_MISSES = 10_000
+
+
+def normalize_code(code: str) -> str:
+    """Canonical form of a course code: upper-case, whitespace collapsed."""
+    return _WS.sub(" ", (code or "").strip()).upper()
+
+
+class CourseCatalog:
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._by_id: Dict[ObjectId, dict] = {}
+        self._by_code: Dict[str, dict] = {}
+        self.trie = PrefixTrie()
+        self._loaded_at: Optional[float] = None
+        # ("id", ObjectId) / ("code", key) -> when the miss expires
+        self._misses: Dict[tuple, float] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    async def refresh(self, db) -> None:
+        """Reload the whole catalog from Mongo."""
+        async with self._lock:
+            await self._load(db)
+
+    async def _load(self, db) -> None:
+        by_id: Dict[ObjectId, dict] = {}
+        by_code: Dict[str, dict] = {}
+        async for doc in db.courses.find():
+            by_id[doc["_id"]] = doc
+            if doc.get("courseCode"):
+                by_code[normalize_code(doc["courseCode"])] = doc
+        # ~1s per 5k courses of pure-Python work; keep it off the event loop
+        trie = await asyncio.to_thread(build_trie, list(by_id.values()))
+        # swap atomically so readers never see a half-built index
+        self._by_id, self._by_code, self.trie = by_id, by_code, trie
+        self._misses = {}
+        self._loaded_at = time.monotonic()
+        logger.info("Course catalog loaded: %d courses", len(by_id))
+
+    async def ensure_fresh(self, db) -> None:
+        if not self.is_stale():
+            return
+        async with self._lock:
+            # another task may have refreshed while we waited for the lock
+            if self.is_stale():
+                await self._load(db)
+
+    def _missed(self, key: tuple) -> bool:
+        expires = self._misses.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._misses[key]
+            return False
+        return True
+
+    def _remember_miss(self, key: tuple) -> None:
+        if len(self._misses) >= MAX_MISSES:
+            self._misses = {}
+        self._misses[key] = time.monotonic() + self.ttl_seconds
+
+    def add(self, doc: dict) -> None:
+        """Insert or replace a single course without a full reload."""
+        self._by_id[doc["_id"]] = doc
+        self._misses.pop(("id", doc["_id"]), None)
+        if doc.get("courseCode"):
+            self._by_code[normalize_code(doc["courseCode"])] = doc
+            self._misses.pop(("code", normalize_code(doc["courseCode"])), None)
+        self.trie.add(doc)
+
+    async def get(self, db, course_id) -> Optional[dict]:
+        if course_id is None:
+            return None
+        await self.ensure_fresh(db)
+        if not isinstance(course_id, ObjectId):
+            if not ObjectId.is_valid(course_id):
+                return None
+            course_id = ObjectId(course_id)
+        doc = self._by_id.get(course_id)
+        if doc is None and not self._missed(("id", course_id)):
+            # created through another worker since our last refresh: an _id
+            # lookup is cheap, so pick it up now rather than waiting for the TTL
+            doc = await db.courses.find_one({"_id": course_id})
+            if doc:
+                self.add(doc)
+            else:
+                self._remember_miss(("id", course_id))
+        return doc
+
+    async def get_by_code(self, db, code: str) -> Optional[dict]:
+        key = normalize_code(code)
+        if not key:
+            return None
+        await self.ensure_fresh(db)
+        doc = self._by_code.get(key)
+        if doc is None and not self._missed(("code", key)):
+            # exact match on the unique courseCodeKey index, for courses
+            # created through another worker since our last refresh
+            doc = await db.courses.find_one({"courseCodeKey": key})
+            if doc:
+                self.add(doc)
+            else:
+                self._remember_miss(("code", key))
+        return doc
+
+    async def resolve(self, db, ident: str) -> Optional[dict]:
+        """Look a course up by ObjectId string, falling back to course code."""
+        return await self.get(db, ident) or await self.get_by_code(db, ident)
+
+    async def suggest(self, db, prefix: str, limit: int = 8) -> List[tuple]:
+        """Autocomplete `prefix` against codes, names and tags."""
+        await self.ensure_fresh(db)
+        return self.trie.complete(prefix, limit)
+
+    async def all(self, db) -> List[dict]:
+        await self.ensure_fresh(db)
+        return list(self._by_id.values())
+
+    async def attach_course_codes(self, db, docs: List[dict]) -> List[dict]:
+        """Set `courseCode` on every doc from its `courseId`."""
+        await self.ensure_fresh(db)
+        for doc in docs:
+            course = self._by_id.get(doc.get("courseId"))
+            if course:
+                doc["courseCode"] = course.get("courseCode")
+        return docs
+
+
+def get_catalog(app) -> CourseCatalog:
+    return app.state.course_catalog
@@ -0,0 +1,224 @@
+"""Bulk NDJSON ingest for problems and summaries.
+
+The upload is read as a stream, one JSON object per line, and handled in
+batches of `INGEST_BATCH_SIZE` lines. For each batch:
+
+- every line is validated against the create schema;
+- each distinct course identifier is resolved once;
+- the valid documents go to Mongo in one unordered `insert_many`, so a bad
+  document does not stop the rest.
+
+Failures are reported by line number. Side effects that the single-item
+create routes repeat per document run once per upload: the author's
+`contributionCount` gets one aggregated `$inc`, and the version counters
+and response cache are invalidated once per course touched.
+"""
+import json
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+from ..database import settings
+from ..models import schemas
+from . import auth as auth_service
+from .conditional import bump
+from .course_catalog import get_catalog
+from .response_cache import doc_tag, get_response_cache
+from .search_index import get_search_index
+
+logger = logging.getLogger("uvicorn.error")
+
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+
+def new_problem(payload: dict, course: dict, user: dict, now: datetime) -> dict:
+    doc = dict(payload)
+    doc.update({
+        "courseId": course.get("_id"),
+        "courseCode": course.get("courseCode"),
+        "authorId": user.get("_id"),
+        "votes": 0,
+        "createdAt": now,
+        "updatedAt": now,
+        "isVerified": False,
+        "isFlagged": False,
+    })
+    return doc
+
+
+def new_summary(payload: dict, course: dict, user: dict, now: datetime) -> dict:
+    doc = dict(payload)
+    doc.update({
+        "courseId": course.get("_id"),
+        "courseCode": course.get("courseCode"),
+        "authorId": user.get("_id"),
+        "authorUsername": user.get("username"),
+        "votes": 0,
+        "createdAt": now,
+        "updatedAt": now,
+    })
+    return doc
+
+
+class Kind(NamedTuple):
+    collection: str
+    model: Type[BaseModel]
+    build: Callable[[dict, dict, dict, datetime], dict]
+
+
+PROBLEMS = Kind("problems", schemas.ProblemCreate, new_problem)
+SUMMARIES = Kind("summaries", schemas.SummaryCreate, new_summary)
+
+
+async def read_lines(request: Request) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield (line number, line) from the request body as it arrives.
+
+    Blank lines are skipped. A line longer than `MAX_LINE_BYTES` is yielded
+    as None and its remainder discarded, so one runaway line cannot hold
+    the whole upload in memory.
+    """
+    # pieces of the line still being received; joined once its newline
+    # arrives, so each byte is copied a bounded number of times
+    partial: List[bytes] = []
+    partial_len = 0
+    line_no = 0
+    oversized = False
+    async for chunk in request.stream():
+        pieces = chunk.split(b"\n")
+        for piece in pieces[:-1]:
+            if partial:
+                partial.append(piece)
+                line = b"".join(partial)
+                partial, partial_len = [], 0
+            else:
+                line = piece
+            line_no += 1
+            if oversized or len(line) > MAX_LINE_BYTES:
+                oversized = False
+                yield line_no, None
+            elif line.strip():
+                yield line_no, line
+        if not oversized and pieces[-1]:
+            partial.append(pieces[-1])
+            partial_len += len(pieces[-1])
+            if partial_len > MAX_LINE_BYTES:
+                partial, partial_len = [], 0
+                oversized = True
+    line = b"".join(partial)
+    if oversized or len(line) > MAX_LINE_BYTES:
+        yield line_no + 1, None
+    elif line.strip():
+        yield line_no + 1, line
+
+
+class Ingest:
+    def __init__(self, request: Request, kind: Kind, user: dict):
+        self.request = request
+        self.kind = kind
+        self.user = user
+        self.db = request.app.state.db
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.courses: Counter = Counter()
+
+    def _error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    async def run(self) -> Dict:
+        batch: List[Tuple[int, Optional[bytes]]] = []
+        async for item in read_lines(self.request):
+            batch.append(item)
+            if len(batch) >= settings.INGEST_BATCH_SIZE:
+                await self._batch(batch)
+                batch = []
+        if batch:
+            await self._batch(batch)
+        await self._finish()
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+
+    async def _batch(self, batch: List[Tuple[int, Optional[bytes]]]) -> None:
+        self.received += len(batch)
+        valid: List[Tuple[int, BaseModel]] = []
+        for line_no, raw in batch:
+            if raw is None:
+                self._error(line_no, f"line longer than {MAX_LINE_BYTES} bytes")
+                continue
+            try:
+                valid.append((line_no, self.kind.model.model_validate(json.loads(raw))))
+            except ValidationError as exc:
+                self._error(line_no, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()))
+            except ValueError as exc:
+                self._error(line_no, f"invalid JSON: {exc}")
+
+        catalog = get_catalog(self.request.app)
+        courses = {}
+        for ident in {item.courseId for _, item in valid}:
+            courses[ident] = await catalog.resolve(self.db, ident)
+
+        now = datetime.utcnow()
+        lines: List[int] = []
+        docs: List[dict] = []
+        for line_no, item in valid:
+            course = courses.get(item.courseId)
+            if not course:
+                self._error(line_no, "Invalid course identifier")
+                continue
+            lines.append(line_no)
+            docs.append(self.kind.build(item.model_dump(), course, self.user, now))
+        if not docs:
+            return
+
+        failed = set()
+        try:
+            await self.db[self.kind.collection].insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            for err in exc.details.get("writeErrors", []):
+                failed.add(err["index"])
+                self._error(lines[err["index"]], err.get("errmsg", "write failed"))
+        except Exception as exc:
+            logger.exception("Bulk insert into %s failed", self.kind.collection)
+            for line_no in lines:
+                self._error(line_no, f"write failed: {exc}")
+            return
+
+        index = get_search_index(self.request.app)
+        for i, doc in enumerate(docs):
+            if i in failed:
+                continue
+            self.inserted += 1
+            self.courses[doc["courseId"]] += 1
+            try:
+                index.add(self.kind.collection, doc)
+            except Exception:
+                pass
+
+    async def _finish(self) -> None:
+        if not self.inserted:
+            return
+        # one update for the whole upload instead of one per document
+        try:
+            await self.db.users.update_one({"_id": self.user.get("_id")}, {"$inc": {"contributionCount": self.inserted}, "$currentDate": {"updatedAt": True}})
+            auth_service.invalidate_user(self.user.get("_id"))
+        except Exception:
+            pass
+        await bump(self.db, self.kind.collection)
+        tags = [self.kind.collection] + [doc_tag("courses", c) for c in self.courses]
+        await get_response_cache(self.request.app).invalidate(*tags)
+        logger.info("Bulk ingest: %d %s inserted across %d courses, %d lines failed",
+                    self.inserted, self.kind.collection, len(self.courses), self.failed)
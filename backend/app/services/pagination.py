@@ -0,0 +1,95 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+A page is addressed by the sort key of the last document the client has seen
+rather than by an offset, so every page is a bounded index range scan no
+matter how deep it is. Sort specs must end with `_id` as a tie-breaker, and
+each list route must have a compound index matching its filter and sort (see
+`app/indexes.py`).
+
+Cursors are opaque to clients: the sort values of the last document encoded
+with extended JSON (so ObjectId and datetime round-trip) and then base64url.
+The token for the next page is returned in the `X-Next-Cursor` header and is
+absent on the last page.
+"""
+import base64
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import json_util
+from fastapi import HTTPException, Response
+
+from ..database import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+SortSpec = Sequence[Tuple[str, int]]
+
+
+def page_limit(limit: Optional[int]) -> int:
+    """Clamp a client-supplied limit to the server-side bounds."""
+    if limit is None:
+        return settings.DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), settings.MAX_PAGE_SIZE))
+
+
+def encode_cursor(doc: dict, sort: SortSpec) -> str:
+    values = [doc.get(field) for field, _ in sort]
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort: SortSpec) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json_util.loads(raw.decode("utf-8"))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: Sequence[Any]) -> Dict[str, Any]:
+    """Filter matching every document strictly after `values` in `sort` order.
+
+    For a sort on (a desc, _id desc) this is
+    `{$or: [{a: {$lt: va}}, {a: va, _id: {$lt: vid}}]}`, generalized to any
+    number of fields and mixed directions.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        clause[field] = {"$lt" if direction < 0 else "$gt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def apply_cursor(query: Dict[str, Any], sort: SortSpec, cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return query
+    after = keyset_filter(sort, decode_cursor(cursor, sort))
+    return {"$and": [query, after]} if query else after
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort: SortSpec,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """Return one page of documents and the cursor for the following page."""
+    n = page_limit(limit)
+    # read one extra document to learn whether another page exists
+    cur = collection.find(apply_cursor(query, sort, cursor), projection).sort(list(sort)).limit(n + 1)
+    docs = [doc async for doc in cur]
+    next_cursor = None
+    if len(docs) > n:
+        docs = docs[:n]
+        next_cursor = encode_cursor(docs[-1], sort)
+    return docs, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,66 @@
+"""Sparse fieldsets for list endpoints.
+
+`?fields=title,votes` limits a list response to the named fields of its Out
+schema. The selection is turned into a Mongo projection, so the database,
+the network and the serializer only handle what the page shows. Without
+`fields`, routes still project onto the Out schema, which keeps seed-only or
+internal fields (`takeaway`, `isFlagged`, ...) out of the read path.
+"""
+from typing import Dict, Iterable, Optional, Sequence, Set, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+# Out fields that routers join in from another collection, and the stored
+# field they are derived from. Both are projected so the join still works
+# for documents that do not carry a denormalized copy.
+DERIVED_FROM = {
+    "authorUsername": "authorId",
+    "courseCode": "courseId",
+}
+
+
+def _field_names(model: Type[BaseModel]) -> Dict[str, str]:
+    """Map every accepted public name to the model attribute name."""
+    names = {}
+    for attr, info in model.model_fields.items():
+        names[attr] = attr
+        if info.alias:
+            names[info.alias] = attr
+    return names
+
+
+def _stored_name(model: Type[BaseModel], attr: str) -> str:
+    return model.model_fields[attr].alias or attr
+
+
+class FieldSelection:
+    """The fields a request asked for, and the projection that fetches them."""
+
+    def __init__(
+        self,
+        model: Type[BaseModel],
+        fields: Optional[str] = None,
+        required: Sequence[str] = (),
+    ):
+        self.model = model
+        # model attribute names to serialize, or None for the whole schema;
+        # pass it as `include` to the serialization helpers
+        self.include: Optional[Set[str]] = None
+        if fields:
+            known = _field_names(model)
+            requested = [f.strip() for f in fields.split(",") if f.strip()]
+            unknown = [f for f in requested if f not in known]
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(sorted(model.model_fields))}",
+                )
+            # the id is always returned so clients can address the document
+            self.include = {known[f] for f in requested} | {"id"}
+        attrs: Iterable[str] = self.include if self.include is not None else model.model_fields
+        stored = {_stored_name(model, a) for a in attrs}
+        stored |= {DERIVED_FROM[f] for f in list(stored) if f in DERIVED_FROM}
+        # sort keys must come back for the next-page cursor to be built
+        stored |= set(required) | {"_id"}
+        self.projection: Dict[str, int] = {f: 1 for f in sorted(stored)}
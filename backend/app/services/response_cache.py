@@ -0,0 +1,312 @@
+"""Response cache for hot GET routes, invalidated by tags that writes publish.
+
+Routes opt in by calling `ResponseCache.get` before doing any work and
+`ResponseCache.put` with the finished response and its tags. The key is
+the handler name, the path and the sorted query string. The tags name
+what the body was built from:
+
+- `course:<id>` for a course and anything listed under it;
+- `problem:<id>` for each problem on a page;
+- plain `problems`/`courses`/`summaries` for unfiltered lists.
+
+Create handlers and vote flushes call `invalidate` with the tags they
+touched.
+
+Two backends:
+
+- `LRUBackend`: per process, bounded by `RESPONSE_CACHE_MAX_BYTES`. An
+  invalidation only reaches the worker that made the write. Other workers
+  catch up within `RESPONSE_CACHE_TTL_SECONDS`.
+- `RedisBackend`: shared by every worker, speaking plain RESP to any
+  Redis-compatible server (`REDIS_URL`). Each tag is a set of keys. A
+  pooled connection the server has closed is replaced and the commands
+  re-sent once.
+
+Invalidation happens after the write. A read that started before the
+write can still store its older body just after the invalidation, and the
+TTL bounds how long that entry lives. Cache errors are logged and treated
+as misses.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from fastapi import Request, Response
+from uarchive_common.metrics import registry
+
+logger = logging.getLogger("uvicorn.error")
+
+# response headers worth replaying from a cached entry
+CACHED_HEADERS = ("content-type", "x-next-cursor")
+
+# collection -> tag kind for documents in it
+_KINDS = {"courses": "course", "problems": "problem", "summaries": "summary", "responses": "response", "comments": "comment"}
+
+_lookups = registry.counter("response_cache_requests_total", "Response cache lookups", ["route", "result"])
+_bytes = registry.gauge("response_cache_bytes", "Bytes held by the in-process response cache")
+
+
+def doc_tag(collection: str, doc_id) -> str:
+    return f"{_KINDS.get(collection, collection)}:{doc_id}"
+
+
+class LRUBackend:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        # key -> (value, expires_at, tags)
+        self._entries: "OrderedDict[str, Tuple[bytes, float, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: float) -> None:
+        if len(value) + len(key) > self.max_bytes:
+            return
+        self._drop(key)
+        tags = tuple(tags)
+        self._entries[key] = (value, time.monotonic() + ttl, tags)
+        self.size += len(value) + len(key)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+        _bytes.set(self.size)
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._drop(key)
+        _bytes.set(self.size)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= len(entry[0]) + len(key)
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RespError(Exception):
+    pass
+
+
+class _RespConnection:
+    """One connection speaking the Redis serialization protocol (RESP2)."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    async def read(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = await self.reader.readexactly(n + 2)
+            return data[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [await self.read() for _ in range(n)]
+        raise RespError(f"unexpected reply {line[:20]!r}")
+
+    async def pipeline(self, commands: List[tuple]) -> list:
+        self.writer.write(b"".join(self.encode(c) for c in commands))
+        await self.writer.drain()
+        replies = []
+        for _ in commands:
+            try:
+                replies.append(await self.read())
+            except RespError as exc:
+                replies.append(exc)
+        return replies
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RedisBackend:
+    def __init__(self, url: str, pool_size: int = 8, prefix: str = "rc:"):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self._idle: List[_RespConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self) -> _RespConnection:
+        conn = _RespConnection(*await asyncio.open_connection(self.host, self.port))
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in await conn.pipeline(setup):
+                if isinstance(reply, Exception):
+                    conn.close()
+                    raise reply
+        return conn
+
+    async def _run_on_new_connection(self, commands: List[tuple]) -> Tuple[_RespConnection, list]:
+        conn = await self._connect()
+        try:
+            return conn, await conn.pipeline(commands)
+        except BaseException:
+            conn.close()
+            raise
+
+    async def _run(self, commands: List[tuple]) -> list:
+        async with self._slots:
+            if not self._idle:
+                conn, replies = await self._run_on_new_connection(commands)
+            else:
+                conn = self._idle.pop()
+                try:
+                    replies = await conn.pipeline(commands)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # the server (or a proxy) closed this idle connection;
+                    # every command sent here is safe to repeat on a new one
+                    conn.close()
+                    conn, replies = await self._run_on_new_connection(commands)
+                except BaseException:
+                    conn.close()
+                    raise
+            self._idle.append(conn)
+            return replies
+
+    async def get(self, key: str) -> Optional[bytes]:
+        (value,) = await self._run([("GET", self.prefix + key)])
+        return value if isinstance(value, bytes) else None
+
+    async def set(self, key: str, value: bytes, tags: Iterable[str], ttl: float) -> None:
+        ms = max(1, int(ttl * 1000))
+        commands: List[tuple] = [("SET", self.prefix + key, value, "PX", ms)]
+        for tag in tags:
+            commands.append(("SADD", self.prefix + "tag:" + tag, self.prefix + key))
+            commands.append(("PEXPIRE", self.prefix + "tag:" + tag, ms))
+        await self._run(commands)
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        tag_keys = [self.prefix + "tag:" + tag for tag in tags]
+        if not tag_keys:
+            return
+        members = await self._run([("SMEMBERS", k) for k in tag_keys])
+        keys = {m for reply in members if isinstance(reply, list) for m in reply}
+        await self._run([("DEL", *keys, *tag_keys)])
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl = ttl_seconds
+
+    @staticmethod
+    def _route(request: Request) -> str:
+        endpoint = request.scope.get("endpoint")
+        return getattr(endpoint, "__name__", "") or request.url.path
+
+    @classmethod
+    def key(cls, request: Request) -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        return f"{cls._route(request)}:{request.url.path}?{query}"
+
+    async def get(self, request: Request, response: Optional[Response] = None) -> Optional[Response]:
+        """A replay of the cached response, carrying any headers already set
+        on the route's injected `response` (e.g. the ETag), or None."""
+        route = self._route(request)
+        try:
+            raw = await self.backend.get(self.key(request))
+        except Exception:
+            logger.exception("Response cache lookup failed")
+            raw = None
+        if raw is None:
+            _lookups.inc(route=route, result="miss")
+            return None
+        _lookups.inc(route=route, result="hit")
+        head, body = raw.split(b"\n", 1)
+        headers = json.loads(head)
+        if response is not None:
+            headers.update((k, v) for k, v in response.headers.items() if k.lower() != "content-length")
+        return Response(content=body, headers=headers)
+
+    async def put(self, request: Request, response: Response, tags: Iterable[str]) -> None:
+        if response.status_code != 200 or not isinstance(getattr(response, "body", None), bytes):
+            return
+        head = {k: v for k, v in response.headers.items() if k.lower() in CACHED_HEADERS}
+        try:
+            await self.backend.set(self.key(request), json.dumps(head).encode() + b"\n" + response.body, tags, self.ttl)
+        except Exception:
+            logger.exception("Response cache store failed")
+
+    async def invalidate(self, *tags: str) -> None:
+        if not tags:
+            return
+        try:
+            await self.backend.invalidate(tags)
+        except Exception:
+            logger.exception("Response cache invalidation failed for %s", ", ".join(tags))
+
+
+def build_response_cache(settings) -> Optional[ResponseCache]:
+    kind = settings.RESPONSE_CACHE_BACKEND
+    if kind == "memory":
+        backend = LRUBackend(settings.RESPONSE_CACHE_MAX_BYTES)
+    elif kind == "redis":
+        backend = RedisBackend(settings.REDIS_URL)
+    else:
+        return None
+    return ResponseCache(backend, settings.RESPONSE_CACHE_TTL_SECONDS)
+
+
+class _Disabled:
+    async def get(self, request, response=None):
+        return None
+
+    async def put(self, request, response, tags):
+        pass
+
+    async def invalidate(self, *tags):
+        pass
+
+
+def get_response_cache(app):
+    return getattr(app.state, "response_cache", None) or _Disabled()
@@ -0,0 +1,378 @@
+"""In-memory inverted index with BM25 ranking.
+
+Courses, problems and summaries are tokenized into one inverted index so a
+query returns a single ranked list across all three. The index is built in
+the background at startup, updated directly by the create routes in this
+worker, and caught up periodically from Mongo (`_id > last seen`) so
+documents created through other workers show up within
+`SEARCH_SYNC_INTERVAL_SECONDS`.
+
+Scoring is Okapi BM25 over a per-document bag of words in which title-like
+fields count twice. Each posting list is kept twice in compact arrays: in
+document order for lookups, and ordered by the term's BM25 weight in each
+document. Queries run the threshold algorithm over the weight-ordered lists
+and stop as soon as no unseen document can enter the requested page, so a
+query on a term present in most of the corpus reads a few dozen postings
+rather than all of them.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import re
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from bson import ObjectId
+
+logger = logging.getLogger("uvicorn.error")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into is it of on or that the this to was what when where which with".split()
+)
+
+K1 = 1.2
+B = 0.75
+# postings added since a list was last sorted by impact are scored
+# exhaustively; past this many the list is re-sorted
+MAX_UNSORTED = 1024
+# relative change in average document length that invalidates impact order
+AVGDL_DRIFT = 0.1
+# queries touching at most this many postings report an exact match count
+TOTAL_EXACT_LIMIT = 20_000
+
+KINDS = ("courses", "problems", "summaries")
+
+# ObjectIds from different workers are only ordered to the second, so each
+# sync re-reads a short window before the newest id it has seen
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def _text(*values) -> str:
+    parts = []
+    for v in values:
+        if isinstance(v, (list, tuple)):
+            parts.extend(str(x) for x in v if x)
+        elif v:
+            parts.append(str(v))
+    return " ".join(parts)
+
+
+def course_terms(doc: dict) -> List[str]:
+    title = _text(doc.get("courseCode"), doc.get("courseName"))
+    body = _text(doc.get("description"), doc.get("tags"), doc.get("department"), doc.get("professor"))
+    return tokenize(title) * 2 + tokenize(body)
+
+
+def problem_terms(doc: dict) -> List[str]:
+    title = _text(doc.get("title"), doc.get("courseCode"))
+    body = _text(doc.get("description"), doc.get("tags"), doc.get("examType"))
+    return tokenize(title) * 2 + tokenize(body)
+
+
+def summary_terms(doc: dict) -> List[str]:
+    title = _text(doc.get("title"), doc.get("courseCode"), doc.get("topic"))
+    body = _text(doc.get("content"), doc.get("tags"), doc.get("professor"))
+    return tokenize(title) * 2 + tokenize(body)
+
+
+_TERMS = {"courses": course_terms, "problems": problem_terms, "summaries": summary_terms}
+
+# fields read from Mongo when indexing each kind
+PROJECTIONS = {
+    "courses": {"courseCode": 1, "courseName": 1, "description": 1, "tags": 1, "department": 1, "professor": 1},
+    "problems": {"title": 1, "description": 1, "tags": 1, "examType": 1, "courseId": 1, "courseCode": 1},
+    "summaries": {"title": 1, "content": 1, "tags": 1, "topic": 1, "professor": 1, "courseId": 1, "courseCode": 1},
+}
+
+
+@dataclass
+class IndexedDoc:
+    kind: str
+    id: ObjectId
+    title: str
+    courseId: Optional[ObjectId]
+    courseCode: Optional[str]
+
+
+class _Postings:
+    """Postings for one term.
+
+    `docs`/`tfs` hold every posting in docno order (docnos only grow, so
+    adding is an append and looking up a document's tf is a bisect). `order`/`impacts` hold the
+    first `sorted_upto` of them again, sorted by their BM25 term weight; the
+    tail added since the last sort is scored exhaustively at query time.
+    """
+
+    __slots__ = ("docs", "tfs", "order", "impacts", "sorted_upto", "epoch")
+
+    def __init__(self):
+        self.docs = array("i")
+        self.tfs = array("H")
+        self.order = array("i")
+        self.impacts = array("d")
+        self.sorted_upto = 0
+        self.epoch = -1
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+
+class SearchIndex:
+    def __init__(self):
+        self._docs: List[Optional[IndexedDoc]] = []
+        self._lengths = array("I")
+        self._by_key: Dict[Tuple[str, ObjectId], int] = {}
+        self._postings: Dict[str, _Postings] = {}
+        self._kind_counts: Dict[str, int] = dict.fromkeys(KINDS, 0)
+        self._total_length = 0
+        self._count = 0
+        # average length the impact-ordered lists were built with; only
+        # moved (forcing a re-sort) once the live average drifts noticeably
+        self._avgdl = 1.0
+        self._epoch = 0
+        self._last_id: Dict[str, ObjectId] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return self._count
+
+    # -- indexing -----------------------------------------------------------
+
+    def add(self, kind: str, doc: dict) -> None:
+        """Index (or re-index) one document of `kind`."""
+        doc_id = doc["_id"]
+        key = (kind, doc_id)
+        if key in self._by_key:
+            self._remove(self._by_key.pop(key))
+        tf = Counter(_TERMS[kind](doc))
+        length = sum(tf.values())
+        if kind == "courses":
+            title = _text(doc.get("courseCode"), doc.get("courseName"))
+        else:
+            title = doc.get("title") or ""
+        docno = len(self._docs)
+        self._docs.append(
+            IndexedDoc(
+                kind=kind,
+                id=doc_id,
+                title=title,
+                courseId=doc_id if kind == "courses" else doc.get("courseId"),
+                courseCode=doc.get("courseCode"),
+            )
+        )
+        self._lengths.append(length)
+        self._by_key[key] = docno
+        postings = self._postings
+        for term, n in tf.items():
+            p = postings.get(term)
+            if p is None:
+                p = postings[term] = _Postings()
+            p.docs.append(docno)
+            p.tfs.append(min(n, 0xFFFF))
+        self._total_length += length
+        self._count += 1
+        self._kind_counts[kind] += 1
+
+    def _remove(self, docno: int) -> None:
+        # postings keep the stale entries; queries skip tombstoned docnos.
+        # Re-adding an indexed document is rare (sync skips known keys).
+        meta = self._docs[docno]
+        if meta is None:
+            return
+        self._total_length -= self._lengths[docno]
+        self._count -= 1
+        self._kind_counts[meta.kind] -= 1
+        self._docs[docno] = None
+
+    async def sync(self, db, course_codes: Optional[Dict[ObjectId, str]] = None) -> int:
+        """Index every document created since the last sync; returns how many."""
+        added = 0
+        for kind in KINDS:
+            query = {}
+            if kind in self._last_id:
+                since = ObjectId.from_datetime(self._last_id[kind].generation_time - SYNC_OVERLAP)
+                query = {"_id": {"$gt": since}}
+            cur = db[kind].find(query, PROJECTIONS[kind]).sort([("_id", 1)]).batch_size(1000)
+            async for doc in cur:
+                if isinstance(doc["_id"], ObjectId):
+                    self._last_id[kind] = doc["_id"]
+                # already indexed by a create route or an earlier overlap
+                if (kind, doc["_id"]) in self._by_key:
+                    continue
+                if course_codes and not doc.get("courseCode") and doc.get("courseId") in course_codes:
+                    doc["courseCode"] = course_codes[doc["courseId"]]
+                self.add(kind, doc)
+                added += 1
+                if added % 5000 == 0:
+                    # indexing is CPU-bound; let requests run between chunks
+                    await asyncio.sleep(0)
+        return added
+
+    async def optimize(self) -> None:
+        """Bring every posting list's impact order up to date, yielding to
+        the event loop between terms, so queries never pay for a big sort."""
+        self._refresh_avgdl()
+        for i, p in enumerate(list(self._postings.values())):
+            self._ensure_sorted(p)
+            if i % 256 == 0:
+                await asyncio.sleep(0)
+
+    # -- querying -----------------------------------------------------------
+
+    def _refresh_avgdl(self) -> None:
+        if not self._count:
+            return
+        live = self._total_length / self._count
+        if abs(live - self._avgdl) > AVGDL_DRIFT * self._avgdl:
+            self._avgdl = live
+            self._epoch += 1
+
+    def _ensure_sorted(self, p: _Postings) -> None:
+        tail = len(p.docs) - p.sorted_upto
+        if p.epoch == self._epoch and tail <= MAX_UNSORTED:
+            return
+        lengths = self._lengths
+        base = K1 * (1 - B)
+        per_len = K1 * B / self._avgdl
+        impacts = [tf * (K1 + 1) / (tf + base + per_len * lengths[d]) for d, tf in zip(p.docs, p.tfs)]
+        order = sorted(range(len(impacts)), key=impacts.__getitem__, reverse=True)
+        docs = p.docs
+        p.order = array("i", [docs[i] for i in order])
+        p.impacts = array("d", [impacts[i] for i in order])
+        p.sorted_upto = len(impacts)
+        p.epoch = self._epoch
+
+    def _estimate_total(self, plists: List[_Postings], wanted: Optional[Set[str]]) -> Tuple[int, bool]:
+        """Number of matching documents, and whether it is exact.
+
+        Counting a union means touching every posting, which is exactly what
+        ranking avoids, so broad queries get an estimate instead.
+        """
+        docs = self._docs
+        if len(plists) == 1 and wanted is None and self._count == len(docs):
+            return len(plists[0]), True
+        if sum(len(p) for p in plists) <= TOTAL_EXACT_LIMIT:
+            matched = set().union(*(p.docs for p in plists))
+            if wanted is None and self._count == len(docs):
+                return len(matched), True
+            return sum(1 for d in matched if docs[d] is not None and (wanted is None or docs[d].kind in wanted)), True
+        # at least as many as the largest list, scaled to the wanted kinds
+        largest = max(len(p) for p in plists)
+        if wanted is not None:
+            largest = int(largest * sum(self._kind_counts[k] for k in wanted) / max(self._count, 1))
+        return largest, False
+
+    def search(
+        self, query: str, kinds: Optional[Sequence[str]] = None, offset: int = 0, limit: int = 20
+    ) -> Tuple[int, bool, List[Tuple[float, IndexedDoc]]]:
+        """Return the number of matches (and whether that count is exact)
+        and one ranked page of them."""
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self._postings]
+        if not terms or not self._count:
+            return 0, True, []
+        self._refresh_avgdl()
+        n = self._count
+        plists = [self._postings[t] for t in terms]
+        weighted = []
+        for p in plists:
+            self._ensure_sorted(p)
+            df = len(p)
+            weighted.append((math.log(1 + max(n - df + 0.5, 0.5) / (df + 0.5)), p))
+        wanted = set(kinds) if kinds else None
+        docs = self._docs
+        lengths = self._lengths
+        base = K1 * (1 - B)
+        per_len = K1 * B / self._avgdl
+        k = offset + limit
+        heap: List[Tuple[float, int]] = []
+        seen: Set[int] = set()
+
+        def consider(docno: int) -> None:
+            seen.add(docno)
+            meta = docs[docno]
+            if meta is None or (wanted is not None and meta.kind not in wanted):
+                return
+            norm = base + per_len * lengths[docno]
+            score = 0.0
+            for idf, p in weighted:
+                postings = p.docs
+                i = bisect_left(postings, docno)
+                if i < len(postings) and postings[i] == docno:
+                    tf = p.tfs[i]
+                    score += idf * tf * (K1 + 1) / (tf + norm)
+            if len(heap) < k:
+                heapq.heappush(heap, (score, docno))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, docno))
+
+        # postings added since the last sort are not impact-ordered yet
+        for _, p in weighted:
+            for docno in p.docs[p.sorted_upto:]:
+                if docno not in seen:
+                    consider(docno)
+
+        # threshold algorithm: the best score an unseen document could still
+        # reach is the sum of each list's next impact. Always advance the list
+        # with the largest one, so rare terms (steep lists) are drained first
+        # and the flat lists of common terms are barely touched.
+        fronts = [idf * p.impacts[0] if p.sorted_upto else 0.0 for idf, p in weighted]
+        positions = [0] * len(weighted)
+        lists = range(len(weighted))
+        while True:
+            threshold = sum(fronts)
+            # (scores and impacts round differently; ties are ties)
+            if threshold <= 0.0 or (len(heap) >= k and heap[0][0] + 1e-9 >= threshold):
+                break
+            j = max(lists, key=fronts.__getitem__)
+            idf, p = weighted[j]
+            pos = positions[j]
+            docno = p.order[pos]
+            if docno not in seen:
+                consider(docno)
+            pos += 1
+            positions[j] = pos
+            fronts[j] = idf * p.impacts[pos] if pos < p.sorted_upto else 0.0
+
+        if len(heap) < k:
+            # the lists ran out before the page filled: every match was scored
+            total, exact = len(heap), True
+        else:
+            total, exact = self._estimate_total(plists, wanted)
+            total = max(total, k)
+        ranked = sorted(heap, reverse=True)[offset:]
+        return total, exact, [(score, docs[docno]) for score, docno in ranked]
+
+
+async def run_sync_loop(index: SearchIndex, db, catalog, interval: float) -> None:
+    """Build the index, then keep catching up with other workers' writes."""
+    while True:
+        try:
+            start = time.perf_counter()
+            codes = {c["_id"]: c.get("courseCode") for c in await catalog.all(db)}
+            added = await index.sync(db, codes)
+            await index.optimize()
+            if not index.ready:
+                index.ready = True
+                logger.info("Search index built: %d documents in %.2fs", len(index), time.perf_counter() - start)
+            elif added:
+                logger.debug("Search index caught up %d documents", added)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Search index sync failed")
+        await asyncio.sleep(interval)
+
+
+def get_search_index(app) -> SearchIndex:
+    return app.state.search_index
@@ -0,0 +1,99 @@
+"""Fast serialization of trusted Mongo documents.
+
+Documents read back from our own collections were validated when they were
+written, so validating them again on every read only burns CPU on the event
+loop. For each Out model this module derives a "wire" TypedDict with the same
+keys (aliases included) and annotations, and compiles one
+`TypeAdapter(List[Wire])` for it. Encoding a page is then a single call into
+pydantic-core on plain dicts: no model instances, no validation, ObjectId and
+datetime encoded natively, and keys outside the schema dropped.
+
+List routes return `json_response(...)` directly so FastAPI does not
+re-validate the payload against `response_model`; the declared
+`response_model` still documents the shape in OpenAPI.
+
+`bench/serialization.py` compares this with the old `parse_obj` +
+`response_model` path.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Set, Type, TypeVar
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import PydanticUndefined
+from typing_extensions import TypedDict
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class _Wire:
+    """Compiled serializers and defaults for one Out model."""
+
+    def __init__(self, model: Type[BaseModel]):
+        fields = model.model_fields
+        self.keys = {name: info.alias or name for name, info in fields.items()}
+        wire = TypedDict(f"{model.__name__}Wire", {self.keys[n]: info.annotation for n, info in fields.items()}, total=False)
+        self.many = TypeAdapter(List[wire])
+        self.one = TypeAdapter(wire)
+        # every key in schema order with its static default; default
+        # factories (the id) are never needed for documents read from Mongo
+        self.template: Dict[str, Any] = {
+            self.keys[n]: None if info.default is PydanticUndefined else info.default
+            for n, info in fields.items()
+        }
+
+    def fill(self, doc: dict) -> dict:
+        out = self.template.copy()
+        out.update(doc)
+        return out
+
+    def include(self, names: Optional[Set[str]]):
+        return None if names is None else {self.keys.get(n, n) for n in names}
+
+
+@lru_cache(maxsize=None)
+def wire(model: Type[BaseModel]) -> _Wire:
+    return _Wire(model)
+
+
+def construct(model: Type[M], doc: dict) -> M:
+    """Wrap a trusted document in `model` without validating it."""
+    return model.model_construct(**doc)
+
+
+def dump_many(model: Type[BaseModel], docs: Iterable[dict], include: Optional[Set[str]] = None) -> bytes:
+    """Encode trusted documents as a JSON array shaped like `model`.
+
+    `include` holds model attribute names (as in `FieldSelection`).
+    """
+    w = wire(model)
+    keys = w.include(include)
+    return w.many.dump_json(
+        [w.fill(doc) for doc in docs],
+        include={"__all__": keys} if keys is not None else None,
+        # stored values occasionally drift from the declared type (e.g. an
+        # int difficulty on a str field); encode them as-is, quietly
+        warnings=False,
+    )
+
+
+def dump_lines(model: Type[BaseModel], docs: Iterable[dict], include: Optional[Set[str]] = None) -> bytes:
+    """Encode trusted documents as NDJSON, one object per line."""
+    w = wire(model)
+    keys = w.include(include)
+    lines = [w.one.dump_json(w.fill(doc), include=keys, warnings=False) for doc in docs]
+    return b"\n".join(lines) + b"\n" if lines else b""
+
+
+def json_response(
+    model: Type[BaseModel],
+    docs: Iterable[dict],
+    include: Optional[Set[str]] = None,
+    response: Optional[Response] = None,
+) -> Response:
+    """A ready-made JSON array response. Headers already set on the route's
+    injected `response` (e.g. the pagination cursor) are carried over."""
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return Response(content=dump_many(model, docs, include), media_type="application/json", headers=headers)
@@ -0,0 +1,86 @@
+"""Opt-in NDJSON streaming for list endpoints.
+
+A client asks for a stream with `Accept: application/x-ndjson` or
+`?stream=1`. Instead of building the whole result as a list of models, the
+route hands its Motor cursor to `ndjson_response`, which pulls documents in
+fixed-size batches, encodes each batch and writes it to the socket before
+reading the next one. Peak memory is bounded by one batch and the first
+bytes go out as soon as the first batch arrives.
+
+Streams are not capped by `MAX_PAGE_SIZE`; they honour `cursor` and an
+explicit `limit`, so a client can resume an interrupted dump.
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Type
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from ..database import settings
+from .pagination import SortSpec, apply_cursor
+from .serialization import dump_lines
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+Prepare = Callable[[List[dict]], Awaitable[Any]]
+
+
+def wants_stream(request: Request, stream: bool = False) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def open_cursor(
+    collection,
+    query: Dict[str, Any],
+    sort: SortSpec,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    projection: Optional[Dict[str, Any]] = None,
+):
+    """Motor cursor over the full (uncapped) result, starting after `cursor`."""
+    cur = collection.find(apply_cursor(query, sort, cursor), projection).sort(list(sort))
+    cur = cur.batch_size(settings.STREAM_BATCH_SIZE)
+    if limit:
+        cur = cur.limit(int(limit))
+    return cur
+
+
+async def iter_batches(cursor, batch_size: int) -> AsyncIterator[List[dict]]:
+    batch: List[dict] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_response(
+    cursor,
+    model: Type[BaseModel],
+    prepare: Optional[Prepare] = None,
+    include: Optional[Set[str]] = None,
+    response: Optional[Response] = None,
+) -> StreamingResponse:
+    """Stream `cursor` as NDJSON, one `model` per line.
+
+    `prepare` runs on each batch before encoding, e.g. to attach author
+    usernames with one lookup per batch. `include` restricts each line to
+    a sparse fieldset. Headers already set on the route's injected
+    `response` (e.g. the ETag) are carried over.
+    """
+
+    async def body():
+        async for batch in iter_batches(cursor, settings.STREAM_BATCH_SIZE):
+            if prepare is not None:
+                try:
+                    await prepare(batch)
+                except Exception:
+                    pass
+            yield dump_lines(model, batch, include)
+
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,118 @@
+"""Prefix trie for course autocomplete.
+
+Every course is inserted under its code (as written and with the spaces
+removed, so `cs1` finds "CS 101"), under each word-start of its name (so
+`algo` finds "Intro to Algorithms") and under each tag. Each node keeps its
+best `TOP_K` courses, ranked by enrollment, so answering a prefix is a walk
+down the prefix plus a slice: no subtree traversal at query time.
+
+The trie is owned by the `CourseCatalog`: rebuilt whenever the catalog
+reloads (which also picks up changed enrollment counts) and extended in place
+when a course is added.
+"""
+import re
+from bisect import insort
+from typing import Dict, Iterable, List, Tuple
+
+from bson import ObjectId
+
+# completions kept per node; also the largest `limit` the route accepts
+TOP_K = 20
+
+_WS = re.compile(r"\s+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+# (rank, course _id, matched text, field)
+Entry = Tuple[tuple, ObjectId, str, str]
+
+
+def normalize(text: str) -> str:
+    return _WS.sub(" ", (text or "").strip()).lower()
+
+
+def _rank(doc: dict) -> tuple:
+    # most enrolled first, then most problems, then alphabetical by code
+    return (-(doc.get("enrollmentCount") or 0), -(doc.get("problemCount") or 0), doc.get("courseCode") or "")
+
+
+def course_keys(doc: dict) -> Iterable[Tuple[str, str, str]]:
+    """(key, display text, field) pairs under which `doc` is findable."""
+    code = doc.get("courseCode")
+    if code:
+        yield normalize(code), code, "courseCode"
+        compact = normalize(code).replace(" ", "")
+        if compact != normalize(code):
+            yield compact, code, "courseCode"
+    name = doc.get("courseName")
+    if name:
+        lowered = normalize(name)
+        for m in _WORD.finditer(lowered):
+            yield lowered[m.start():], name, "courseName"
+    for tag in doc.get("tags") or []:
+        if tag:
+            yield normalize(tag), tag, "tags"
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.top: List[Entry] = []
+
+
+class PrefixTrie:
+    def __init__(self):
+        self._root = _Node()
+        self._courses: Dict[ObjectId, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._courses)
+
+    def add(self, doc: dict) -> None:
+        """Insert a course. A course that is already present keeps its
+        existing entries; changes to it show up on the next rebuild."""
+        course_id = doc["_id"]
+        if course_id in self._courses:
+            return
+        self._courses[course_id] = doc
+        rank = _rank(doc)
+        # nodes already offered this course through an earlier key (a node
+        # lists each course once, under whichever key reached it first)
+        visited = set()
+        for key, text, field in course_keys(doc):
+            entry = (rank, course_id, text, field)
+            node = self._root
+            for ch in key:
+                child = node.children.get(ch)
+                if child is None:
+                    child = node.children[ch] = _Node()
+                node = child
+                if node in visited:
+                    continue
+                visited.add(node)
+                top = node.top
+                if len(top) < TOP_K:
+                    insort(top, entry)
+                elif entry < top[-1]:
+                    insort(top, entry)
+                    top.pop()
+
+    def complete(self, prefix: str, limit: int = 8) -> List[Tuple[dict, str, str]]:
+        """Best courses matching `prefix` as (course, matched text, field)."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        node = self._root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return [(self._courses[cid], text, field) for _, cid, text, field in node.top[:limit]]
+
+
+def build_trie(docs: Iterable[dict]) -> PrefixTrie:
+    trie = PrefixTrie()
+    for doc in docs:
+        trie.add(doc)
+    return trie
@@ -0,0 +1,217 @@
+"""Write-coalescing vote counter.
+
+Vote routes used to run one `find_one_and_update` with `$inc` per click,
+which turns popular documents into write hot spots. Votes are now buffered
+in memory as per-document deltas and applied with one unordered
+`bulk_write` per collection, every `VOTE_FLUSH_INTERVAL_MS` or as soon as
+`VOTE_FLUSH_MAX_EVENTS` votes are waiting, whichever comes first.
+
+A vote reads its document once by `_id` (a point read, no write lock) and
+answers with an optimistic count: the stored value plus what this worker
+still has buffered for it. A flush landing during that read can make the
+count briefly off by that flush; the next read corrects it. Ids a flush
+finds missing are remembered (up to `MAX_MISSING`) so later votes on them
+get a 404 without the read. The buffer is flushed on shutdown from the app
+lifespan; votes buffered in a worker that is killed outright are lost. After
+each collection's write, `on_flush(collection, ids)` runs so caches of those
+documents can be dropped. The collection's ETag version (conditional.py) is
+bumped at most once per `version_interval` seconds, so list tags pick up new
+counts within that window instead of changing on every flush.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+from uarchive_common.metrics import registry
+
+from .conditional import bump
+
+logger = logging.getLogger("uvicorn.error")
+
+Key = Tuple[str, object]  # (collection name, document _id)
+
+# ids a flush found missing, remembered so later votes on them 404
+MAX_MISSING = 10_000
+
+_flushed = registry.counter("vote_flush_updates_total", "Per-document vote updates written to Mongo", ["collection"])
+_flush_seconds = registry.histogram("vote_flush_seconds", "Time spent in one vote bulk_write", ["collection"])
+_flush_failures = registry.counter("vote_flush_failures_total", "Vote bulk_writes that failed and were re-queued", ["collection"])
+_dropped = registry.counter("vote_flush_missing_total", "Buffered vote updates that matched no document", ["collection"])
+
+
+class VoteBuffer:
+    def __init__(
+        self,
+        db,
+        interval_ms: int = 250,
+        max_events: int = 500,
+        on_flush: Optional[Callable[[str, List], Awaitable]] = None,
+        version_interval: float = 30.0,
+    ):
+        self._db = db
+        self._on_flush = on_flush
+        self.interval = interval_ms / 1000.0
+        self.max_events = max_events
+        self.version_interval = version_interval
+        self._pending: Dict[Key, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # deltas handed to a bulk_write that has not returned yet
+        self._inflight: Dict[Key, Dict[str, int]] = {}
+        self._missing: "OrderedDict[Key, None]" = OrderedDict()
+        # collections with flushed votes their version does not reflect yet
+        self._stale: Set[str] = set()
+        self._bumped_at: Dict[str, float] = {}
+        self._events = 0
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        await self.bump_versions(force=True)
+
+    def add(self, collection: str, doc_id, field: str, delta: int) -> None:
+        self._pending[(collection, doc_id)][field] += delta
+        self._events += 1
+        if self._events >= self.max_events:
+            self._wake.set()
+
+    def is_missing(self, collection: str, doc_id) -> bool:
+        return (collection, doc_id) in self._missing
+
+    def _remember_missing(self, collection: str, ids) -> None:
+        for doc_id in ids:
+            self._missing[(collection, doc_id)] = None
+            self._missing.move_to_end((collection, doc_id))
+        while len(self._missing) > MAX_MISSING:
+            self._missing.popitem(last=False)
+
+    def pending(self, collection: str, doc_id, field: str) -> int:
+        """Delta buffered in this worker but not yet visible in Mongo."""
+        key = (collection, doc_id)
+        total = self._inflight.get(key, {}).get(field, 0)
+        if key in self._pending:
+            total += self._pending[key].get(field, 0)
+        return total
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+            events, self._events = self._events, 0
+            self._inflight = batch
+            try:
+                by_collection: Dict[str, list] = defaultdict(list)
+                for (collection, doc_id), fields in batch.items():
+                    inc = {f: d for f, d in fields.items() if d}
+                    if inc:
+                        by_collection[collection].append((doc_id, inc))
+                    else:
+                        del self._inflight[(collection, doc_id)]
+                for collection, updates in by_collection.items():
+                    # updatedAt too, so incremental archive exports pick the new counts up
+                    ops = [
+                        UpdateOne({"_id": doc_id}, {"$inc": inc, "$currentDate": {"updatedAt": True}})
+                        for doc_id, inc in updates
+                    ]
+                    start = time.perf_counter()
+                    try:
+                        result = await self._db[collection].bulk_write(ops, ordered=False)
+                    except Exception:
+                        # put the deltas back so the next flush retries them
+                        logger.exception("Vote flush failed for %s; re-queueing %d updates", collection, len(ops))
+                        _flush_failures.inc(collection=collection)
+                        for doc_id, inc in updates:
+                            del self._inflight[(collection, doc_id)]
+                            for f, d in inc.items():
+                                self._pending[(collection, doc_id)][f] += d
+                        continue
+                    # the deltas are in Mongo now: stop counting them as
+                    # pending before anything else can run, or a concurrent
+                    # reader would see them twice
+                    for doc_id, _ in updates:
+                        del self._inflight[(collection, doc_id)]
+                    _flush_seconds.observe(time.perf_counter() - start, collection=collection)
+                    _flushed.inc(len(ops), collection=collection)
+                    ids = [doc_id for doc_id, _ in updates]
+                    if result.matched_count < len(ops):
+                        await self._drop_missing(collection, ids)
+                    # stored counts changed; bump_versions invalidates ETags
+                    self._stale.add(collection)
+                    if self._on_flush is not None:
+                        try:
+                            await self._on_flush(collection, ids)
+                        except Exception:
+                            logger.exception("Vote flush callback failed for %s", collection)
+            finally:
+                self._inflight = {}
+            logger.debug("Flushed %d vote events", events)
+
+    async def bump_versions(self, force: bool = False) -> None:
+        """Bump the versions of collections whose stored counts changed,
+        unless one was bumped less than `version_interval` seconds ago."""
+        now = time.monotonic()
+        for collection in list(self._stale):
+            last = self._bumped_at.get(collection)
+            if force or last is None or now - last >= self.version_interval:
+                self._stale.discard(collection)
+                self._bumped_at[collection] = now
+                await bump(self._db, collection)
+
+    async def _drop_missing(self, collection: str, ids: List) -> None:
+        """Remember which of `ids` matched no document (their updates were no-ops)."""
+        try:
+            found = {d["_id"] async for d in self._db[collection].find({"_id": {"$in": ids}}, {"_id": 1})}
+        except Exception:
+            logger.exception("Could not check vote targets in %s", collection)
+            return
+        missing = [i for i in ids if i not in found]
+        if missing:
+            _dropped.inc(len(missing), collection=collection)
+            logger.info("Dropped votes for %d missing %s", len(missing), collection)
+            self._remember_missing(collection, missing)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+                await self.bump_versions()
+            except Exception:
+                logger.exception("Vote flush loop error")
+
+
+def get_vote_buffer(app) -> VoteBuffer:
+    return app.state.vote_buffer
+
+
+async def record_vote(request, collection: str, doc_id, field: str, delta: int):
+    """Buffer a vote and return the document with an optimistic count, or
+    None when the document does not exist."""
+    buffer = get_vote_buffer(request.app)
+    if buffer.is_missing(collection, doc_id):
+        return None
+    doc = await request.app.state.db[collection].find_one({"_id": doc_id})
+    if not doc:
+        return None
+    buffer.add(collection, doc_id, field, delta)
+    doc[field] = (doc.get(field) or 0) + buffer.pending(collection, doc_id, field)
+    return doc
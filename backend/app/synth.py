@@ -0,0 +1,366 @@
+"""Synthetic data at production scale, built from the shapes in `seeds.py`.
+
+`seeds.seed_db` is enough to click around, but too small to show N+1
+queries or unpaginated lists. This generator fills a database with users,
+courses, problems, responses, comments and summaries in the same shape as
+the create routes write them, at whatever volume is asked for:
+
+    python -m app.synth --problems 1000000 --seed 7
+    python -m app.synth --problems 200000 --mongo-uri mongodb://localhost:27017/scratch --drop --indexes
+
+Other collections scale from `--problems` unless given explicitly. The
+distributions are skewed the way real traffic is:
+
+- a few hot courses hold most problems and summaries (Zipf over courses);
+- a few hot problems draw most responses and comments;
+- a few prolific users author most content;
+- votes are Zipf-distributed: a quarter of items have none, most have a
+  handful and a few have thousands.
+
+Output is deterministic for a given `--seed` and set of counts, `_id`s
+included, so two runs produce the same database. `_id` timestamps follow
+`createdAt`, as they do for real inserts. Documents are generated one batch
+at a time and written with up to `--concurrency` unordered `insert_many`
+calls in flight, so memory stays flat at any scale. Progress and the
+insert rate are logged as it goes.
+
+All users share the password given by `--password`. The target database
+must be empty unless `--drop` is passed.
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import logging
+import math
+import random
+import struct
+import sys
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from .seeds import MOCK_COURSES, MOCK_PROBLEMS
+from .services.conditional import bump
+from .services.course_catalog import normalize_code
+from .services.ingest import new_problem, new_summary
+
+logger = logging.getLogger("uvicorn.error")
+
+COLLECTIONS = ("users", "courses", "problems", "responses", "comments", "summaries")
+START = datetime(2023, 9, 1)
+SPAN = timedelta(days=900)
+MAX_VOTES = 5000
+
+DEPARTMENTS = ["CPSC", "MATH", "PHYS", "SENG", "STAT", "ENGG", "CHEM", "ECON"]
+DEGREES = ["Computer Science", "Software Engineering", "Mathematics", "Physics", "Statistics"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+EXAM_TYPES = ["Midterm", "Final", "Quiz", "Assignment"]
+SEMESTERS = ["Fall", "Winter", "Spring", "Summer"]
+WORDS = sorted({
+    w.strip(".,:;'()&").lower()
+    for text in itertools.chain(
+        (c["description"] for c in MOCK_COURSES),
+        (p["description"] for p in MOCK_PROBLEMS),
+        (p["takeaway"] for p in MOCK_PROBLEMS),
+    )
+    for w in text.split()
+} - {""})
+
+
+class Zipf:
+    """Ranks 0..n-1 with P(k) proportional to 1/(k+1)^s, by inverse CDF."""
+
+    def __init__(self, n: int, s: float):
+        self.cdf = array("d", itertools.accumulate(1.0 / (k + 1) ** s for k in range(n)))
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect.bisect_left(self.cdf, rng.random() * self.cdf[-1])
+
+
+class Spread:
+    """A fixed bijection from rank to index, so the hottest items are
+    scattered through the collection instead of being the oldest ones."""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.step = 1_000_003 % n or 1
+        while math.gcd(self.step, n) != 1:
+            self.step += 1
+
+    def __call__(self, rank: int) -> int:
+        return (rank * self.step + self.n // 3) % self.n
+
+
+class Plan:
+    def __init__(self, args):
+        self.seed = args.seed
+        self.problems = args.problems
+        self.users = args.users or max(100, args.problems // 20)
+        self.courses = args.courses or max(len(MOCK_COURSES), args.problems // 400)
+        # replies need a problem to hang off
+        self.responses = 0 if not args.problems else args.responses if args.responses is not None else args.problems * 3
+        self.comments = 0 if not args.problems else args.comments if args.comments is not None else args.problems * 2
+        self.summaries = args.summaries if args.summaries is not None else args.problems // 4
+
+    def counts(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in COLLECTIONS}
+
+
+class Generator:
+    def __init__(self, plan: Plan, password_hash: str, batch_size: int):
+        self.plan = plan
+        self.password_hash = password_hash
+        self.batch_size = batch_size
+        self.hot_courses = Zipf(plan.courses, 1.1)
+        self.hot_problems = Zipf(max(plan.problems, 1), 0.9)
+        self.problem_at = Spread(max(plan.problems, 1))
+        self.prolific = Zipf(plan.users, 1.0)
+        self.user_at = Spread(plan.users)
+        self.votes = Zipf(MAX_VOTES, 1.3)
+        self.course_docs: List[dict] = []
+        # denormalized counters, written back once everything is inserted
+        self.problem_counts: Counter = Counter()
+        self.contributions: Counter = Counter()
+
+    # -- deterministic ids and times ----------------------------------------
+
+    def oid(self, kind: int, index: int, at: datetime) -> ObjectId:
+        ts = int((at - datetime(1970, 1, 1)).total_seconds())
+        return ObjectId(struct.pack(">IBHBI", ts, kind, self.plan.seed & 0xFFFF, 0, index))
+
+    def created(self, index: int, total: int) -> datetime:
+        # spread evenly over SPAN with a per-item jitter of up to an hour
+        return START + SPAN * (index / max(total, 1)) + timedelta(seconds=(index * 2654435761) % 3600)
+
+    def user_id(self, index: int) -> ObjectId:
+        return self.oid(1, index, self.created(index, self.plan.users))
+
+    def problem_id(self, index: int) -> ObjectId:
+        return self.oid(3, index, self.created(index, self.plan.problems))
+
+    def rng(self, kind: str, batch: int) -> random.Random:
+        return random.Random(f"{self.plan.seed}:{kind}:{batch}")
+
+    def author(self, rng: random.Random) -> dict:
+        index = self.user_at(self.prolific.sample(rng))
+        self.contributions[index] += 1
+        return {"_id": self.user_id(index), "username": f"user{index}"}
+
+    def text(self, rng: random.Random, low: int, high: int) -> str:
+        return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize() + "."
+
+    # -- documents --------------------------------------------------------------
+
+    def _batches(self, kind: str, total: int, build) -> Iterator[List[dict]]:
+        for batch, start in enumerate(range(0, total, self.batch_size)):
+            rng = self.rng(kind, batch)
+            yield [build(rng, i) for i in range(start, min(start + self.batch_size, total))]
+
+    def users(self) -> Iterator[List[dict]]:
+        def build(rng, i):
+            joined = self.created(i, self.plan.users)
+            return {
+                "_id": self.user_id(i), "username": f"user{i}", "email": f"user{i}@example.com",
+                "passwordHash": self.password_hash, "degree": rng.choice(DEGREES),
+                "contributionCount": 0, "reputation": 0, "joinedAt": joined, "lastLoginAt": joined,
+            }
+        return self._batches("users", self.plan.users, build)
+
+    def courses(self) -> Iterator[List[dict]]:
+        def build(rng, i):
+            created = self.created(i, self.plan.courses)
+            if i < len(MOCK_COURSES):
+                doc = dict(MOCK_COURSES[i])
+            else:
+                template = MOCK_COURSES[i % len(MOCK_COURSES)]
+                doc = dict(template)
+                # numbered above every seeded code, so the two never collide
+                doc["courseCode"] = f"{DEPARTMENTS[i % len(DEPARTMENTS)]} {600 + i // len(DEPARTMENTS)}"
+                doc["courseName"] = f"{template['courseName']} {i // len(MOCK_COURSES) + 1}"
+                doc["semester"] = rng.choice(SEMESTERS)
+                doc["difficulty"] = rng.randint(1, 10)
+            # hot courses (low rank) are the big ones
+            doc.update({
+                "_id": self.oid(2, i, created), "courseCodeKey": normalize_code(doc["courseCode"]),
+                "enrollmentCount": int(2000 / (i + 1) ** 0.5) + rng.randrange(50), "problemCount": 0,
+                "createdAt": created, "updatedAt": created,
+            })
+            self.course_docs.append(doc)
+            return doc
+        return self._batches("courses", self.plan.courses, build)
+
+    def problems(self) -> Iterator[List[dict]]:
+        def build(rng, i):
+            course_index = self.hot_courses.sample(rng)
+            course = self.course_docs[course_index]
+            self.problem_counts[course_index] += 1
+            template = MOCK_PROBLEMS[i % len(MOCK_PROBLEMS)]
+            tags = rng.sample(course["tags"], min(2, len(course["tags"])))
+            payload = {
+                "title": f"{tags[0]}: {template['title'].split(': ', 1)[-1]} #{i}",
+                "description": self.text(rng, 20, 150), "tags": tags,
+                "difficulty": rng.choice(DIFFICULTIES), "examType": rng.choice(EXAM_TYPES),
+            }
+            doc = new_problem(payload, course, self.author(rng), self.created(i, self.plan.problems))
+            doc.update({"_id": self.problem_id(i), "votes": self.votes.sample(rng), "isVerified": rng.random() < 0.05})
+            return doc
+        return self._batches("problems", self.plan.problems, build)
+
+    def _replies(self, kind: str, kind_id: int, total: int, extra) -> Iterator[List[dict]]:
+        def build(rng, i):
+            problem_index = self.problem_at(self.hot_problems.sample(rng))
+            # always after the problem, usually within a few days
+            created = self.created(problem_index, self.plan.problems) + timedelta(minutes=rng.expovariate(1 / 4000))
+            doc = {
+                "_id": self.oid(kind_id, i, created), "problemId": self.problem_id(problem_index),
+                "content": self.text(rng, 5, 120), "authorId": self.author(rng)["_id"],
+                "upvotes": self.votes.sample(rng), "downvotes": self.votes.sample(rng) // 10,
+                "createdAt": created, "updatedAt": created,
+            }
+            doc.update(extra(rng))
+            return doc
+        return self._batches(kind, total, build)
+
+    def responses(self) -> Iterator[List[dict]]:
+        return self._replies("responses", 4, self.plan.responses, lambda rng: {"isAccepted": rng.random() < 0.1})
+
+    def comments(self) -> Iterator[List[dict]]:
+        return self._replies("comments", 5, self.plan.comments, lambda rng: {})
+
+    def summaries(self) -> Iterator[List[dict]]:
+        def build(rng, i):
+            course = self.course_docs[self.hot_courses.sample(rng)]
+            created = self.created(i, self.plan.summaries)
+            payload = {
+                "title": f"{course['courseCode']} notes #{i}", "content": self.text(rng, 80, 600),
+                "tags": rng.sample(course["tags"], min(2, len(course["tags"]))), "topic": rng.choice(course["tags"]),
+                "professor": course.get("professor"), "difficulty": rng.randint(1, 10),
+                "semester": course.get("semester"), "year": created.year,
+            }
+            doc = new_summary(payload, course, self.author(rng), created)
+            doc.update({"_id": self.oid(6, i, created), "votes": self.votes.sample(rng)})
+            return doc
+        return self._batches("summaries", self.plan.summaries, build)
+
+
+async def write(collection, batches: Iterator[List[dict]], concurrency: int, total: int) -> float:
+    """Insert `batches` with up to `concurrency` writes in flight; returns
+    the elapsed seconds. Batches are generated while earlier ones are
+    being written."""
+    start = last_report = time.perf_counter()
+    done = 0
+    pending = set()
+
+    async def insert(batch: List[dict]) -> int:
+        await collection.insert_many(batch, ordered=False)
+        return len(batch)
+
+    def collect(finished) -> None:
+        nonlocal done
+        for task in finished:
+            done += task.result()
+
+    for batch in batches:
+        if len(pending) >= concurrency:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            collect(finished)
+        pending.add(asyncio.ensure_future(insert(batch)))
+        now = time.perf_counter()
+        if now - last_report >= 5:
+            last_report = now
+            logger.info("  %s: %d/%d (%.0f docs/s)", collection.name, done, total, done / (now - start))
+    if pending:
+        finished, _ = await asyncio.wait(pending)
+        collect(finished)
+    return time.perf_counter() - start
+
+
+async def _write_counters(db, gen: Generator) -> None:
+    updates = [
+        ("courses", [UpdateOne({"_id": gen.course_docs[i]["_id"]}, {"$set": {"problemCount": n}}) for i, n in gen.problem_counts.items()]),
+        ("users", [UpdateOne({"_id": gen.user_id(i)}, {"$set": {"contributionCount": n, "reputation": n * 5}}) for i, n in gen.contributions.items()]),
+    ]
+    for name, ops in updates:
+        for start in range(0, len(ops), 1000):
+            await db[name].bulk_write(ops[start:start + 1000], ordered=False)
+
+
+async def generate(db, plan: Plan, password_hash: str, batch_size: int = 5000, concurrency: int = 8) -> Dict[str, Dict[str, float]]:
+    """Fill `db` according to `plan`; returns per-collection counts and rates."""
+    gen = Generator(plan, password_hash, batch_size)
+    counts = plan.counts()
+    stats: Dict[str, Dict[str, float]] = {}
+    # courses before problems and summaries, which copy from them
+    for name in COLLECTIONS:
+        if not counts[name]:
+            continue
+        elapsed = await write(db[name], getattr(gen, name)(), concurrency, counts[name])
+        stats[name] = {"documents": counts[name], "seconds": elapsed, "rate": counts[name] / elapsed if elapsed else 0.0}
+        logger.info("%s: %d documents in %.1fs (%.0f docs/s)", name, counts[name], elapsed, stats[name]["rate"])
+    await _write_counters(db, gen)
+    await bump(db, *COLLECTIONS)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .database import settings
+    from .indexes import IndexManager
+    from uarchive_common.mongo import create_client
+    from .services import auth as auth_service
+
+    parser = argparse.ArgumentParser(prog="python -m app.synth", description="Fill a database with synthetic UArchive data.")
+    parser.add_argument("--mongo-uri", default=settings.MONGO_URI, help="includes the target database name")
+    parser.add_argument("--problems", type=int, default=100_000)
+    parser.add_argument("--users", type=int, help="default: problems / 20")
+    parser.add_argument("--courses", type=int, help="default: problems / 400")
+    parser.add_argument("--responses", type=int, help="default: 3 per problem")
+    parser.add_argument("--comments", type=int, help="default: 2 per problem")
+    parser.add_argument("--summaries", type=int, help="default: 1 per 4 problems")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--password", default="synthetic-password", help="password of every generated user")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8, help="insert_many calls in flight")
+    parser.add_argument("--drop", action="store_true", help="drop the generated collections first")
+    parser.add_argument("--indexes", action="store_true", help="build the declared indexes afterwards")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    plan = Plan(args)
+
+    async def run():
+        client = create_client(args.mongo_uri, settings)
+        db = client.get_default_database()
+        try:
+            if args.drop:
+                for name in (*COLLECTIONS, "versions"):
+                    await db[name].drop()
+            else:
+                for name in COLLECTIONS:
+                    if await db[name].estimated_document_count():
+                        raise SystemExit(f"{db.name}.{name} already has data; pass --drop to replace it")
+            logger.info("Generating into %s: %s", db.name, ", ".join(f"{n} {c}" for n, c in plan.counts().items()))
+            start = time.perf_counter()
+            stats = await generate(db, plan, auth_service.get_password_hash(args.password), args.batch_size, args.concurrency)
+            elapsed = time.perf_counter() - start
+            total = sum(s["documents"] for s in stats.values())
+            for name, s in stats.items():
+                print(f"{name:<10} {int(s['documents']):>10} docs {s['seconds']:>8.1f}s {s['rate']:>10.0f} docs/s")
+            print(f"{'total':<10} {total:>10} docs {elapsed:>8.1f}s {total / elapsed:>10.0f} docs/s")
+            if args.indexes:
+                start = time.perf_counter()
+                await IndexManager(db).ensure()
+                print(f"indexes built in {time.perf_counter() - start:.1f}s")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
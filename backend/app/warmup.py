@@ -0,0 +1,120 @@
+"""Background warm-up and the readiness report behind `/readyz`.
+
+`lifespan` only creates in-memory state and starts `run_warmup`; nothing on
+the boot path waits for Mongo, so a restarted worker accepts connections
+straight away. Warm-up then runs, in order:
+
+- migrations and seeding, retried until every step is recorded as done
+  (another worker may be holding one);
+- the course catalog load;
+- index builds (see `indexes.py`), which need migrated data.
+
+The search index builds in its own loop. `/readyz` is ready once Mongo
+answers a ping and the required steps are done. Index builds and the search
+index are reported but do not gate readiness: queries work without them,
+just more slowly, and search answers 503 on its own until it is built.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from .database import init_db
+from .migrations import MIGRATIONS
+
+logger = logging.getLogger("uvicorn.error")
+
+STEPS = ("migrations", "catalog", "indexes")
+REQUIRED = ("migrations", "catalog")
+RETRY_SECONDS = 2.0
+PING_TIMEOUT_SECONDS = 1.0
+
+
+class Warmup:
+    def __init__(self):
+        self.started_at = time.time()
+        self.steps: Dict[str, str] = {step: "pending" for step in STEPS}
+        self.errors: Dict[str, str] = {}
+        self.durations: Dict[str, float] = {}
+
+    def set(self, step: str, state: str, error: Optional[str] = None) -> None:
+        self.steps[step] = state
+        if error:
+            self.errors[step] = error
+        else:
+            self.errors.pop(step, None)
+
+    @property
+    def ready(self) -> bool:
+        return all(self.steps[step] == "done" for step in REQUIRED)
+
+    def snapshot(self, app) -> Dict[str, Any]:
+        index = getattr(app.state, "search_index", None)
+        return {
+            "steps": dict(self.steps, search="done" if index is not None and index.ready else "pending"),
+            "errors": dict(self.errors),
+            "durations": {k: round(v, 3) for k, v in self.durations.items()},
+            "uptime": round(time.time() - self.started_at, 3),
+        }
+
+
+async def _until_done(warmup: Warmup, step: str, attempt) -> Any:
+    """Run `attempt` until it returns without raising and is not None."""
+    start = time.perf_counter()
+    warmup.set(step, "running")
+    while True:
+        try:
+            result = await attempt()
+            if result is not None:
+                warmup.durations[step] = time.perf_counter() - start
+                warmup.set(step, "done")
+                return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Warm-up step %s failed; retrying", step)
+            warmup.set(step, "retrying", str(exc)[:300])
+        await asyncio.sleep(RETRY_SECONDS)
+
+
+async def run_warmup(app) -> None:
+    warmup: Warmup = app.state.warmup
+
+    async def migrate():
+        results = await init_db(app)
+        if len(results) == len(MIGRATIONS) and all(r in ("applied", "skipped") for r in results.values()):
+            return results
+        pending = {k: v for k, v in results.items() if v not in ("applied", "skipped")}
+        warmup.set("migrations", "waiting", f"not finished: {pending or 'not reached'}")
+        return None
+
+    async def load_catalog():
+        await app.state.course_catalog.refresh(app.state.db)
+        return True
+
+    await _until_done(warmup, "migrations", migrate)
+    await _until_done(warmup, "catalog", load_catalog)
+    logger.info("Warm-up ready in %.2fs", time.time() - warmup.started_at)
+
+    start = time.perf_counter()
+    warmup.set("indexes", "running")
+    try:
+        report = await app.state.index_manager.ensure()
+        warmup.set("indexes", "drift" if report["drift"] else "done")
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        logger.exception("Index build failed")
+        warmup.set("indexes", "failed", str(exc)[:300])
+    warmup.durations["indexes"] = time.perf_counter() - start
+
+
+async def readiness(app) -> Dict[str, Any]:
+    """The `/readyz` body; `ready` says whether to route traffic here."""
+    try:
+        await asyncio.wait_for(app.state.db.command("ping"), timeout=PING_TIMEOUT_SECONDS)
+        mongo = "ok"
+    except Exception:
+        mongo = "unreachable"
+    warmup: Warmup = app.state.warmup
+    return {"ready": mongo == "ok" and warmup.ready, "mongo": mongo, **warmup.snapshot(app)}
@@ -0,0 +1 @@
+# Benchmarks and performance audits for the backend (not part of the app)
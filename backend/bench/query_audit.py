@@ -0,0 +1,530 @@
+"""Query-plan audit: fail when a route's query stops using an index.
+
+Run from the `backend` directory against a disposable local mongod:
+
+    python -m bench.query_audit --mongo-uri mongodb://localhost:27017
+
+Both applications are exercised: this backend (`app/routers`) and the
+standalone service in `../api` (`api/routers`). For each one the audit
+seeds a scratch database with synthetic volume, starts the app in-process
+(lifespan included, and waits for background index builds), then drives
+every route through `httpx.ASGITransport`. A pymongo `CommandListener`
+captures each read and update the routes send. Each captured command is
+then re-run under `explain` (executionStats) and the audit fails if its
+winning plan
+
+- contains a COLLSCAN (intentional whole-collection reads, with no filter,
+  sort or limit, are reported but allowed),
+- contains an in-memory SORT stage, or
+- examines more than `--max-ratio` documents per document returned.
+
+Routes that no scenario exercises are listed; `--strict` makes that a
+failure too. The exit status is non-zero on any failure, so this can gate
+CI. The scratch databases must not exist beforehand and are dropped
+afterwards unless `--keep` is given.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from bson import ObjectId, json_util
+from pymongo import MongoClient, monitoring, uri_parser
+
+API_DIR = Path(__file__).resolve().parents[2] / "api"
+# the standalone service hard-codes its database name
+API_DB = "UArchive-API"
+
+AUDITED_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# driver/session fields that `explain` rejects or that only add noise
+_SESSION_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference", "readConcern", "writeConcern", "autocommit", "startTransaction"}
+
+PASSWORD = "audit-password"
+# statements of one bulk update that get explained
+MAX_BULK_STATEMENTS = 3
+
+
+# -- capture -------------------------------------------------------------------
+
+
+@dataclass
+class Captured:
+    route: str
+    database: str
+    name: str
+    command: Dict[str, Any]
+
+
+class QueryRecorder(monitoring.CommandListener):
+    """Collects audited commands while `enabled`, tagged with `route`.
+
+    Motor runs pymongo on worker threads, so the tag is whatever route the
+    driver loop is exercising when the command is sent; background tasks
+    (search sync, vote flushes) show up under that route too.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.route = ""
+        self.captured: List[Captured] = []
+
+    def started(self, event):
+        if not self.enabled or event.command_name not in AUDITED_COMMANDS:
+            return
+        command = {k: copy.deepcopy(v) for k, v in event.command.items() if k not in _SESSION_FIELDS}
+        if event.command_name == "update" and len(command.get("updates", ())) > 1:
+            # explain takes one statement; a few of a bulk write are enough
+            for statement in command["updates"][:MAX_BULK_STATEMENTS]:
+                single = dict(command, updates=[statement])
+                self.captured.append(Captured(self.route, event.database_name, event.command_name, single))
+            return
+        self.captured.append(Captured(self.route, event.database_name, event.command_name, command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# -- plan analysis ---------------------------------------------------------------
+
+
+def _find_all(node: Any, key: str) -> List[Any]:
+    found = []
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k == key:
+                found.append(v)
+            else:
+                found.extend(_find_all(v, key))
+    elif isinstance(node, list):
+        for v in node:
+            found.extend(_find_all(v, key))
+    return found
+
+
+def winning_stages(explain: Dict[str, Any]) -> List[str]:
+    """Stage names of every winning plan in an explain result (rejected
+    plans are ignored). Handles classic and slot-based explain output, and
+    aggregations whose plans sit under `$cursor` or `$lookup` stages."""
+    stages: List[str] = []
+    for plan in _find_all(explain, "winningPlan"):
+        for name in _find_all(plan, "stage"):
+            if isinstance(name, str):
+                stages.append(name)
+    return stages
+
+
+def docs_examined(explain: Dict[str, Any]) -> Tuple[int, int]:
+    examined = returned = 0
+    for stats in _find_all(explain, "executionStats"):
+        if isinstance(stats, dict) and "totalDocsExamined" in stats:
+            examined += stats.get("totalDocsExamined", 0)
+            returned += stats.get("nReturned", 0)
+    return examined, returned
+
+
+def is_full_read(name: str, command: Dict[str, Any]) -> bool:
+    """A deliberate whole-collection read: unfiltered, unsorted, unlimited."""
+    return name == "find" and not command.get("filter") and not command.get("sort") and not command.get("limit")
+
+
+def audit_plan(name: str, command: Dict[str, Any], explain: Dict[str, Any], max_ratio: float) -> Tuple[List[str], List[str]]:
+    """Return (failures, notes) for one explained command."""
+    failures, notes = [], []
+    stages = winning_stages(explain)
+    if "COLLSCAN" in stages:
+        if is_full_read(name, command):
+            notes.append("full collection read (unfiltered)")
+        else:
+            failures.append("COLLSCAN")
+    if "SORT" in stages:
+        failures.append("in-memory SORT")
+    examined, returned = docs_examined(explain)
+    ratio = examined / max(returned, 1)
+    if ratio > max_ratio and not is_full_read(name, command):
+        failures.append(f"examined {examined} docs for {returned} returned (ratio {ratio:.1f} > {max_ratio:g})")
+    return failures, notes
+
+
+def explain(client: MongoClient, captured: Captured) -> Dict[str, Any]:
+    return client[captured.database].command("explain", captured.command, verbosity="executionStats")
+
+
+def describe(captured: Captured) -> str:
+    collection = captured.command.get(captured.name)
+    body = {k: v for k, v in captured.command.items() if k in ("filter", "sort", "pipeline", "updates", "query", "limit")}
+    text = json_util.dumps(body)
+    return f"{captured.name} {collection} {text[:240]}"
+
+
+# -- synthetic data ----------------------------------------------------------------
+
+
+def _batches(docs: List[dict], size: int = 5000):
+    for i in range(0, len(docs), size):
+        yield docs[i:i + size]
+
+
+def _insert(db, name: str, docs: List[dict]) -> None:
+    for chunk in _batches(docs):
+        db[name].insert_many(chunk, ordered=False)
+
+
+def seed_backend(db, problems: int, seed: int = 0) -> Dict[str, Any]:
+    """Seed the backend schema; returns ids the scenarios refer to."""
+    from app.services import auth as auth_service
+    from app.services.course_catalog import normalize_code
+
+    rng = random.Random(seed)
+    start = datetime(2024, 9, 1)
+    password_hash = auth_service.get_password_hash(PASSWORD)
+    users = [
+        {"_id": ObjectId(), "username": f"user{i}", "email": f"user{i}@example.com", "passwordHash": password_hash,
+         "contributionCount": 0, "reputation": 0, "joinedAt": start, "lastLoginAt": start}
+        for i in range(max(100, problems // 50))
+    ]
+    departments = ["CPSC", "MATH", "PHYS", "SENG", "STAT", "ENGG"]
+    courses = []
+    for i in range(max(50, problems // 100)):
+        code = f"{departments[i % len(departments)]} {200 + i}"
+        courses.append({
+            "_id": ObjectId(), "courseCode": code, "courseCodeKey": normalize_code(code),
+            "courseName": f"Course {i}", "tags": rng.sample(["DP", "Graphs", "Proofs", "Systems", "Stats"], 2),
+            "enrollmentCount": rng.randrange(500), "problemCount": 0, "createdAt": start, "updatedAt": start,
+        })
+
+    def authored(extra: dict) -> dict:
+        author = rng.choice(users)
+        created = start + timedelta(minutes=rng.randrange(500_000))
+        extra.update({"_id": ObjectId(), "authorId": author["_id"], "authorUsername": author["username"], "createdAt": created, "updatedAt": created})
+        return extra
+
+    problem_docs = []
+    for i in range(problems):
+        course = rng.choice(courses)
+        problem_docs.append(authored({
+            "courseId": course["_id"], "courseCode": course["courseCode"], "title": f"Problem {i}",
+            "description": "synthetic problem text", "tags": ["DP"], "difficulty": "Medium", "examType": "Final", "votes": rng.randrange(100),
+        }))
+    responses = [authored({"problemId": rng.choice(problem_docs)["_id"], "content": "answer", "upvotes": rng.randrange(50), "downvotes": 0}) for _ in range(problems * 2)]
+    comments = [authored({"problemId": rng.choice(problem_docs)["_id"], "content": "comment", "votes": 0}) for _ in range(problems)]
+    summaries = []
+    for i in range(problems // 2):
+        course = rng.choice(courses)
+        summaries.append(authored({"courseId": course["_id"], "courseCode": course["courseCode"], "title": f"Summary {i}", "content": "notes", "votes": 0}))
+
+    for name, docs in (("users", users), ("courses", courses), ("problems", problem_docs), ("responses", responses), ("comments", comments), ("summaries", summaries)):
+        _insert(db, name, docs)
+    return {
+        "user_id": users[0]["_id"], "username": users[0]["username"], "course_id": courses[0]["_id"],
+        "course_code": courses[0]["courseCode"], "problem_id": problem_docs[0]["_id"], "response_id": responses[0]["_id"],
+        "comment_id": comments[0]["_id"], "summary_id": summaries[0]["_id"], "collection": "courses",
+    }
+
+
+def seed_api(db, problems: int, seed: int = 0) -> Dict[str, Any]:
+    """Seed the standalone service's schema."""
+    sys.path.insert(0, str(API_DIR))
+    from auth import hash_password
+
+    rng = random.Random(seed)
+    password_hash = hash_password(PASSWORD)
+    users = [{"username": f"user{i}", "email": f"user{i}@example.com", "password": password_hash, "star_count": 0} for i in range(max(100, problems // 50))]
+    codes = ["CPSC", "MATH", "PHYS", "SENG", "STAT", "ENGG"]
+    courses = [{"code": codes[i % len(codes)], "number": str(200 + i), "description": f"Course {i}"} for i in range(max(50, problems // 100))]
+    professors = [f"Prof {i}" for i in range(max(20, problems // 500))]
+    start = datetime(2024, 9, 1)
+    problem_docs = []
+    for i in range(problems):
+        course = rng.choice(courses)
+        problem_docs.append({
+            "_id": ObjectId(), "course_code": course["code"], "course_number": course["number"], "professor": rng.choice(professors),
+            "creator_id": rng.choice(users)["username"], "title": f"Problem {i}", "text": "synthetic", "tags": ["DP"],
+            "created_at": start + timedelta(minutes=rng.randrange(500_000)), "votes": rng.randrange(100), "resolved": False, "chosen_comment_id": None,
+        })
+    comments = [
+        {"problem_id": str(rng.choice(problem_docs)["_id"]), "creator_id": rng.choice(users)["username"], "text": "comment",
+         "votes": rng.randrange(20), "created_at": start, "starred": False}
+        for _ in range(problems)
+    ]
+    for name, docs in (("user", users), ("courses", courses), ("problems", problem_docs), ("comments", comments)):
+        _insert(db, name, docs)
+    return {
+        "username": users[0]["username"], "course_code": courses[0]["code"], "course_number": courses[0]["number"],
+        "professor": professors[0], "problem_id": str(problem_docs[0]["_id"]),
+    }
+
+
+# -- scenarios ----------------------------------------------------------------------
+
+
+@dataclass
+class Scenario:
+    method: str
+    path: str  # route template, e.g. "/api/problems/{problem_id}"
+    params: Dict[str, Any] = field(default_factory=dict)
+    json: Optional[Any] = None
+    # sent as an NDJSON body instead of `json`, one object per line
+    ndjson: Optional[List[Dict[str, Any]]] = None
+    auth: bool = False
+    # request the next page too, using the X-Next-Cursor header
+    follow: bool = False
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def backend_scenarios(ids: Dict[str, Any]) -> List[Scenario]:
+    code = ids["course_code"]
+    return [
+        Scenario("GET", "/healthz"),
+        Scenario("GET", "/readyz"),
+        Scenario("GET", "/metrics"),
+        Scenario("POST", "/api/auth/register", json={"username": "audit_new", "email": "audit_new@example.com", "password": PASSWORD}),
+        Scenario("POST", "/api/auth/login", json={"username": ids["username"], "password": PASSWORD}),
+        Scenario("POST", "/api/auth/login", json={"username": f"{ids['username']}@example.com", "password": PASSWORD}),
+        Scenario("GET", "/api/users/me", auth=True),
+        Scenario("GET", "/api/users/{user_id}"),
+        Scenario("GET", "/api/courses", follow=True),
+        Scenario("GET", "/api/courses", params={"stream": 1, "limit": 500}),
+        Scenario("GET", "/api/courses/{course_id}"),
+        Scenario("GET", "/api/courses/{course_id}/page"),
+        Scenario("GET", "/api/courses/" + code.replace(" ", "%20") + "/page", params={"problems": 3}),
+        Scenario("POST", "/api/courses", json={"courseCode": "AUDT 101", "courseName": "Audit", "department": None, "professor": None, "semester": None, "year": None, "description": None}),
+        Scenario("GET", "/api/problems", follow=True),
+        Scenario("GET", "/api/problems", params={"courseCode": code}, follow=True),
+        Scenario("GET", "/api/problems", params={"courseId": "{course_id}", "fields": "title,votes"}, follow=True),
+        Scenario("GET", "/api/problems", params={"stream": 1, "limit": 500}),
+        Scenario("GET", "/api/problems/{problem_id}"),
+        Scenario("GET", "/api/problems/{problem_id}/bundle", params={"responsesLimit": 2, "commentsLimit": 2}),
+        Scenario("POST", "/api/problems", auth=True, json={"courseId": code, "title": "Audit", "description": "d", "tags": [], "difficulty": None, "examType": None}),
+        Scenario("POST", "/api/problems/{problem_id}/vote", json={"delta": 1}),
+        Scenario("POST", "/api/problems:bulk", auth=True, ndjson=[
+            {"courseId": code, "title": f"Bulk {i}", "description": "d", "difficulty": None, "examType": None} for i in range(3)
+        ]),
+        Scenario("GET", "/api/responses/problem/{problem_id}", follow=True),
+        Scenario("POST", "/api/responses", auth=True, json={"problemId": "{problem_id}", "content": "audit"}),
+        Scenario("POST", "/api/responses/{response_id}/vote", json={"delta": 1}),
+        Scenario("GET", "/api/comments/problem/{problem_id}", follow=True),
+        Scenario("POST", "/api/comments", auth=True, json={"problemId": "{problem_id}", "content": "audit"}),
+        Scenario("POST", "/api/comments/{comment_id}/vote", json={"delta": 1}),
+        Scenario("GET", "/api/summaries", follow=True),
+        Scenario("GET", "/api/summaries", params={"courseCode": code}, follow=True),
+        Scenario("POST", "/api/summaries", auth=True, json={"courseId": "{course_id}", "title": "Audit", "content": "c"}),
+        Scenario("POST", "/api/summaries/{summary_id}/vote", json={"delta": 1}),
+        Scenario("POST", "/api/summaries:bulk", auth=True, ndjson=[
+            {"courseId": "{course_id}", "title": f"Bulk {i}", "content": "c"} for i in range(3)
+        ]),
+        Scenario("GET", "/api/search", params={"q": "problem dp"}),
+        Scenario("GET", "/api/search/suggest", params={"q": code[:3]}),
+        Scenario("GET", "/api/admin/indexes", headers={"X-Admin-Token": "audit"}),
+        Scenario("POST", "/api/admin/indexes/ensure", headers={"X-Admin-Token": "audit"}),
+        Scenario("GET", "/api/admin/export", headers={"X-Admin-Token": "audit"}),
+        Scenario("GET", "/api/admin/export/{collection}", headers={"X-Admin-Token": "audit"}),
+    ]
+
+
+def api_scenarios(ids: Dict[str, Any]) -> List[Scenario]:
+    return [
+        Scenario("POST", "/auth/register", json={"username": "audit_new", "email": "audit_new@example.com", "password": PASSWORD}),
+        Scenario("POST", "/auth/login", json={"username": ids["username"], "password": PASSWORD}),
+        Scenario("GET", "/auth/me", auth=True),
+        Scenario("POST", "/user/preferences", auth=True, json={"preferences": ["CPSC"]}),
+        Scenario("GET", "/user/star_count", auth=True),
+        Scenario("GET", "/courses/"),
+        Scenario("GET", "/courses/", params={"code": ids["course_code"]}),
+        Scenario("GET", "/courses/", params={"code": ids["course_code"], "number": ids["course_number"]}),
+        Scenario("POST", "/courses/", json={"code": "AUDT", "number": "101", "description": "audit"}),
+        Scenario("GET", "/problems/"),
+        Scenario("GET", "/problems/", params={"course_code": ids["course_code"]}),
+        Scenario("GET", "/problems/", params={"course_code": ids["course_code"], "course_number": ids["course_number"]}),
+        Scenario("GET", "/problems/", params={"professor": ids["professor"]}),
+        Scenario("POST", "/problems/", auth=True, json={"course_code": ids["course_code"], "course_number": ids["course_number"], "professor": ids["professor"], "title": "Audit", "text": "t", "tags": []}),
+        Scenario("GET", "/comments/{problem_id}"),
+        Scenario("POST", "/comments/", auth=True, json={"problem_id": ids["problem_id"], "text": "audit"}),
+    ]
+
+
+def _fill(value: Any, ids: Dict[str, Any]) -> Any:
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+        return str(ids[value[1:-1]])
+    if isinstance(value, dict):
+        return {k: _fill(v, ids) for k, v in value.items()}
+    return value
+
+
+def route_templates(app) -> set:
+    """(method, path template) of every route in the app's OpenAPI schema."""
+    return {(method.upper(), path) for path, ops in app.openapi()["paths"].items() for method in ops}
+
+
+async def drive(app, scenarios: List[Scenario], ids: Dict[str, Any], recorder: QueryRecorder, token_route: Tuple[str, Dict[str, Any]]) -> List[str]:
+    """Run every scenario; returns problems with the requests themselves."""
+    errors = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://audit") as client:
+        login_path, login_body = token_route
+        resp = await client.post(login_path, json=login_body)
+        token = resp.json().get("access_token") if resp.status_code == 200 else None
+        if not token:
+            errors.append(f"login for authenticated scenarios failed: {resp.status_code} {resp.text[:200]}")
+        for sc in scenarios:
+            path = sc.path.format(**{k: str(v) for k, v in ids.items()})
+            label = f"{sc.method} {sc.path}" + (f" {sc.params}" if sc.params else "")
+            headers = dict(sc.headers)
+            if sc.auth and token:
+                headers["Authorization"] = f"Bearer {token}"
+            params = _fill(sc.params, ids)
+            recorder.route = label
+            recorder.enabled = True
+            try:
+                if sc.ndjson is not None:
+                    lines = "\n".join(json.dumps(_fill(line, ids)) for line in sc.ndjson)
+                    headers["Content-Type"] = "application/x-ndjson"
+                    resp = await client.request(sc.method, path, params=params, content=lines.encode(), headers=headers)
+                else:
+                    resp = await client.request(sc.method, path, params=params, json=_fill(sc.json, ids), headers=headers)
+                if resp.status_code >= 500:
+                    errors.append(f"{label}: HTTP {resp.status_code}")
+                cursor = resp.headers.get("x-next-cursor")
+                if sc.follow and cursor:
+                    recorder.route = label + " (next page)"
+                    await client.request(sc.method, path, params={**params, "cursor": cursor}, headers=headers)
+            finally:
+                recorder.enabled = False
+    return errors
+
+
+async def _wait_for(predicate: Callable[[], bool], timeout: float, what: str) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise SystemExit(f"timed out waiting for {what}")
+        await asyncio.sleep(0.1)
+
+
+async def audit_backend(recorder: QueryRecorder, args) -> Tuple[List[Captured], List[str], set]:
+    from app.main import app
+
+    ids = args.backend_ids
+    async with app.router.lifespan_context(app):
+        await _wait_for(lambda: app.state.index_manager.finished_at is not None, args.timeout, "index builds")
+        await _wait_for(lambda: app.state.search_index.ready, args.timeout, "search index")
+        errors = await drive(app, backend_scenarios(ids), ids, recorder, ("/api/auth/login", {"username": ids["username"], "password": PASSWORD}))
+        # votes are buffered; make the flush part of the audit
+        recorder.route, recorder.enabled = "vote buffer flush", True
+        try:
+            await app.state.vote_buffer.flush()
+        finally:
+            recorder.enabled = False
+    covered = {(s.method, s.path) for s in backend_scenarios(ids)}
+    return recorder.captured[:], errors, route_templates(app) - covered
+
+
+async def audit_api(uri: str, recorder: QueryRecorder, args) -> Tuple[List[Captured], List[str], set]:
+    # the backend's settings were read at import; this is for api/database.py
+    os.environ["MONGO_URI"] = uri
+    sys.path.insert(0, str(API_DIR))
+    import main as api_main  # the standalone service's entry module
+
+    app = api_main.app
+    ids = args.api_ids
+    async with app.router.lifespan_context(app):
+        errors = await drive(app, api_scenarios(ids), ids, recorder, ("/auth/login", {"username": ids["username"], "password": PASSWORD}))
+    covered = {(s.method, s.path) for s in api_scenarios(ids)}
+    return recorder.captured[:], errors, route_templates(app) - covered
+
+
+def with_database(uri: str, name: str) -> str:
+    head, sep, query = uri.partition("?")
+    return head.rstrip("/") + "/" + name + (sep + query if sep else "")
+
+
+def _has_data(client: MongoClient, name: str) -> bool:
+    return any(client[name][c].estimated_document_count() for c in client[name].list_collection_names())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=os.getenv("AUDIT_MONGO_URI", "mongodb://localhost:27017"), help="server to audit against, without a database name")
+    parser.add_argument("--backend-db", default="uarchive_query_audit")
+    parser.add_argument("--problems", type=int, default=20_000, help="synthetic volume; other collections scale from it")
+    parser.add_argument("--max-ratio", type=float, default=10.0, help="max docs examined per doc returned")
+    parser.add_argument("--only", choices=["backend", "api"], help="audit one application")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for background index builds")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded databases")
+    parser.add_argument("--strict", action="store_true", help="also fail on routes no scenario exercises")
+    args = parser.parse_args()
+
+    if uri_parser.parse_uri(args.mongo_uri).get("database"):
+        parser.error("--mongo-uri must not name a database")
+    # both apps read their configuration from the environment at import time
+    os.environ["MONGO_URI"] = with_database(args.mongo_uri, args.backend_db)
+    os.environ["ADMIN_TOKEN"] = "audit"
+    os.environ["JWT_SECRET"] = "audit"
+    client = MongoClient(args.mongo_uri)
+    targets = [t for t in ("backend", "api") if args.only in (None, t)]
+    names = {"backend": args.backend_db, "api": API_DB}
+
+    recorder = QueryRecorder()
+    # must be registered before the apps create their clients
+    monitoring.register(recorder)
+
+    seeded = []
+    for target in targets:
+        db = client[names[target]]
+        if _has_data(client, names[target]):
+            raise SystemExit(f"database {names[target]!r} already has data; the audit only runs against scratch databases")
+        start = time.perf_counter()
+        ids = seed_backend(db, args.problems) if target == "backend" else seed_api(db, args.problems)
+        setattr(args, f"{target}_ids", ids)
+        seeded.append(names[target])
+        print(f"seeded {target} ({names[target]}) in {time.perf_counter() - start:.1f}s")
+
+    failures = 0
+    try:
+        for target in targets:
+            recorder.captured.clear()
+            if target == "backend":
+                captured, errors, uncovered = asyncio.run(audit_backend(recorder, args))
+            else:
+                captured, errors, uncovered = asyncio.run(audit_api(args.mongo_uri, recorder, args))
+            print(f"\n== {target}: {len(captured)} queries captured")
+            for error in errors:
+                print(f"  ERROR {error}")
+                failures += 1
+            for cap in captured:
+                try:
+                    plan = explain(client, cap)
+                except Exception as exc:
+                    print(f"  ERROR explain failed for [{cap.route}] {describe(cap)}: {exc}")
+                    failures += 1
+                    continue
+                problems, notes = audit_plan(cap.name, cap.command, plan, args.max_ratio)
+                status = "FAIL" if problems else "ok  "
+                print(f"  {status} [{cap.route}] {describe(cap)}")
+                for p in problems + notes:
+                    print(f"         - {p}")
+                failures += bool(problems)
+            for method, path in sorted(uncovered):
+                print(f"  {'FAIL' if args.strict else 'warn'} no scenario for {method} {path}")
+                failures += args.strict
+    finally:
+        if not args.keep:
+            for name in seeded:
+                client.drop_database(name)
+    print(f"\n{failures} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""Route latency benchmark with saved baselines and a regression gate.
+
+Run from the `backend` directory against a local mongod:
+
+    python -m bench.routes --mongo-uri mongodb://localhost:27017/uarchive_bench --save
+    python -m bench.routes --mongo-uri mongodb://localhost:27017/uarchive_bench
+
+The first run fills the (empty) database with `app.synth` at
+`--problems` scale, then later runs reuse it. The app comes from
+`app.main.build_app()` with its lifespan, and the benchmark waits for
+warm-up, index builds and the search index before measuring. Every route
+in `app/routers` then gets `--requests` requests through
+`httpx.ASGITransport`, `--concurrency` at a time, after `--warmup`
+unmeasured ones. The report gives p50/p95/p99 latency and throughput per
+scenario.
+
+`--save` writes the results to `--baseline`. Without it, the run is
+compared with the saved baseline and exits non-zero when a scenario's
+`--metric` percentile is more than `--max-regression` percent slower.
+Differences under `--min-delta-ms` count as noise. A 5xx, or a route that
+no scenario covers, also fails the run. Baselines only compare on the
+same machine, dataset and settings; the file records them.
+
+In-process numbers leave out the network and the HTTP server, but
+include everything from middleware to the database. Write scenarios
+insert documents, so point this at a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from bench.query_audit import Scenario, _wait_for, route_templates
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "routes.json"
+PASSWORD = "bench-password"
+ADMIN_TOKEN = "bench"
+PERCENTILES = (50, 95, 99)
+
+
+def scenarios(ids: Dict[str, Any]) -> List[Scenario]:
+    """One or more scenarios per route. `{n}` in a body is replaced with the
+    request number, so creates do not collide."""
+    code = ids["course_code"]
+    admin = {"X-Admin-Token": ADMIN_TOKEN}
+    return [
+        Scenario("GET", "/healthz"),
+        Scenario("GET", "/readyz"),
+        Scenario("GET", "/metrics"),
+        Scenario("POST", "/api/auth/register", json={"username": "bench_{n}", "email": "bench_{n}@example.com", "password": PASSWORD}),
+        Scenario("POST", "/api/auth/login", json={"username": ids["username"], "password": PASSWORD}),
+        Scenario("GET", "/api/users/me", auth=True),
+        Scenario("GET", "/api/users/{user_id}"),
+        Scenario("GET", "/api/courses"),
+        Scenario("GET", "/api/courses", params={"stream": 1, "limit": 500}),
+        Scenario("GET", "/api/courses/{course_id}"),
+        Scenario("GET", "/api/courses/{course_id}/page"),
+        Scenario("POST", "/api/courses", json={"courseCode": "BNCH {n}", "courseName": "Bench", "department": None, "professor": None, "semester": None, "year": None, "description": None}),
+        Scenario("GET", "/api/problems"),
+        Scenario("GET", "/api/problems", params={"courseCode": code}),
+        Scenario("GET", "/api/problems", params={"courseId": "{course_id}", "fields": "title,votes"}),
+        Scenario("GET", "/api/problems", params={"stream": 1, "limit": 500}),
+        Scenario("GET", "/api/problems/{problem_id}"),
+        Scenario("GET", "/api/problems/{problem_id}/bundle"),
+        Scenario("POST", "/api/problems", auth=True, json={"courseId": code, "title": "Bench {n}", "description": "d", "tags": [], "difficulty": None, "examType": None}),
+        Scenario("POST", "/api/problems/{problem_id}/vote", json={"delta": 1}),
+        Scenario("POST", "/api/problems:bulk", auth=True, ndjson=[
+            {"courseId": code, "title": "Bulk {n}", "description": "d", "difficulty": None, "examType": None} for _ in range(20)
+        ]),
+        Scenario("GET", "/api/responses/problem/{problem_id}"),
+        Scenario("POST", "/api/responses", auth=True, json={"problemId": "{problem_id}", "content": "bench {n}"}),
+        Scenario("POST", "/api/responses/{response_id}/vote", json={"delta": 1}),
+        Scenario("GET", "/api/comments/problem/{problem_id}"),
+        Scenario("POST", "/api/comments", auth=True, json={"problemId": "{problem_id}", "content": "bench {n}"}),
+        Scenario("POST", "/api/comments/{comment_id}/vote", json={"delta": 1}),
+        Scenario("GET", "/api/summaries"),
+        Scenario("GET", "/api/summaries", params={"courseCode": code}),
+        Scenario("POST", "/api/summaries", auth=True, json={"courseId": "{course_id}", "title": "Bench {n}", "content": "c"}),
+        Scenario("POST", "/api/summaries/{summary_id}/vote", json={"delta": 1}),
+        Scenario("POST", "/api/summaries:bulk", auth=True, ndjson=[
+            {"courseId": "{course_id}", "title": "Bulk {n}", "content": "c"} for _ in range(20)
+        ]),
+        Scenario("GET", "/api/search", params={"q": "dynamic programming"}),
+        Scenario("GET", "/api/search/suggest", params={"q": code[:3]}),
+        Scenario("GET", "/api/admin/indexes", headers=admin),
+        Scenario("POST", "/api/admin/indexes/ensure", headers=admin),
+        Scenario("GET", "/api/admin/export", headers=admin),
+        Scenario("GET", "/api/admin/export/{collection}", headers=admin),
+    ]
+
+
+def label(sc: Scenario) -> str:
+    return f"{sc.method} {sc.path}" + (" " + "&".join(f"{k}={v}" for k, v in sorted(sc.params.items())) if sc.params else "")
+
+
+def _render(value: Any, ids: Dict[str, Any], n: int) -> Any:
+    if isinstance(value, str):
+        if value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+            return str(ids[value[1:-1]])
+        return value.replace("{n}", str(n))
+    if isinstance(value, dict):
+        return {k: _render(v, ids, n) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_render(v, ids, n) for v in value]
+    return value
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # nearest rank
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+async def _send(client: httpx.AsyncClient, sc: Scenario, ids: Dict[str, Any], n: int, token: Optional[str]) -> httpx.Response:
+    path = sc.path.format(**{k: str(v) for k, v in ids.items()})
+    headers = dict(sc.headers)
+    if sc.auth and token:
+        headers["Authorization"] = f"Bearer {token}"
+    params = _render(sc.params, ids, n)
+    if sc.ndjson is not None:
+        headers["Content-Type"] = "application/x-ndjson"
+        body = "\n".join(json.dumps(_render(line, ids, n)) for line in sc.ndjson).encode()
+        return await client.request(sc.method, path, params=params, content=body, headers=headers)
+    return await client.request(sc.method, path, params=params, json=_render(sc.json, ids, n), headers=headers)
+
+
+async def measure(client: httpx.AsyncClient, sc: Scenario, ids: Dict[str, Any], token: Optional[str], requests: int, concurrency: int, warmup: int, first: int) -> Dict[str, Any]:
+    """Send `warmup` then `requests` requests, `concurrency` at a time."""
+    counter = iter(range(first, first + warmup + requests))
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def worker(record: bool, budget: int) -> None:
+        for _ in range(budget):
+            n = next(counter)
+            start = time.perf_counter()
+            resp = await _send(client, sc, ids, n, token)
+            # streamed bodies are read in full, as a client would
+            await resp.aread()
+            elapsed = time.perf_counter() - start
+            if record:
+                latencies.append(elapsed)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    def split(total: int) -> List[int]:
+        return [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+
+    await asyncio.gather(*(worker(False, b) for b in split(warmup)))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(True, b) for b in split(requests)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    result: Dict[str, Any] = {f"p{p}": round(percentile(latencies, p) * 1000, 3) for p in PERCENTILES}
+    result.update({
+        "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "requests": len(latencies),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    })
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], metric: str, max_regression: float, min_delta_ms: float) -> List[str]:
+    """Scenarios whose `metric` got slower than the baseline allows."""
+    failures = []
+    for name, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if not before or metric not in before:
+            continue
+        old, new = before[metric], now[metric]
+        if new - old > min_delta_ms and new > old * (1 + max_regression / 100):
+            failures.append(f"{name}: {metric} {old:.2f}ms -> {new:.2f}ms (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return failures
+
+
+async def dataset_ids(db) -> Dict[str, Any]:
+    """Ids for the scenarios: the biggest course and its most voted problem."""
+    course = await db.courses.find_one({}, sort=[("problemCount", -1)])
+    problem = await db.problems.find_one({"courseId": course["_id"]}, sort=[("votes", -1)]) or await db.problems.find_one({})
+    response = await db.responses.find_one({"problemId": problem["_id"]}) or await db.responses.find_one({})
+    comment = await db.comments.find_one({"problemId": problem["_id"]}) or await db.comments.find_one({})
+    summary = await db.summaries.find_one({"courseId": course["_id"]}) or await db.summaries.find_one({})
+    user = await db.users.find_one({"username": "user0"}) or await db.users.find_one({})
+    return {
+        "user_id": user["_id"], "username": user["username"], "course_id": course["_id"], "course_code": course["courseCode"],
+        "problem_id": problem["_id"], "response_id": response["_id"], "comment_id": comment["_id"], "summary_id": summary["_id"],
+        "collection": "courses",
+    }
+
+
+async def prepare(args) -> Dict[str, int]:
+    """Generate the dataset into an empty database; returns its counts.
+
+    Runs before the app starts, so warm-up seeding, the course catalog and
+    the search index all see the finished dataset."""
+    from app import synth
+    from app.database import settings
+    from uarchive_common.mongo import create_client
+    from app.services import auth as auth_service
+
+    client = create_client(args.mongo_uri, settings)
+    db = client.get_default_database()
+    try:
+        counts = {name: await db[name].estimated_document_count() for name in synth.COLLECTIONS}
+        if not any(counts.values()):
+            print(f"generating the dataset ({args.problems} problems, seed {args.seed})")
+            plan = synth.Plan(argparse.Namespace(problems=args.problems, seed=args.seed, users=None, courses=None, responses=None, comments=None, summaries=None))
+            await synth.generate(db, plan, auth_service.get_password_hash(PASSWORD))
+            counts = plan.counts()
+        elif not await db.users.find_one({"username": "user0"}):
+            raise SystemExit(f"{db.name} has data but was not made by app.synth; use an empty database")
+        return counts
+    finally:
+        client.close()
+
+
+async def run(args) -> Dict[str, Any]:
+    from app.main import build_app
+
+    counts = await prepare(args)
+    app = build_app()
+    async with app.router.lifespan_context(app):
+        db = app.state.db
+        await _wait_for(lambda: app.state.warmup.ready, args.timeout, "warm-up")
+        await _wait_for(lambda: app.state.index_manager.finished_at is not None, args.timeout, "index builds")
+        await _wait_for(lambda: app.state.search_index.ready, args.timeout, "search index")
+
+        ids = await dataset_ids(db)
+        plan = scenarios(ids)
+        uncovered = route_templates(app) - {(sc.method, sc.path) for sc in plan}
+        if args.only:
+            plan = [sc for sc in plan if args.only in label(sc)]
+            uncovered = set()
+
+        routes: Dict[str, Any] = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            resp = await client.post("/api/auth/login", json={"username": ids["username"], "password": PASSWORD})
+            token = resp.json().get("access_token") if resp.status_code == 200 else None
+            if not token:
+                raise SystemExit(f"login failed: {resp.status_code} {resp.text[:200]}")
+            for i, sc in enumerate(plan):
+                name = label(sc)
+                routes[name] = await measure(client, sc, ids, token, args.requests, args.concurrency, args.warmup, i * 1_000_000)
+                r = routes[name]
+                print(f"  {name:<70} p50 {r['p50']:8.2f}  p95 {r['p95']:8.2f}  p99 {r['p99']:8.2f} ms  {r['rps']:8.1f} req/s  {r['statuses']}")
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "documents": counts,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "responseCache": os.environ.get("RESPONSE_CACHE_BACKEND", "memory"),
+        },
+        "routes": routes,
+        "uncovered": sorted(f"{m} {p}" for m, p in uncovered),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017/uarchive_bench"), help="includes the database name")
+    parser.add_argument("--problems", type=int, default=50_000, help="dataset size when the database is empty")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=300, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=30, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", help="run scenarios whose label contains this")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--metric", choices=[f"p{p}" for p in PERCENTILES], default="p95")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed slowdown, percent")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="slowdowns smaller than this are noise")
+    parser.add_argument("--no-response-cache", action="store_true", help="measure every route uncached")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds to wait for warm-up and index builds")
+    parser.add_argument("--verbose", action="store_true", help="keep per-request logging")
+    args = parser.parse_args()
+
+    # the app reads its configuration from the environment at import time
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+    os.environ.setdefault("JWT_SECRET", "bench")
+    if args.no_response_cache:
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+    logging.basicConfig(level=logging.INFO)
+    if not args.verbose:
+        # one access log line per request would dominate the numbers
+        logging.getLogger("uvicorn.error").setLevel(logging.WARNING)
+
+    results = asyncio.run(run(args))
+    failures = []
+    for name, r in results["routes"].items():
+        errors = sum(v for k, v in r["statuses"].items() if k.startswith("5"))
+        if errors:
+            failures.append(f"{name}: {errors} responses with a 5xx status")
+    for route in results["uncovered"]:
+        failures.append(f"no scenario for {route}")
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nbaseline written to {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["meta"].get("documents") != results["meta"]["documents"]:
+            print("warning: the baseline was taken on a different dataset")
+        failures += compare(results, baseline, args.metric, args.max_regression, args.min_delta_ms)
+    else:
+        print(f"\nno baseline at {args.baseline}; run with --save to create one")
+
+    for failure in failures:
+        print(f"  FAIL {failure}")
+    print(f"\n{len(failures)} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
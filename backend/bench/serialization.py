@@ -0,0 +1,91 @@
+"""Compare list serialization paths on synthetic problem documents.
+
+Run from the `backend` directory:
+
+    python -m bench.serialization --docs 1000 --rounds 20
+
+`legacy` is what list routes did before: `parse_obj` per document, then
+FastAPI re-validating the list against `response_model` and rendering it
+with `JSONResponse`. `trusted` is `services.serialization.dump_many`.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.models import schemas
+from app.services import serialization
+
+
+def make_docs(n: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    course_ids = [ObjectId() for _ in range(20)]
+    start = datetime(2024, 9, 1)
+    docs = []
+    for i in range(n):
+        created = start + timedelta(minutes=rng.randrange(500_000))
+        docs.append({
+            "_id": ObjectId(),
+            "courseId": rng.choice(course_ids),
+            "courseCode": f"CPSC {rng.randrange(200, 600)}",
+            "title": f"Problem {i}: " + " ".join(rng.choice(["graph", "cut", "dp", "greedy", "proof"]) for _ in range(6)),
+            "description": "lorem ipsum " * rng.randrange(10, 80),
+            "tags": rng.sample(["DP", "Graphs", "Greedy", "Proofs", "Complexity", "Trees"], 3),
+            "difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+            "examType": rng.choice(["Midterm", "Final", "Quiz"]),
+            "authorId": ObjectId(),
+            "authorUsername": f"user{rng.randrange(1000)}",
+            "votes": rng.randrange(500),
+            "createdAt": created,
+            "updatedAt": created,
+        })
+    return docs
+
+
+def legacy(docs: List[dict]) -> bytes:
+    items = [schemas.ProblemOut.parse_obj(doc) for doc in docs]
+    content = asyncio.run(serialize_response(field=_LEGACY_FIELD, response_content=items))
+    return JSONResponse(content).body
+
+
+def trusted(docs: List[dict]) -> bytes:
+    return serialization.dump_many(schemas.ProblemOut, docs)
+
+
+_LEGACY_FIELD = create_model_field("Response", List[schemas.ProblemOut], mode="serialization")
+
+
+def measure(fn: Callable[[List[dict]], bytes], docs: List[dict], rounds: int) -> List[float]:
+    fn(docs)  # warm up adapters and caches
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(docs)
+        samples.append((time.perf_counter() - start) / len(docs) * 1e6)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    docs = make_docs(args.docs)
+    results = {name: measure(fn, docs, args.rounds) for name, fn in (("legacy", legacy), ("trusted", trusted))}
+    for name, samples in results.items():
+        print(f"{name:>8}: median {statistics.median(samples):7.2f} us/doc  min {min(samples):7.2f} us/doc")
+    speedup = statistics.median(results["legacy"]) / statistics.median(results["trusted"])
+    print(f"speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,5 +12,7 @@ fi
 
 pip install -r backend/requirements.txt
 
+# the shared uarchive_common package lives in the repository root
+export PYTHONPATH="$SCRIPT_DIR${PYTHONPATH:+:$PYTHONPATH}"
 cd backend
 python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 # --reload
@@ -0,0 +1,85 @@
+"""Small in-memory stand-ins for the Motor calls the code under test makes.
+
+Only what the tests need: these are not a Mongo emulator.
+"""
+from types import SimpleNamespace
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    def batch_size(self, n):
+        return self
+
+    def __aiter__(self):
+        async def gen():
+            for doc in self.docs:
+                yield doc
+        return gen()
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+        self.bulk_ops = []
+        self.updates = []
+
+    def find(self, query=None, projection=None):
+        id_filter = (query or {}).get("_id")
+        if isinstance(id_filter, dict) and "$in" in id_filter:
+            return FakeCursor(self.docs[i] for i in id_filter["$in"] if i in self.docs)
+        return FakeCursor(self.docs.values())
+
+    async def find_one(self, query):
+        doc = self.docs.get(query.get("_id"))
+        return dict(doc) if doc is not None else None
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self.docs[doc["_id"]] = doc
+
+    async def bulk_write(self, ops, ordered=True):
+        # applies `$inc` on `_id` filters; everything else is only recorded
+        self.bulk_ops.extend(ops)
+        matched = 0
+        for op in ops:
+            doc = self.docs.get(op._filter.get("_id"))
+            if doc is None:
+                continue
+            matched += 1
+            for field, delta in op._doc.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + delta
+        return SimpleNamespace(matched_count=matched)
+
+    async def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update))
+
+    async def drop(self):
+        self.docs.clear()
+        self.indexes = []
+
+    async def index_information(self):
+        return {}
+
+    async def create_indexes(self, models):
+        self.indexes = getattr(self, "indexes", []) + [m.document["name"] for m in models]
+
+
+class FakeDB:
+    name = "fake"
+
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self):
+        return list(self.collections)
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timezone
+
+from bson import Int64, ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from app import archive
+from app.indexes import REQUIRED_INDEXES
+
+from .fakes import FakeCollection, FakeDB
+
+SINCE = datetime(2026, 1, 31, tzinfo=timezone.utc)
+
+
+def test_incremental_collections_filter_on_timestamps():
+    assert archive.since_filter("problems", None) == {}
+    assert archive.since_filter("problems", SINCE) == {"$or": [
+        {"updatedAt": {"$gte": SINCE}},
+        {"updatedAt": {"$exists": False}, "createdAt": {"$gte": SINCE}},
+    ]}
+
+
+def test_collections_without_timestamps_export_in_full():
+    assert archive.since_filter("migrations", SINCE) == {}
+
+
+def test_every_incremental_collection_has_an_updated_at_index():
+    indexed = {spec.collection for spec in REQUIRED_INDEXES if spec.keys == (("updatedAt", 1),)}
+    assert indexed == archive.INCREMENTAL
+
+
+class UniqueUsers(FakeCollection):
+    """Enforces `_id` and a unique `username` the way the server reports it."""
+
+    def _clash(self, doc):
+        return any(d["username"] == doc["username"] and d["_id"] != doc["_id"] for d in self.docs.values())
+
+    @staticmethod
+    def _raise(errors):
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for i, doc in enumerate(docs):
+            if doc["_id"] in self.docs or self._clash(doc):
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key"})
+            else:
+                self.docs[doc["_id"]] = doc
+        self._raise(errors)
+
+    async def bulk_write(self, ops, ordered=True):
+        errors = []
+        for i, op in enumerate(ops):
+            if self._clash(op._doc):
+                errors.append({"index": i, "code": 11000, "errmsg": "E11000 duplicate key: username"})
+            else:
+                self.docs[op._doc["_id"]] = op._doc
+        self._raise(errors)
+
+
+class ArchiveDB(FakeDB):
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, UniqueUsers(name) if name == "users" else FakeCollection(name))
+
+
+def _user(name, **extra):
+    return {"_id": ObjectId(), "username": name, "contributionCount": Int64(3), "joinedAt": SINCE, **extra}
+
+
+def test_canonical_json_keeps_bson_types():
+    doc = _user("a", score=1.0)
+    back = json_util.loads(archive.encode([doc]), json_options=archive._JSON)
+    assert back == doc
+    assert type(back["contributionCount"]) is Int64
+    assert type(back["score"]) is float
+
+
+def test_restore_replaces_existing_and_reports_unique_clashes(tmp_path):
+    async def scenario():
+        source = ArchiveDB()
+        kept, replaced, clashing = _user("kept"), _user("replaced", contributionCount=Int64(9)), _user("taken")
+        for doc in (kept, replaced, clashing):
+            source["users"].docs[doc["_id"]] = doc
+        await archive.export(source, tmp_path, codec="gzip")
+
+        target = ArchiveDB()
+        stale = dict(replaced, contributionCount=Int64(1))
+        other = _user("taken")  # a different user already holds the name
+        for doc in (stale, other):
+            target["users"].docs[doc["_id"]] = doc
+        report = await archive.restore(target, tmp_path)
+
+        users = report["users"]
+        assert users["documents"] == 2 and users["failed"] == 1
+        assert [f["_id"] for f in users["failures"]] == [clashing["_id"]]
+        assert target["users"].docs[replaced["_id"]]["contributionCount"] == 9
+        assert target["users"].docs[kept["_id"]] == kept
+        assert clashing["_id"] not in target["users"].docs
+
+    asyncio.run(scenario())
+
+
+def test_restore_with_drop_recreates_indexes(tmp_path):
+    async def scenario():
+        source = ArchiveDB()
+        doc = _user("a")
+        source["users"].docs[doc["_id"]] = doc
+        await archive.export(source, tmp_path, codec="gzip")
+        target = ArchiveDB()
+        target["users"].docs[ObjectId()] = _user("gone")
+        report = await archive.restore(target, tmp_path, drop=True)
+        assert report["users"]["documents"] == 1
+        assert list(target["users"].docs) == [doc["_id"]]
+        assert "username_1" in target["users"].indexes
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+import asyncio
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.services.conditional import (
+    SHORT,
+    document_etag,
+    document_not_modified,
+    etag_for,
+    matches,
+    not_modified,
+)
+
+from .fakes import FakeDB
+
+
+def _request(path="/api/courses", query=b"", accept=b"application/json", if_none_match=None):
+    headers = [(b"accept", accept)]
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query,
+                    "headers": headers, "scheme": "http", "server": ("t", 80)})
+
+
+def test_etag_depends_on_versions_path_query_and_accept():
+    base = etag_for(_request(), {"courses": 3})
+    assert base == etag_for(_request(), {"courses": 3})
+    assert base != etag_for(_request(), {"courses": 4})
+    assert base != etag_for(_request(path="/api/problems"), {"courses": 3})
+    assert base != etag_for(_request(query=b"limit=5"), {"courses": 3})
+    assert base != etag_for(_request(accept=b"application/x-ndjson"), {"courses": 3})
+
+
+def test_tags_are_weak():
+    # GZip changes the bytes of a body under the same tag
+    assert etag_for(_request(), {"courses": 3}).startswith('W/"')
+    assert document_etag(_request(), "id", 1).startswith('W/"')
+
+
+def test_document_etag_depends_on_values_and_request():
+    base = document_etag(_request(path="/api/problems/1"), "1", "2026-01-01", 4)
+    assert base == document_etag(_request(path="/api/problems/1"), "1", "2026-01-01", 4)
+    assert base != document_etag(_request(path="/api/problems/1"), "1", "2026-01-01", 5)
+    assert base != document_etag(_request(path="/api/problems/1"), "1", "2026-01-02", 4)
+    assert base != document_etag(_request(path="/api/problems/1", accept=b"text/html"), "1", "2026-01-01", 4)
+
+
+def test_if_none_match_uses_weak_comparison():
+    tag = 'W/"abc"'
+    assert matches('"abc"', tag)
+    assert matches('W/"abc"', tag)
+    assert matches('W/"abc"', '"abc"')
+    assert matches('"x", W/"abc"', tag)
+    assert matches("*", tag)
+    assert not matches('"abd"', tag)
+    assert not matches(None, tag)
+    assert not matches("", tag)
+
+
+def test_not_modified_tags_response_and_answers_304_on_match():
+    db = FakeDB()
+    db["versions"].docs["courses"] = {"_id": "courses", "v": 3}
+
+    async def run():
+        response = Response()
+        assert await not_modified(_request(), response, db, ["courses"], SHORT) is None
+        etag = response.headers["etag"]
+        assert etag == etag_for(_request(), {"courses": 3})
+        assert response.headers["cache-control"] == SHORT
+        assert response.headers["vary"] == "Accept"
+
+        hit = await not_modified(_request(if_none_match=etag), Response(), db, ["courses"], SHORT)
+        assert hit.status_code == 304
+        assert hit.headers["etag"] == etag
+        assert hit.body == b""
+
+        # a write bumps the counter, so the old tag no longer matches
+        db["versions"].docs["courses"]["v"] = 4
+        response = Response()
+        assert await not_modified(_request(if_none_match=etag), response, db, ["courses"], SHORT) is None
+        assert response.headers["etag"] != etag
+
+    asyncio.run(run())
+
+
+def test_document_not_modified_tags_response_and_answers_304_on_match():
+    path = "/api/problems/1"
+    response = Response()
+    assert document_not_modified(_request(path=path), response, SHORT, "1", "2026-01-01", 4) is None
+    etag = response.headers["etag"]
+    assert etag == document_etag(_request(path=path), "1", "2026-01-01", 4)
+    assert response.headers["cache-control"] == SHORT
+
+    hit = document_not_modified(_request(path=path, if_none_match=etag), Response(), SHORT, "1", "2026-01-01", 4)
+    assert hit.status_code == 304
+    assert hit.headers["etag"] == etag
+
+    assert document_not_modified(_request(path=path, if_none_match=etag), Response(), SHORT, "1", "2026-01-01", 5) is None
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from uarchive_common import http_metrics
+from uarchive_common.http_metrics import HTTPMetricsMiddleware
+
+
+def build():
+    app = FastAPI()
+    problems = APIRouter()
+
+    @problems.get("/{problem_id}")
+    def get_problem(problem_id: str):
+        return {"id": problem_id}
+
+    @problems.get("/{problem_id}/responses/{n}")
+    def nth_response(problem_id: str, n: int):
+        raise HTTPException(status_code=404)
+
+    bulk = APIRouter()
+
+    @bulk.post("/problems:bulk")
+    def bulk_problems():
+        return {}
+
+    @app.get("/healthz")
+    def health():
+        return {}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a", b"b"]))
+
+    app.include_router(problems, prefix="/api/problems")
+    app.include_router(bulk, prefix="/api")
+    app.add_middleware(HTTPMetricsMiddleware)
+    return app
+
+
+def count(method, route, status):
+    return http_metrics._requests.value(method=method, route=route, status=str(status))
+
+
+def test_requests_are_labelled_by_full_route_template():
+    client = TestClient(build())
+    cases = [
+        ("GET", "/api/problems/abc", "/api/problems/{problem_id}", 200),
+        ("GET", "/api/problems/abc/responses/3", "/api/problems/{problem_id}/responses/{n}", 404),
+        ("POST", "/api/problems:bulk", "/api/problems:bulk", 200),
+        ("GET", "/healthz", "/healthz", 200),
+        ("GET", "/stream", "/stream", 200),
+        ("GET", "/no/such/route", http_metrics.UNMATCHED, 404),
+    ]
+    before = {c: count(c[0], c[2], c[3]) for c in cases}
+    for method, path, _, status in cases:
+        assert client.request(method, path).status_code == status
+    for case in cases:
+        assert count(case[0], case[2], case[3]) == before[case] + 1, case
+
+
+def test_raw_paths_never_become_labels():
+    client = TestClient(build())
+    client.get("/api/problems/some-unique-id-123")
+    rendered = http_metrics.registry.render()
+    assert "some-unique-id-123" not in rendered
+    assert http_metrics._in_flight.value(method="GET") == 0
+    assert http_metrics._duration.count(method="GET", route="/api/problems/{problem_id}") > 0
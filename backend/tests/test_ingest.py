@@ -0,0 +1,42 @@
+import asyncio
+
+from app.services import ingest
+from app.services.ingest import read_lines
+
+
+class _Body:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _lines(chunks):
+    async def run():
+        return [item async for item in read_lines(_Body(chunks))]
+    return asyncio.run(run())
+
+
+def test_lines_split_across_chunks():
+    assert _lines([b'{"a"', b': 1}\n\n{"b": 2', b'}\n', b'{"c": 3}']) == [
+        (1, b'{"a": 1}'),
+        (3, b'{"b": 2}'),
+        (4, b'{"c": 3}'),
+    ]
+
+
+def test_one_byte_chunks():
+    body = b"first\nsecond\n\nthird"
+    assert _lines([body[i:i + 1] for i in range(len(body))]) == [(1, b"first"), (2, b"second"), (4, b"third")]
+
+
+def test_oversized_lines_are_yielded_as_none(monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_LINE_BYTES", 8)
+    assert _lines([b"ok\n0123", b"456789", b"abc\nfine\n", b"0123456789"]) == [
+        (1, b"ok"),
+        (2, None),
+        (3, b"fine"),
+        (4, None),
+    ]
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.services.pagination import apply_cursor, decode_cursor, encode_cursor, keyset_filter, page_limit
+
+SORT = [("createdAt", -1), ("_id", -1)]
+
+
+def test_cursor_round_trips_dates_and_object_ids():
+    doc = {"_id": ObjectId(), "createdAt": datetime(2025, 3, 1, 12, 30), "title": "ignored"}
+    token = encode_cursor(doc, SORT)
+    assert "=" not in token
+    values = decode_cursor(token, SORT)
+    assert values[1] == doc["_id"]
+    assert values[0].replace(tzinfo=None) == doc["createdAt"]
+
+
+@pytest.mark.parametrize("token", ["not base64!", "bm90IGpzb24", encode_cursor({"_id": 1}, [("_id", 1)])])
+def test_bad_cursors_are_rejected(token):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(token, SORT)
+    assert exc.value.status_code == 400
+
+
+def test_keyset_filter_generalizes_to_mixed_directions():
+    f = keyset_filter([("votes", -1), ("title", 1), ("_id", -1)], [5, "b", 9])
+    assert f == {"$or": [
+        {"votes": {"$lt": 5}},
+        {"votes": 5, "title": {"$gt": "b"}},
+        {"votes": 5, "title": "b", "_id": {"$lt": 9}},
+    ]}
+
+
+def test_apply_cursor_keeps_the_route_filter():
+    token = encode_cursor({"createdAt": 1, "_id": 2}, SORT)
+    assert apply_cursor({}, SORT, None) == {}
+    assert apply_cursor({"courseId": 7}, SORT, token)["$and"][0] == {"courseId": 7}
+
+
+def test_page_limit_is_clamped():
+    assert page_limit(None) == 50
+    assert page_limit(0) == 1
+    assert page_limit(10_000) == 200
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from bench.query_audit import MAX_BULK_STATEMENTS, QueryRecorder, audit_plan, docs_examined, is_full_read, winning_stages
+
+
+def _explain(stage_tree, examined=0, returned=0):
+    return {
+        "queryPlanner": {"winningPlan": stage_tree, "rejectedPlans": [{"stage": "COLLSCAN"}]},
+        "executionStats": {"totalDocsExamined": examined, "nReturned": returned},
+    }
+
+
+IXSCAN = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "votes_-1"}}}
+FIND = {"find": "problems", "filter": {"courseCode": "CS 101"}, "sort": {"votes": -1}, "limit": 20}
+
+
+def test_winning_stages_ignore_rejected_plans():
+    assert winning_stages(_explain(IXSCAN)) == ["LIMIT", "FETCH", "IXSCAN"]
+
+
+def test_winning_stages_inside_aggregation():
+    explain = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}, {"$group": {}}]}
+    assert winning_stages(explain) == ["COLLSCAN"]
+
+
+def test_docs_examined_sums_every_stage():
+    explain = {"stages": [{"$cursor": {"executionStats": {"totalDocsExamined": 7, "nReturned": 2}}}, {"executionStats": {"totalDocsExamined": 3, "nReturned": 1}}]}
+    assert docs_examined(explain) == (10, 3)
+
+
+def test_indexed_query_passes():
+    assert audit_plan("find", FIND, _explain(IXSCAN, examined=20, returned=20), 10.0) == ([], [])
+
+
+def test_collscan_and_in_memory_sort_fail():
+    plan = {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+    failures, _ = audit_plan("find", FIND, _explain(plan, examined=20, returned=20), 10.0)
+    assert failures == ["COLLSCAN", "in-memory SORT"]
+
+
+def test_examined_ratio_fails():
+    failures, _ = audit_plan("find", FIND, _explain(IXSCAN, examined=500, returned=20), 10.0)
+    assert len(failures) == 1 and failures[0].startswith("examined 500 docs")
+
+
+def test_full_read_is_only_noted():
+    command = {"find": "courses", "filter": {}}
+    assert is_full_read("find", command)
+    assert not is_full_read("find", FIND)
+    failures, notes = audit_plan("find", command, _explain({"stage": "COLLSCAN"}, examined=900, returned=900), 10.0)
+    assert failures == [] and notes == ["full collection read (unfiltered)"]
+
+
+def test_recorder_splits_bulk_updates_and_strips_session_fields():
+    recorder = QueryRecorder()
+    recorder.enabled, recorder.route = True, "POST /x"
+    updates = [{"q": {"_id": i}, "u": {"$inc": {"votes": 1}}} for i in range(MAX_BULK_STATEMENTS + 2)]
+    command = {"update": "problems", "updates": updates, "ordered": False, "lsid": {"id": 1}, "$db": "db"}
+    recorder.started(SimpleNamespace(command_name="update", command=command, database_name="db"))
+    recorder.started(SimpleNamespace(command_name="insert", command={"insert": "problems"}, database_name="db"))
+    assert len(recorder.captured) == MAX_BULK_STATEMENTS
+    first = recorder.captured[0]
+    assert first.route == "POST /x" and first.command["updates"] == updates[:1]
+    assert "lsid" not in first.command and "$db" not in first.command
+
+
+@pytest.mark.skipif(not os.getenv("AUDIT_MONGO_URI"), reason="set AUDIT_MONGO_URI to a disposable mongod to run the audit")
+def test_query_audit_end_to_end():
+    """The whole audit, at a small volume, against a real server."""
+    backend = Path(__file__).resolve().parents[1]
+    result = subprocess.run(
+        [sys.executable, "-m", "bench.query_audit", "--mongo-uri", os.environ["AUDIT_MONGO_URI"], "--problems", "2000", "--backend-db", "uarchive_query_audit_test"],
+        cwd=backend,
+        capture_output=True,
+        text=True,
+        timeout=900,
+    )
+    assert result.returncode == 0, result.stdout[-4000:] + result.stderr[-4000:]
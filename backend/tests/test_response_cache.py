@@ -0,0 +1,220 @@
+import asyncio
+
+import pytest
+
+from app.services.response_cache import LRUBackend, RedisBackend, RespError, _RespConnection
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# -- LRUBackend ------------------------------------------------------------------
+
+
+def test_lru_evicts_least_recently_used_by_bytes():
+    async def scenario():
+        # each entry costs len(key) + len(value) = 1 + 9 bytes
+        lru = LRUBackend(max_bytes=30)
+        for key in "abc":
+            await lru.set(key, b"x" * 9, [], ttl=60)
+        assert lru.size == 30
+        await lru.get("a")  # "b" is now the least recently used
+        await lru.set("d", b"x" * 9, [], ttl=60)
+        assert lru.size == 30
+        assert await lru.get("b") is None
+        assert await lru.get("a") == b"x" * 9  # order is now c, d, a
+        # one large entry pushes out as many as it needs, oldest first
+        await lru.set("e", b"y" * 19, [], ttl=60)
+        assert lru.size == 30
+        assert [k for k in "acde" if await lru.get(k) is not None] == ["a", "e"]
+
+    run(scenario())
+
+
+def test_lru_skips_values_larger_than_the_cache():
+    async def scenario():
+        lru = LRUBackend(max_bytes=10)
+        await lru.set("a", b"x" * 5, [], ttl=60)
+        await lru.set("big", b"x" * 20, [], ttl=60)
+        assert await lru.get("big") is None
+        assert await lru.get("a") == b"x" * 5
+
+    run(scenario())
+
+
+def test_lru_expires_entries():
+    async def scenario():
+        lru = LRUBackend(max_bytes=100)
+        await lru.set("a", b"v", [], ttl=-1)
+        assert await lru.get("a") is None
+        assert lru.size == 0
+
+    run(scenario())
+
+
+def test_lru_tag_invalidation_spans_keys():
+    async def scenario():
+        lru = LRUBackend(max_bytes=1000)
+        await lru.set("page1", b"1", ["problems", "problem:1", "problem:2"], ttl=60)
+        await lru.set("page2", b"2", ["problems", "problem:3"], ttl=60)
+        await lru.set("course", b"3", ["course:9"], ttl=60)
+        await lru.invalidate(["problem:2"])
+        assert await lru.get("page1") is None
+        assert await lru.get("page2") == b"2"
+        await lru.invalidate(["problems"])
+        assert await lru.get("page2") is None
+        assert await lru.get("course") == b"3"
+        # no tag keeps a dangling key around
+        assert set(lru._tags) == {"course:9"}
+        assert lru.size == len("course") + 1
+
+    run(scenario())
+
+
+# -- RedisBackend against a fake server ----------------------------------------------
+
+
+class FakeRedis:
+    """Just enough of a RESP2 server: GET/SET/SADD/SMEMBERS/PEXPIRE/DEL."""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+        self.connections = 0
+        self._writers = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop_connections()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop_connections(self):
+        for writer in self._writers:
+            writer.close()
+        self._writers.clear()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                args = []
+                for _ in range(int(line[1:-2])):
+                    n = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(n + 2))[:-2])
+                self.commands.append(args[0].decode().upper())
+                writer.write(self._reply(args[0].decode().upper(), args[1:]))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+
+    @staticmethod
+    def _bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _reply(self, cmd, args):
+        if cmd == "GET":
+            value = self.data.get(args[0])
+            return self._bulk(value if isinstance(value, bytes) else None)
+        if cmd == "SET":
+            self.data[args[0]] = args[1]
+            return b"+OK\r\n"
+        if cmd == "SADD":
+            members = self.data.setdefault(args[0], set())
+            before = len(members)
+            members.update(args[1:])
+            return b":%d\r\n" % (len(members) - before)
+        if cmd == "SMEMBERS":
+            members = sorted(self.data.get(args[0], ()))
+            return b"*%d\r\n" % len(members) + b"".join(self._bulk(m) for m in members)
+        if cmd == "PEXPIRE":
+            return b":%d\r\n" % (args[0] in self.data)
+        if cmd == "DEL":
+            return b":%d\r\n" % sum(self.data.pop(k, None) is not None for k in args)
+        return b"-ERR unknown command '%s'\r\n" % cmd.encode()
+
+
+def with_redis(test):
+    async def scenario():
+        server = FakeRedis()
+        port = await server.start()
+        try:
+            await test(server, RedisBackend(f"redis://127.0.0.1:{port}/0", pool_size=2))
+        finally:
+            await server.stop()
+
+    run(scenario())
+
+
+def test_redis_bulk_strings_and_nil():
+    async def test(server, redis):
+        assert await redis.get("missing") is None
+        await redis.set("k", b"line1\r\nline2", ["t"], ttl=5)
+        assert await redis.get("k") == b"line1\r\nline2"
+        assert await redis.get("other") is None
+
+    with_redis(test)
+
+
+def test_redis_tag_invalidation_spans_keys():
+    async def test(server, redis):
+        await redis.set("a", b"1", ["problems", "problem:1"], ttl=5)
+        await redis.set("b", b"2", ["problems"], ttl=5)
+        await redis.set("c", b"3", ["course:1"], ttl=5)
+        await redis.invalidate(["problems"])
+        assert await redis.get("a") is None
+        assert await redis.get("b") is None
+        assert await redis.get("c") == b"3"
+        assert b"rc:tag:problems" not in server.data
+
+    with_redis(test)
+
+
+def test_redis_error_replies_stay_in_their_slot():
+    async def test(server, redis):
+        await redis.set("k", b"v", [], ttl=5)
+        replies = await redis._run([("BOGUS",), ("GET", "rc:k")])
+        assert isinstance(replies[0], RespError) and "unknown command" in str(replies[0])
+        # the connection is still in step with the server afterwards
+        assert replies[1] == b"v"
+        assert await redis.get("k") == b"v"
+
+    with_redis(test)
+
+
+def test_redis_reconnects_after_the_server_drops_the_connection():
+    async def test(server, redis):
+        await redis.set("k", b"v", [], ttl=5)
+        assert server.connections == 1
+        server.drop_connections()
+        await asyncio.sleep(0.05)
+        assert await redis.get("k") == b"v"
+        assert server.connections == 2
+        assert await redis.get("k") == b"v"
+        assert server.connections == 2
+
+    with_redis(test)
+
+
+def test_redis_connection_failure_surfaces():
+    async def scenario():
+        server = FakeRedis()
+        port = await server.start()
+        await server.stop()
+        with pytest.raises(OSError):
+            await RedisBackend(f"redis://127.0.0.1:{port}/0").get("k")
+
+    run(scenario())
+
+
+def test_resp_encoding():
+    assert _RespConnection.encode(("SET", "k", b"v\r\n", 5)) == b"*4\r\n$3\r\nSET\r\n$1\r\nk\r\n$3\r\nv\r\n\r\n$1\r\n5\r\n"
@@ -0,0 +1,89 @@
+import asyncio
+import math
+import random
+from collections import Counter
+
+import pytest
+from bson import ObjectId
+
+from app.services.search_index import B, K1, SearchIndex, _TERMS, tokenize
+
+WORDS = ["graph", "tree", "heap", "sort", "proof", "limit", "matrix", "vector", "prime", "queue"]
+
+
+def _corpus(rng, n):
+    kinds = ["courses", "problems", "summaries"]
+    docs = []
+    for _ in range(n):
+        kind = rng.choice(kinds)
+        # a skewed vocabulary: the first few words appear almost everywhere
+        text = " ".join(rng.choice(WORDS[: rng.randint(2, len(WORDS))]) for _ in range(rng.randint(1, 30)))
+        if kind == "courses":
+            doc = {"_id": ObjectId(), "courseCode": "X 1", "courseName": text[:20], "description": text}
+        elif kind == "problems":
+            doc = {"_id": ObjectId(), "title": text[:20], "description": text}
+        else:
+            doc = {"_id": ObjectId(), "title": text[:20], "content": text}
+        docs.append((kind, doc))
+    return docs
+
+
+def _brute_force(index, docs, query, kinds):
+    """Score every live document directly, with the index's own avgdl."""
+    terms = [t for t in dict.fromkeys(tokenize(query))]
+    tfs = {doc["_id"]: (kind, Counter(_TERMS[kind](doc))) for kind, doc in docs}
+    n = len(tfs)
+    df = {t: sum(1 for _, tf in tfs.values() if t in tf) for t in terms}
+    scores = []
+    for doc_id, (kind, tf) in tfs.items():
+        if kinds and kind not in kinds:
+            continue
+        length = sum(tf.values())
+        norm = K1 * (1 - B) + K1 * B * length / index._avgdl
+        score = 0.0
+        matched = False
+        for t in terms:
+            if t in tf:
+                matched = True
+                idf = math.log(1 + max(n - df[t] + 0.5, 0.5) / (df[t] + 0.5))
+                score += idf * tf[t] * (K1 + 1) / (tf[t] + norm)
+        if matched:
+            scores.append(score)
+    return sorted(scores, reverse=True)
+
+
+def _check(index, docs, query, kinds=None, offset=0, limit=20):
+    total, exact, page = index.search(query, kinds=kinds, offset=offset, limit=limit)
+    expected = _brute_force(index, docs, query, kinds)
+    got = [score for score, _ in page]
+    assert got == pytest.approx(expected[offset:offset + limit], rel=1e-9, abs=1e-9)
+    if exact:
+        assert total == len(expected)
+    if kinds:
+        assert all(meta.kind in kinds for _, meta in page)
+
+
+def test_ranking_matches_brute_force():
+    rng = random.Random(7)
+    docs = _corpus(rng, 3000)
+    index = SearchIndex()
+    for kind, doc in docs:
+        index.add(kind, doc)
+    asyncio.run(index.optimize())
+    # postings added after the sort are scored from the unsorted tail
+    late = _corpus(rng, 200)
+    for kind, doc in late:
+        index.add(kind, doc)
+    docs += late
+    for query in ["graph", "graph tree", "graph tree heap sort", "prime queue", "vector matrix limit proof"]:
+        _check(index, docs, query)
+        _check(index, docs, query, offset=40, limit=10)
+        # a filter that rejects most candidates must not end the scan early
+        _check(index, docs, query, kinds={"courses"})
+        _check(index, docs, query, kinds={"summaries", "problems"}, offset=5, limit=50)
+
+
+def test_unknown_terms_match_nothing():
+    index = SearchIndex()
+    index.add("problems", {"_id": ObjectId(), "title": "graph"})
+    assert index.search("zebra") == (0, True, [])
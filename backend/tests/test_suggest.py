@@ -0,0 +1,52 @@
+from bson import ObjectId
+
+from app.services.suggest import TOP_K, build_trie
+
+
+def course(code, name, enrolled=0, tags=()):
+    return {"_id": ObjectId(), "courseCode": code, "courseName": name, "enrollmentCount": enrolled, "tags": list(tags)}
+
+
+ALGO = course("CPSC 413", "Design & Analysis of Algorithms", 245, ["DP", "Graphs"])
+DSA = course("CPSC 331", "Data Structures & Algorithms", 420, ["Trees"])
+OS = course("CPSC 457", "Operating Systems", 312)
+TRIE = build_trie([ALGO, DSA, OS])
+
+
+def codes(prefix, limit=8):
+    return [c["courseCode"] for c, _, _ in TRIE.complete(prefix, limit)]
+
+
+def test_code_prefix_with_and_without_space():
+    assert codes("cpsc 4") == ["CPSC 457", "CPSC 413"]
+    assert codes("cpsc4") == ["CPSC 457", "CPSC 413"]
+    assert codes("  CPSC   41 ") == ["CPSC 413"]
+
+
+def test_word_starts_of_the_name_and_tags():
+    assert codes("algo") == ["CPSC 331", "CPSC 413"]
+    assert codes("syst") == ["CPSC 457"]
+    assert codes("grap") == ["CPSC 413"]
+    assert codes("lgorithms") == []
+
+
+def test_results_are_ranked_by_enrollment_and_listed_once():
+    assert codes("cpsc") == ["CPSC 331", "CPSC 457", "CPSC 413"]
+    assert codes("cpsc", limit=1) == ["CPSC 331"]
+
+
+def test_match_reports_the_field():
+    [(_, text, field)] = TRIE.complete("dp")
+    assert (text, field) == ("DP", "tags")
+
+
+def test_unknown_and_empty_prefixes():
+    assert codes("zzz") == []
+    assert codes("   ") == []
+
+
+def test_nodes_keep_only_the_best_top_k():
+    many = [course(f"MATH {i}", "Calculus", enrolled=i) for i in range(TOP_K + 10)]
+    trie = build_trie(many)
+    got = [c["enrollmentCount"] for c, _, _ in trie.complete("calc", TOP_K)]
+    assert got == list(range(TOP_K + 9, 9, -1))
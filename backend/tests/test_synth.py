@@ -0,0 +1,66 @@
+import asyncio
+from argparse import Namespace
+from collections import Counter
+
+from app import synth
+
+from .fakes import FakeDB
+
+
+def generate(seed, problems=2000):
+    plan = synth.Plan(Namespace(problems=problems, seed=seed, users=None, courses=None, responses=None, comments=None, summaries=None))
+    db = FakeDB()
+    asyncio.run(synth.generate(db, plan, "hash", batch_size=300, concurrency=4))
+    return db
+
+
+def docs(db, name):
+    return list(db[name].docs.values())
+
+
+def test_same_seed_gives_the_same_database():
+    a, b = generate(1), generate(1)
+    for name in synth.COLLECTIONS:
+        assert docs(a, name) == docs(b, name), name
+
+
+def test_another_seed_gives_different_data_and_ids():
+    a, c = generate(1), generate(2)
+    assert docs(a, "problems") != docs(c, "problems")
+    assert not set(a["problems"].docs) & set(c["problems"].docs)
+
+
+def test_counts_ids_and_course_codes():
+    db = generate(3)
+    plan_counts = {"users": 100, "courses": 9, "problems": 2000, "responses": 6000, "comments": 4000, "summaries": 500}
+    assert {name: len(db[name].docs) for name in synth.COLLECTIONS} == plan_counts
+    codes = [c["courseCode"] for c in docs(db, "courses")]
+    assert len(set(codes)) == len(codes)
+
+
+def test_references_resolve_and_replies_follow_their_problem():
+    db = generate(4)
+    problems = db["problems"].docs
+    users = db["users"].docs
+    courses = db["courses"].docs
+    for p in problems.values():
+        assert p["courseId"] in courses and p["authorId"] in users
+    for r in docs(db, "responses") + docs(db, "comments"):
+        assert r["createdAt"] >= problems[r["problemId"]]["createdAt"]
+        assert r["_id"].generation_time.replace(tzinfo=None) <= r["createdAt"]
+
+
+def test_distributions_are_skewed():
+    db = generate(5, problems=5000)
+    per_course = sorted(Counter(p["courseId"] for p in docs(db, "problems")).values(), reverse=True)
+    assert per_course[0] > 5 * per_course[len(per_course) // 2]
+    votes = [p["votes"] for p in docs(db, "problems")]
+    assert 0.1 < votes.count(0) / len(votes) < 0.5
+    assert max(votes) > 100 * sorted(votes)[len(votes) // 2]
+
+
+def test_denormalized_counters_are_written_back():
+    db = generate(6)
+    problem_counts = Counter(p["courseId"] for p in docs(db, "problems"))
+    written = {op._filter["_id"]: op._doc["$set"]["problemCount"] for op in db["courses"].bulk_ops}
+    assert written == dict(problem_counts)
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from app.services.votes import VoteBuffer, record_vote
+
+from .fakes import FakeDB
+
+
+def test_flush_applies_deltas_and_clears_pending():
+    db = FakeDB()
+    doc_id = ObjectId()
+    db["problems"].docs[doc_id] = {"_id": doc_id, "votes": 3}
+    buffer = VoteBuffer(db)
+    buffer.add("problems", doc_id, "votes", 1)
+    buffer.add("problems", doc_id, "votes", 1)
+    assert buffer.pending("problems", doc_id, "votes") == 2
+    asyncio.run(buffer.flush())
+    assert db["problems"].docs[doc_id]["votes"] == 5
+    assert buffer.pending("problems", doc_id, "votes") == 0
+
+
+def test_written_deltas_stop_counting_before_callbacks_run():
+    db = FakeDB()
+    doc_id = ObjectId()
+    db["problems"].docs[doc_id] = {"_id": doc_id, "votes": 0}
+    seen = []
+
+    async def on_flush(collection, ids):
+        # runs after the write: stored value plus pending must not double up
+        seen.append(db[collection].docs[doc_id]["votes"] + buffer.pending(collection, doc_id, "votes"))
+
+    buffer = VoteBuffer(db, on_flush=on_flush)
+    buffer.add("problems", doc_id, "votes", 1)
+    asyncio.run(buffer.flush())
+    assert seen == [1]
+
+
+def test_missing_documents_are_remembered_at_flush():
+    db = FakeDB()
+    present, gone = ObjectId(), ObjectId()
+    db["comments"].docs[present] = {"_id": present, "upvotes": 0}
+    buffer = VoteBuffer(db)
+    buffer.add("comments", present, "upvotes", 1)
+    buffer.add("comments", gone, "upvotes", 1)
+    assert not buffer.is_missing("comments", gone)
+    asyncio.run(buffer.flush())
+    assert buffer.is_missing("comments", gone)
+    assert not buffer.is_missing("comments", present)
+
+
+def test_versions_are_bumped_at_most_once_per_interval():
+    db = FakeDB()
+    doc_id = ObjectId()
+    db["problems"].docs[doc_id] = {"_id": doc_id, "votes": 0}
+    buffer = VoteBuffer(db, version_interval=3600)
+
+    async def vote_and_flush():
+        buffer.add("problems", doc_id, "votes", 1)
+        await buffer.flush()
+        await buffer.bump_versions()
+
+    async def run():
+        await vote_and_flush()
+        await vote_and_flush()
+        await vote_and_flush()
+        assert len(db["versions"].updates) == 1
+        # shutdown publishes what the throttle held back
+        await buffer.stop()
+        assert len(db["versions"].updates) == 2
+        await buffer.stop()
+        assert len(db["versions"].updates) == 2
+
+    asyncio.run(run())
+
+
+def test_record_vote_returns_document_with_optimistic_count():
+    db = FakeDB()
+    doc_id = ObjectId()
+    db["problems"].docs[doc_id] = {"_id": doc_id, "title": "t", "votes": 3}
+    buffer = VoteBuffer(db)
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=db, vote_buffer=buffer)))
+
+    async def run():
+        first = await record_vote(request, "problems", doc_id, "votes", 1)
+        assert first["title"] == "t" and first["votes"] == 4
+        second = await record_vote(request, "problems", doc_id, "votes", 1)
+        assert second["votes"] == 5
+        await buffer.flush()
+        # stored now, no longer pending: counted once
+        third = await record_vote(request, "problems", doc_id, "votes", -1)
+        assert third["votes"] == 4
+        assert await record_vote(request, "problems", ObjectId(), "votes", 1) is None
+
+    asyncio.run(run())
@@ -0,0 +1,22 @@
+type LoadMoreProps = {
+  hasMore: boolean;
+  loading: boolean;
+  onClick: () => void;
+  label?: string;
+};
+
+export default function LoadMore({ hasMore, loading, onClick, label = "Load more" }: LoadMoreProps) {
+  if (!hasMore) return null;
+  return (
+    <div className="mt-6 flex justify-center">
+      <button
+        type="button"
+        onClick={onClick}
+        disabled={loading}
+        className="rounded-lg border border-neutral-300 bg-white px-4 py-2 text-sm font-medium text-neutral-700 hover:bg-neutral-50 disabled:opacity-50"
+      >
+        {loading ? "Loading…" : label}
+      </button>
+    </div>
+  );
+}
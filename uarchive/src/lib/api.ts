@@ -101,6 +101,36 @@ export async function createProblem(data: ProblemCreateRequest) {
   return res.json();
 }
 
+// List endpoints return at most PAGE_LIMIT items per request and put the
+// cursor for the next page in the X-Next-Cursor header (absent on the last
+// page). Callers get one page at a time and ask for the next one when the
+// user wants more (see usePagedList), so a list view never downloads a whole
+// collection up front.
+const PAGE_LIMIT = 50;
+
+export type Page<T> = {
+  items: T[];
+  nextCursor: string | null;
+};
+
+async function fetchPage<T>(
+  path: string,
+  params: Record<string, string> = {},
+  cursor: string | null = null,
+): Promise<Page<T>> {
+  const token = getAuthToken();
+  const headers: Record<string, string> = { "Content-Type": "application/json" };
+  if (token) headers["Authorization"] = `Bearer ${token}`;
+  const qs = new URLSearchParams({ ...params, limit: String(PAGE_LIMIT) });
+  if (cursor) qs.set("cursor", cursor);
+  const res = await fetch(`${API_BASE}${path}?${qs}`, { method: "GET", headers });
+  if (!res.ok) {
+    const err = await res.json().catch(() => null);
+    throw new Error(err?.detail ?? err?.message ?? res.statusText);
+  }
+  return { items: (await res.json()) as T[], nextCursor: res.headers.get("X-Next-Cursor") };
+}
+
 export type CourseSummary = {
   _id?: string;
   courseCode: string;
@@ -108,19 +138,22 @@ export type CourseSummary = {
   [k: string]: any;
 };
 
-export async function listCourses(): Promise<CourseSummary[]> {
-  const token = getAuthToken();
-  const headers: Record<string, string> = { "Content-Type": "application/json" };
-  if (token) headers["Authorization"] = `Bearer ${token}`;
-  const res = await fetch(`${API_BASE}/api/courses`, {
-    method: "GET",
-    headers,
-  });
+export async function listCourses(cursor: string | null = null): Promise<Page<CourseSummary>> {
+  return fetchPage<CourseSummary>("/api/courses", {}, cursor);
+}
+
+// One course by code (or id), without listing the catalog.
+export async function getCourseByCode(code: string): Promise<CourseSummary | null> {
+  const res = await fetch(
+    `${API_BASE}/api/courses/${encodeURIComponent(code)}/page?problems=1&summaries=1`,
+    { method: "GET", headers: { "Content-Type": "application/json" } },
+  );
+  if (res.status === 404) return null;
   if (!res.ok) {
     const err = await res.json().catch(() => null);
     throw new Error(err?.detail ?? err?.message ?? res.statusText);
   }
-  return res.json();
+  return (await res.json()).course ?? null;
 }
 
 export type ProblemSummary = {
@@ -130,17 +163,8 @@ export type ProblemSummary = {
   [k: string]: any;
 };
 
-export async function listProblems(courseCode?: string): Promise<ProblemSummary[]> {
-  const token = getAuthToken();
-  const headers: Record<string, string> = { "Content-Type": "application/json" };
-  if (token) headers["Authorization"] = `Bearer ${token}`;
-  const qs = courseCode ? `?courseCode=${encodeURIComponent(courseCode)}` : "";
-  const res = await fetch(`${API_BASE}/api/problems${qs}`, { method: "GET", headers });
-  if (!res.ok) {
-    const err = await res.json().catch(() => null);
-    throw new Error(err?.detail ?? err?.message ?? res.statusText);
-  }
-  return res.json();
+export async function listProblems(courseCode?: string, cursor: string | null = null): Promise<Page<ProblemSummary>> {
+  return fetchPage<ProblemSummary>("/api/problems", courseCode ? { courseCode } : {}, cursor);
 }
 
 export async function getProblem(id: string) {
@@ -155,16 +179,8 @@ export async function getProblem(id: string) {
   return res.json();
 }
 
-export async function listResponses(problemId: string) {
-  const token = getAuthToken();
-  const headers: Record<string, string> = { "Content-Type": "application/json" };
-  if (token) headers["Authorization"] = `Bearer ${token}`;
-  const res = await fetch(`${API_BASE}/api/responses/problem/${encodeURIComponent(problemId)}`, { method: "GET", headers });
-  if (!res.ok) {
-    const err = await res.json().catch(() => null);
-    throw new Error(err?.detail ?? err?.message ?? res.statusText);
-  }
-  return res.json();
+export async function listResponses(problemId: string, cursor: string | null = null): Promise<Page<any>> {
+  return fetchPage<any>(`/api/responses/problem/${encodeURIComponent(problemId)}`, {}, cursor);
 }
 
 export type ResponseCreateRequest = {
@@ -268,17 +284,8 @@ export type SummarySummary = {
   [k: string]: any;
 };
 
-export async function listSummaries(courseCode?: string): Promise<SummarySummary[]> {
-  const token = getAuthToken();
-  const headers: Record<string, string> = { "Content-Type": "application/json" };
-  if (token) headers["Authorization"] = `Bearer ${token}`;
-  const qs = courseCode ? `?courseCode=${encodeURIComponent(courseCode)}` : "";
-  const res = await fetch(`${API_BASE}/api/summaries${qs}`, { method: "GET", headers });
-  if (!res.ok) {
-    const err = await res.json().catch(() => null);
-    throw new Error(err?.detail ?? err?.message ?? res.statusText);
-  }
-  return res.json();
+export async function listSummaries(courseCode?: string, cursor: string | null = null): Promise<Page<SummarySummary>> {
+  return fetchPage<SummarySummary>("/api/summaries", courseCode ? { courseCode } : {}, cursor);
 }
 
 export type SummaryCreateRequest = {
@@ -327,16 +334,8 @@ export type CommentSummary = {
   [k: string]: any;
 };
 
-export async function listComments(problemId: string): Promise<CommentSummary[]> {
-  const token = getAuthToken();
-  const headers: Record<string, string> = { "Content-Type": "application/json" };
-  if (token) headers["Authorization"] = `Bearer ${token}`;
-  const res = await fetch(`${API_BASE}/api/comments/problem/${encodeURIComponent(problemId)}`, { method: "GET", headers });
-  if (!res.ok) {
-    const err = await res.json().catch(() => null);
-    throw new Error(err?.detail ?? err?.message ?? res.statusText);
-  }
-  return res.json();
+export async function listComments(problemId: string, cursor: string | null = null): Promise<Page<CommentSummary>> {
+  return fetchPage<CommentSummary>(`/api/comments/problem/${encodeURIComponent(problemId)}`, {}, cursor);
 }
 
 export type CommentCreateRequest = {
@@ -0,0 +1,55 @@
+import { useCallback, useEffect, useRef, useState } from "react";
+import type { Page } from "./api";
+
+// Loads the first page of a cursor-paginated list whenever `key` changes and
+// appends further pages on `loadMore()`. `setItems` is exposed so views can
+// prepend items they just created.
+export function usePagedList<T>(load: (cursor: string | null) => Promise<Page<T>>, key: string) {
+  const [items, setItems] = useState<T[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loading, setLoading] = useState(false);
+  // bumped on every reset so late pages of a previous key are dropped
+  const generation = useRef(0);
+  const loadRef = useRef(load);
+  loadRef.current = load;
+
+  useEffect(() => {
+    const gen = ++generation.current;
+    setItems([]);
+    setNextCursor(null);
+    setLoading(true);
+    loadRef
+      .current(null)
+      .then((page) => {
+        if (gen !== generation.current) return;
+        setItems(page.items);
+        setNextCursor(page.nextCursor);
+      })
+      .catch(() => {})
+      .finally(() => {
+        if (gen === generation.current) setLoading(false);
+      });
+    return () => {
+      generation.current++;
+    };
+  }, [key]);
+
+  const loadMore = useCallback(() => {
+    if (!nextCursor || loading) return;
+    const gen = generation.current;
+    setLoading(true);
+    loadRef
+      .current(nextCursor)
+      .then((page) => {
+        if (gen !== generation.current) return;
+        setItems((prev) => [...prev, ...page.items]);
+        setNextCursor(page.nextCursor);
+      })
+      .catch(() => {})
+      .finally(() => {
+        if (gen === generation.current) setLoading(false);
+      });
+  }, [nextCursor, loading]);
+
+  return { items, setItems, hasMore: nextCursor !== null, loading, loadMore };
+}
@@ -1,6 +1,8 @@
 import { Link, useSearchParams } from "react-router-dom";
 import { type Course, type Summary } from "../data/mockData";
-import { listSummaries, listCourses, voteSummary } from "../lib/api";
+import { listSummaries, getCourseByCode, voteSummary } from "../lib/api";
+import { usePagedList } from "../lib/usePagedList";
+import LoadMore from "../components/LoadMore";
 import MarkdownRenderer from "../components/MarkdownRenderer";
 import { useEffect, useState } from "react";
 import Header from "../components/Header";
@@ -145,23 +147,17 @@ export default function CourseDetail() {
   const courseCode = searchParams.get("code") || "CPSC 413";
   const [sortBy, setSortBy] = useState<"votes" | "recent">("votes");
   const [course, setCourse] = useState<Course | null>(null);
-  const [summaries, setSummaries] = useState<Summary[]>([]);
+  const { items: summaries, hasMore, loading, loadMore } = usePagedList<Summary>(
+    (cursor) => listSummaries(courseCode, cursor) as Promise<any>,
+    courseCode,
+  );
 
   useEffect(() => {
     let mounted = true;
-    // load course info from backend list
-    listCourses()
-      .then((courses) => {
-        if (!mounted) return;
-        const found = (courses as Course[]).find((c) => c.courseCode === courseCode);
-        setCourse(found ?? null);
-      })
-      .catch(() => {});
-
-    listSummaries(courseCode)
-      .then((s) => {
+    getCourseByCode(courseCode)
+      .then((found) => {
         if (!mounted) return;
-        setSummaries(s as Summary[]);
+        setCourse((found as Course) ?? null);
       })
       .catch(() => {});
 
@@ -288,6 +284,7 @@ export default function CourseDetail() {
             ))}
           </div>
         )}
+        <LoadMore hasMore={hasMore} loading={loading} onClick={loadMore} label="Load more summaries" />
       </section>
 
       <footer className="border-t border-neutral-200 bg-white">
@@ -1,6 +1,8 @@
 import { Link, useSearchParams } from "react-router-dom";
 import { type Course, type Problem } from "../data/mockData";
-import { listProblems, listCourses, voteProblem } from "../lib/api";
+import { listProblems, getCourseByCode, voteProblem } from "../lib/api";
+import { usePagedList } from "../lib/usePagedList";
+import LoadMore from "../components/LoadMore";
 import { useEffect, useState } from "react";
 import { useAuth } from "../contexts/AuthContext";
 import Header from "../components/Header";
@@ -157,23 +159,18 @@ export default function CourseProblems() {
   >("All");
 
   const [course, setCourse] = useState<Course | null>(null);
-  const [problems, setProblems] = useState<Problem[]>([]);
+  const { items: problems, hasMore, loading, loadMore } = usePagedList<Problem>(
+    (cursor) => listProblems(courseCode, cursor) as Promise<any>,
+    courseCode,
+  );
   const auth = useAuth();
 
   useEffect(() => {
     let mounted = true;
-    listCourses()
-      .then((courses) => {
-        if (!mounted) return;
-        const found = (courses as Course[]).find((c) => c.courseCode === courseCode);
-        setCourse(found ?? null);
-      })
-      .catch(() => { });
-
-    listProblems(courseCode)
-      .then((p) => {
+    getCourseByCode(courseCode)
+      .then((found) => {
         if (!mounted) return;
-        setProblems(p as Problem[]);
+        setCourse((found as Course) ?? null);
       })
       .catch(() => { });
 
@@ -251,8 +248,8 @@ export default function CourseProblems() {
             <div>
               <h2 className="text-2xl font-bold">Problems & Takeaways</h2>
               <p className="mt-1 text-sm text-neutral-600">
-                {problems.length} {" "}
-                {problems.length === 1 ? "problem" : "problems"} found
+                {problems.length}{hasMore ? "+" : ""}{" "}
+                {problems.length === 1 && !hasMore ? "problem" : "problems"} found
               </p>
             </div>
 
@@ -325,6 +322,7 @@ export default function CourseProblems() {
             ))}
           </div>
         )}
+        <LoadMore hasMore={hasMore} loading={loading} onClick={loadMore} label="Load more problems" />
       </section>
 
       <footer className="border-t border-neutral-200 bg-white">
@@ -1,8 +1,9 @@
 import { Link } from "react-router-dom";
 import { type Course } from "../data/mockData";
 import { listCourses } from "../lib/api";
+import { usePagedList } from "../lib/usePagedList";
 import Header from "../components/Header";
-import { useEffect, useState } from "react";
+import LoadMore from "../components/LoadMore";
 
 function Card({ children }: { children: React.ReactNode }) {
   return (
@@ -41,18 +42,10 @@ function CourseCard({ course }: { course: Course }) {
 }
 
 export default function Courses() {
-  const [courses, setCourses] = useState<Course[]>([]);
-  useEffect(() => {
-    let mounted = true;
-    listCourses()
-      .then((data) => {
-        if (mounted) setCourses(data as Course[]);
-      })
-      .catch(() => {});
-    return () => {
-      mounted = false;
-    };
-  }, []);
+  const { items: courses, hasMore, loading, loadMore } = usePagedList<Course>(
+    (cursor) => listCourses(cursor) as Promise<any>,
+    "courses",
+  );
 
   return (
     <main className="min-h-screen bg-neutral-50 text-neutral-900">
@@ -71,6 +64,7 @@ export default function Courses() {
             <CourseCard key={course._id} course={course} />
           ))}
         </div>
+        <LoadMore hasMore={hasMore} loading={loading} onClick={loadMore} label="Load more courses" />
       </section>
 
       <footer className="border-t border-neutral-200 bg-white">
@@ -1,7 +1,9 @@
 import { Link } from "react-router-dom";
 import Header from "../components/Header";
-import { useEffect, useState } from "react";
+import { useState } from "react";
 import { createProblem, listCourses, createSummary } from "../lib/api";
+import { usePagedList } from "../lib/usePagedList";
+import LoadMore from "../components/LoadMore";
 
 function Card({ children }: { children: React.ReactNode }) {
   return (
@@ -14,21 +16,12 @@ function Card({ children }: { children: React.ReactNode }) {
 export default function Post() {
   const [contentType, setContentType] = useState<"problem" | "summary">("problem");
   const [courseId, setCourseId] = useState("");
-  const [courses, setCourses] = useState<any[]>([]);
-
-  useEffect(() => {
-    let mounted = true;
-    (async () => {
-      try {
-        const data = await listCourses();
-        if (!mounted) return;
-        setCourses(data || []);
-      } catch (err) {
-        console.error("Failed to load courses", err);
-      }
-    })();
-    return () => { mounted = false; };
-  }, []);
+  const {
+    items: courses,
+    hasMore: moreCourses,
+    loading: loadingCourses,
+    loadMore: loadMoreCourses,
+  } = usePagedList<any>((cursor) => listCourses(cursor), "courses");
   const [title, setTitle] = useState("");
   const [description, setDescription] = useState("");
   const [professor, setProfessor] = useState("");
@@ -150,6 +143,7 @@ export default function Post() {
                   );
                 })}
               </select>
+              <LoadMore hasMore={moreCourses} loading={loadingCourses} onClick={loadMoreCourses} label="Load more courses" />
             </div>
 
             {/* Title */}
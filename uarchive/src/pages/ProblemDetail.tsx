@@ -3,7 +3,9 @@ import { type Problem, type Response, type Course, type Comment } from "../data/
 import Header from "../components/Header";
 import { useState, useEffect } from "react";
 import MarkdownRenderer from "../components/MarkdownRenderer";
-import { getProblem, listResponses, listCourses, listComments, createComment, createResponse, voteResponse, voteComment, voteProblem } from "../lib/api";
+import { getProblem, listResponses, getCourseByCode, listComments, createComment, createResponse, voteResponse, voteComment, voteProblem } from "../lib/api";
+import { usePagedList } from "../lib/usePagedList";
+import LoadMore from "../components/LoadMore";
 import { useAuth } from "../contexts/AuthContext";
 
 function TagPill({ text }: { text: string }) {
@@ -150,10 +152,22 @@ export default function ProblemDetail() {
   const [problemVotes, setProblemVotes] = useState<number>(0);
   const [userProblemVote, setUserProblemVote] = useState<"up" | "down" | null>(null);
   const [problem, setProblem] = useState<Problem | null>(null);
-  const [responses, setResponses] = useState<Response[]>([]);
+  const {
+    items: responses,
+    setItems: setResponses,
+    hasMore: moreResponses,
+    loading: loadingResponses,
+    loadMore: loadMoreResponses,
+  } = usePagedList<Response>((cursor) => listResponses(problemId, cursor), problemId);
   const [showResponseForm, setShowResponseForm] = useState(false);
   const [newResponse, setNewResponse] = useState("");
-  const [comments, setComments] = useState<Comment[]>([]);
+  const {
+    items: comments,
+    setItems: setComments,
+    hasMore: moreComments,
+    loading: loadingComments,
+    loadMore: loadMoreComments,
+  } = usePagedList<Comment>((cursor) => listComments(problemId, cursor) as Promise<any>, problemId);
   const [newComment, setNewComment] = useState("");
   const [posting, setPosting] = useState(false);
   const [course, setCourse] = useState<Course | null>(null);
@@ -167,30 +181,12 @@ export default function ProblemDetail() {
         if (!mounted) return;
         setProblem(p as Problem);
         setProblemVotes((p as any).votes || 0);
+        // course info for the header, looked up by the problem's course code
+        const code = (p as any).courseCode;
+        return code ? getCourseByCode(code) : null;
       })
-      .catch(() => { });
-
-    listResponses(problemId)
-      .then((r) => {
-        if (!mounted) return;
-        setResponses(r as Response[]);
-      })
-      .catch(() => { });
-
-
-    listComments(problemId)
-      .then((c) => {
-        if (!mounted) return;
-        setComments(c as Comment[]);
-      })
-      .catch(() => { });
-
-    // find course info
-    listCourses()
-      .then((courses) => {
-        if (!mounted) return;
-        const found = (courses as Course[]).find((c) => c.courseCode === (problem?.courseCode || ""));
-        if (found) setCourse(found);
+      .then((found) => {
+        if (mounted && found) setCourse(found as Course);
       })
       .catch(() => { });
 
@@ -463,6 +459,7 @@ export default function ProblemDetail() {
             ))}
           </div>
         )}
+        <LoadMore hasMore={moreResponses} loading={loadingResponses} onClick={loadMoreResponses} label="Load more responses" />
 
         {/* Add Response Prompt */}
         <Card>
@@ -513,6 +510,7 @@ export default function ProblemDetail() {
             {comments.map((c) => <CommentCard key={c._id} comment={c} />)}
           </div>
         )}
+        <LoadMore hasMore={moreComments} loading={loadingComments} onClick={loadMoreComments} label="Load more comments" />
 
         <Card>
           <div className="p-6">
@@ -0,0 +1,5 @@
+"""Code shared by the backend (`backend/app`) and the standalone service (`api/`).
+
+Both run with the repository root on `PYTHONPATH`, so each imports the same
+Mongo client factory and metrics registry instead of keeping a copy.
+"""
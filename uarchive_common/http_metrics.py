@@ -0,0 +1,69 @@
+"""Per-route HTTP metrics for `/metrics`.
+
+`HTTPMetricsMiddleware` wraps the whole app and records, for every request:
+
+- `http_request_duration_seconds`: latency by method and route template,
+  up to the last body chunk, so streamed responses count in full;
+- `http_requests_total`: completed requests by method, route and status;
+- `http_requests_in_flight`: requests currently being served, by method.
+
+Routes are labelled by their template (`/api/problems/{problem_id}`), never
+the raw path, so ids do not blow up the label set. Requests that match no
+route share the `unmatched` label.
+"""
+import time
+
+from .metrics import registry
+
+UNMATCHED = "unmatched"
+
+_duration = registry.histogram("http_request_duration_seconds", "Time to serve a request, by route template", ["method", "route"])
+_requests = registry.counter("http_requests_total", "Requests served, by route template and status", ["method", "route", "status"])
+_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being served", ["method"])
+
+
+def route_template(scope) -> str:
+    """The full path template of the route that handled `scope`.
+
+    `scope["route"].path` is relative to the router the route was declared
+    on, so the prefix it was included under is recovered from the request
+    path.
+    """
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED
+    try:
+        relative = route.url_path_for(route.name, **scope.get("path_params", {}))
+    except Exception:
+        return route.path
+    path = scope["path"]
+    return path[: len(path) - len(relative)] + route.path if path.endswith(relative) else route.path
+
+
+class HTTPMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _in_flight.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _in_flight.dec(method=method)
+            route = route_template(scope)
+            _duration.observe(elapsed, method=method, route=route)
+            _requests.inc(method=method, route=route, status=str(status))
@@ -0,0 +1,202 @@
+"""Mongo client construction shared by the backend and `api/`.
+
+`create_client` turns `MongoSettings` into driver options: pool sizing,
+wire compression and the default read preference. Options left unset fall
+back to whatever the URI says, then to the driver defaults. Compressors
+whose Python package is missing are dropped (zstd needs `zstandard`,
+snappy needs `python-snappy`); the server picks the first one it supports
+from what remains.
+
+Every client reports pool checkout waits to the metrics registry, so the
+pool can be sized from `mongo_pool_checkout_wait_seconds` rather than by
+guessing. Waits that grow while `mongo_pool_checked_out` sits at the pool
+size mean the pool is too small; failures with reason "timeout" mean
+`MONGO_WAIT_QUEUE_TIMEOUT_MS` was hit. Every command is timed too, by
+command name and collection (`mongo_command_duration_seconds`), which shows
+which collection a slow route is spending its time on.
+"""
+import importlib.util
+import logging
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic_settings import BaseSettings
+from pymongo import monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+from .metrics import registry
+
+logger = logging.getLogger("uvicorn.error")
+
+# compressor name -> module that has to be importable for it to work
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+class MongoSettings(BaseSettings):
+    # None leaves the option to the URI or the driver default (100 / 0 /
+    # no idle limit / wait forever)
+    MONGO_MAX_POOL_SIZE: Optional[int] = None
+    MONGO_MIN_POOL_SIZE: Optional[int] = None
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    # in order of preference; empty disables compression
+    MONGO_COMPRESSORS: str = "zstd,snappy,zlib"
+    # client-wide default: primary, primaryPreferred, secondary,
+    # secondaryPreferred or nearest
+    MONGO_READ_PREFERENCE: str = "primary"
+    MONGO_MAX_STALENESS_SECONDS: Optional[int] = None
+    # overrides for individual read-only routes, keyed "<router>.<handler>",
+    # e.g. MONGO_ROUTE_READ_PREFERENCES='{"problems.list_problems": "secondaryPreferred"}'
+    MONGO_ROUTE_READ_PREFERENCES: Dict[str, str] = {}
+    model_config = {"extra": "ignore"}
+
+
+def available_compressors(names: str) -> List[str]:
+    found = []
+    for name in (n.strip().lower() for n in names.split(",")):
+        if not name:
+            continue
+        module = _COMPRESSOR_MODULES.get(name)
+        if module is None:
+            logger.warning("Unknown Mongo compressor %r ignored", name)
+        elif importlib.util.find_spec(module) is None:
+            logger.info("Mongo compressor %s unavailable: %s is not installed", name, module)
+        else:
+            found.append(name)
+    return found
+
+
+def read_preference(name: str, max_staleness: Optional[int] = None):
+    return make_read_preference(read_pref_mode_from_name(name), None, -1 if max_staleness is None else max_staleness)
+
+
+def client_options(settings: MongoSettings) -> Dict[str, Any]:
+    options: Dict[str, Any] = {}
+    for option, value in (
+        ("maxPoolSize", settings.MONGO_MAX_POOL_SIZE),
+        ("minPoolSize", settings.MONGO_MIN_POOL_SIZE),
+        ("maxIdleTimeMS", settings.MONGO_MAX_IDLE_TIME_MS),
+        ("waitQueueTimeoutMS", settings.MONGO_WAIT_QUEUE_TIMEOUT_MS),
+    ):
+        if value is not None:
+            options[option] = value
+    compressors = available_compressors(settings.MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    if settings.MONGO_READ_PREFERENCE != "primary":
+        options["readPreference"] = settings.MONGO_READ_PREFERENCE
+        # the driver rejects a staleness bound on primary reads
+        if settings.MONGO_MAX_STALENESS_SECONDS is not None:
+            options["maxStalenessSeconds"] = settings.MONGO_MAX_STALENESS_SECONDS
+    return options
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Exports connection pool checkouts; called on the driver's threads."""
+
+    def __init__(self):
+        self._wait = registry.histogram(
+            "mongo_pool_checkout_wait_seconds", "Time a query waited to check a connection out of the pool", ["pool"]
+        )
+        self._failed = registry.counter(
+            "mongo_pool_checkout_failures_total", "Pool checkouts that failed, by reason", ["pool", "reason"]
+        )
+        self._checked_out = registry.gauge("mongo_pool_checked_out", "Connections currently checked out", ["pool"])
+        self._open = registry.gauge("mongo_pool_connections", "Open connections, idle or in use", ["pool"])
+
+    @staticmethod
+    def _pool(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def connection_checked_out(self, event):
+        pool = self._pool(event)
+        if event.duration is not None:
+            self._wait.observe(event.duration, pool=pool)
+        self._checked_out.inc(pool=pool)
+
+    def connection_check_out_failed(self, event):
+        pool = self._pool(event)
+        if event.duration is not None:
+            self._wait.observe(event.duration, pool=pool)
+        self._failed.inc(pool=pool, reason=str(event.reason))
+
+    def connection_checked_in(self, event):
+        self._checked_out.dec(pool=self._pool(event))
+
+    def connection_created(self, event):
+        self._open.inc(pool=self._pool(event))
+
+    def connection_closed(self, event):
+        self._open.dec(pool=self._pool(event))
+
+    def pool_cleared(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Exports per-collection command timings; called on the driver's threads."""
+
+    def __init__(self):
+        self._duration = registry.histogram(
+            "mongo_command_duration_seconds", "Round trip of one command, by command and collection", ["command", "collection"]
+        )
+        self._failed = registry.counter(
+            "mongo_command_failures_total", "Commands the server or the network failed", ["command", "collection"]
+        )
+        # (connection, request id) -> collection, from started until done
+        self._pending: Dict[Any, str] = {}
+
+    @staticmethod
+    def _collection(event) -> str:
+        target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        # database-level commands (ping, aggregate: 1, listCollections) have none
+        return target if isinstance(target, str) else ""
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        self._duration.observe(event.duration_micros / 1e6, command=event.command_name, collection=collection)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        self._duration.observe(event.duration_micros / 1e6, command=event.command_name, collection=collection)
+        self._failed.inc(command=event.command_name, collection=collection)
+
+
+def create_client(uri: Optional[str], settings: MongoSettings, listeners=()) -> AsyncIOMotorClient:
+    """The one way both apps build a client; see the module docstring."""
+    options = client_options(settings)
+    logger.info("Mongo client options: %s", options)
+    return AsyncIOMotorClient(uri, event_listeners=[PoolMetrics(), CommandMetrics(), *listeners], **options)
+
+
+def route_databases(db, settings: MongoSettings) -> Dict[str, Any]:
+    """Database handles for the routes in `MONGO_ROUTE_READ_PREFERENCES`."""
+    handles = {}
+    for route, name in settings.MONGO_ROUTE_READ_PREFERENCES.items():
+        try:
+            staleness = None if name == "primary" else settings.MONGO_MAX_STALENESS_SECONDS
+            pref = read_preference(name, staleness)
+        except Exception:
+            logger.warning("Ignoring read preference %r for %s", name, route)
+            continue
+        handles[route] = db.with_options(read_preference=pref)
+    return handles
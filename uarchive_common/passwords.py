@@ -0,0 +1,79 @@
+"""Bounded pool for Argon2 work, shared by the backend and `api/`.
+
+Both apps hash and verify passwords through a `PasswordPool`, so they reject
+overload the same way and report the same metrics: queue wait
+(`password_pool_wait_seconds`), time inside Argon2 (`password_hash_seconds`),
+rejections and the number of jobs pending.
+"""
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from .metrics import registry
+
+
+class PasswordPoolOverloaded(Exception):
+    """Raised when too many password jobs are already queued."""
+
+
+_pool_wait = registry.histogram(
+    "password_pool_wait_seconds", "Time password jobs spent queued before a worker picked them up", ["op"]
+)
+_pool_work = registry.histogram("password_hash_seconds", "Time spent inside Argon2 per password job", ["op"])
+_pool_rejected = registry.counter("password_pool_rejected_total", "Password jobs rejected because the pool was full", ["op"])
+_pool_pending = registry.gauge("password_pool_pending", "Password jobs queued or running")
+
+
+def _timed(fn: Callable, *args) -> Tuple[object, float, float]:
+    # runs in the worker: report when it started and how long the work took
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+class PasswordPool:
+    """Bounded executor for Argon2 hashing and verification.
+
+    Login bursts queue here instead of blocking the event loop. Once
+    `max_pending` jobs are queued or running, further jobs fail fast with
+    `PasswordPoolOverloaded` so the caller can answer 503 instead of letting
+    latency grow without bound.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 2, max_pending: int = 32):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="argon2")
+        return self._executor
+
+    async def run(self, op: str, fn: Callable, *args):
+        if self.pending >= self.max_pending:
+            _pool_rejected.inc(op=op)
+            raise PasswordPoolOverloaded(op)
+        self.pending += 1
+        _pool_pending.set(self.pending)
+        submitted = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, elapsed = await loop.run_in_executor(self._get_executor(), _timed, fn, *args)
+        finally:
+            self.pending -= 1
+            _pool_pending.set(self.pending)
+        _pool_wait.observe(max(started - submitted, 0.0), op=op)
+        _pool_work.observe(elapsed, op=op)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None